@@ -0,0 +1,235 @@
+# admission.py
+"""
+Admission control: separate lanes for cheap CRUD and LLM-bound requests.
+
+Sync endpoints all run on Starlette's one threadpool, so a burst of
+multi-second `/summary` calls used to take every thread and queue plain
+`GET /tasks` reads behind them. `AdmissionMiddleware` now classifies each
+request into a lane before it reaches the app:
+
+- ai          : POST /tasks, /summary, /nlp/* (Gemini round-trips)
+- bulk        : /tasks/import, /tasks/export (long streams)
+- interactive : everything else (list/search/stats, PATCH, DELETE, ...)
+
+`/metrics`, `/events` (SSE), `/debug/*`, the docs and CORS preflights bypass
+admission.
+
+Each lane has its own concurrency limit and a bounded FIFO queue. A request
+waits in its lane's queue for at most the lane's max wait. When the queue is
+full, or the wait runs out, it is shed with 503 and a Retry-After estimated
+from the lane's recent service time. `configure_threadpool()` sizes the
+shared thread limiter to the sum of the lane limits (plus headroom for the
+unlaned routes). A lane can therefore never hold threads another lane needs,
+and interactive latency stays flat however much AI work is in flight.
+
+Exported per lane: todo_admission_in_flight, todo_admission_queue_depth,
+todo_admission_wait_seconds, todo_admission_rejected_total{reason}.
+
+Environment variables (optional)
+--------------------------------
+ADMISSION                         : "0" disables admission control (default: "1")
+ADMISSION_<LANE>_CONCURRENCY      : requests running at once; LANE = INTERACTIVE | AI | BULK
+                                    (defaults: 32 | AI_MAX_WORKERS (8) | 2)
+ADMISSION_<LANE>_QUEUE            : requests allowed to wait (defaults: 512 | 64 | 8)
+ADMISSION_<LANE>_MAX_WAIT_S       : longest wait before shedding (defaults: 2 | 10 | 30)
+ADMISSION_THREAD_HEADROOM         : extra threads for unlaned routes (default: 8)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from backend.metrics import Counter, Gauge, Histogram
+
+ENABLED = os.getenv("ADMISSION", "1") == "1"
+THREAD_HEADROOM = int(os.getenv("ADMISSION_THREAD_HEADROOM", "8"))
+
+# lane -> (concurrency, queue, max wait s)
+_DEFAULTS = {
+    "interactive": (32, 512, 2.0),
+    "ai": (int(os.getenv("AI_MAX_WORKERS", "8")), 64, 10.0),
+    "bulk": (2, 8, 30.0),
+}
+
+_EXEMPT_PREFIXES = ("/metrics", "/events", "/debug", "/docs", "/redoc", "/openapi.json")
+_AI_POSTS = ("/tasks", "/summary")
+_BULK = ("/tasks/import", "/tasks/export")
+
+IN_FLIGHT = Gauge("todo_admission_in_flight", "Requests running per admission lane.", ("lane",))
+QUEUE_DEPTH = Gauge("todo_admission_queue_depth", "Requests waiting per admission lane.", ("lane",))
+QUEUE_WAIT = Histogram(
+    "todo_admission_wait_seconds",
+    "Time admitted requests spent queued per lane.",
+    ("lane",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REJECTED = Counter(
+    "todo_admission_rejected_total",
+    "Requests shed with 503 per lane (queue_full / queue_timeout).",
+    ("lane", "reason"),
+)
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"{lane} lane overloaded ({reason})")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Lane for a request, or None when it bypasses admission."""
+    if method == "OPTIONS" or path.startswith(_EXEMPT_PREFIXES):
+        return None
+    if path in _BULK:
+        return "bulk"
+    if method == "POST" and (path in _AI_POSTS or path.startswith("/nlp/")):
+        return "ai"
+    return "interactive"
+
+
+class Lane:
+    """Concurrency limit + bounded FIFO queue; used from one event loop."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait_s: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_s = max_wait_s
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_s: Optional[float] = None  # EWMA of time a request holds its slot
+
+    @classmethod
+    def from_env(cls, name: str) -> "Lane":
+        conc, queue, wait = _DEFAULTS[name]
+        env = f"ADMISSION_{name.upper()}_"
+        return cls(
+            name,
+            int(os.getenv(env + "CONCURRENCY", str(conc))),
+            int(os.getenv(env + "QUEUE", str(queue))),
+            float(os.getenv(env + "MAX_WAIT_S", str(wait))),
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a new arrival."""
+        if self._service_s is None:
+            return max(1, math.ceil(self.max_wait_s))  # nothing finished yet
+        est = self._service_s * (len(self._waiters) + 1) / self.concurrency
+        return max(1, min(60, math.ceil(est)))
+
+    def _reject(self, reason: str) -> Overloaded:
+        REJECTED.inc(lane=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        start = time.perf_counter()
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full")
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            QUEUE_DEPTH.set(len(self._waiters), lane=self.name)
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), self.max_wait_s)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if fut.done() and not fut.cancelled():
+                    # the slot was handed over just as we gave up: pass it on
+                    self.release(time.perf_counter() - start, held=False)
+                else:
+                    fut.cancel()
+                    self._waiters.remove(fut)
+                QUEUE_DEPTH.set(len(self._waiters), lane=self.name)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._reject("queue_timeout")
+            # release() transferred its slot to us; `active` is unchanged
+        QUEUE_WAIT.observe(time.perf_counter() - start, lane=self.name)
+        IN_FLIGHT.set(self.active, lane=self.name)
+
+    def release(self, held_s: float, held: bool = True) -> None:
+        if held:
+            prev = self._service_s
+            self._service_s = held_s if prev is None else prev + 0.2 * (held_s - prev)
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)  # hand the slot straight to the next waiter
+                QUEUE_DEPTH.set(len(self._waiters), lane=self.name)
+                return
+        QUEUE_DEPTH.set(0, lane=self.name)
+        self.active -= 1
+        IN_FLIGHT.set(self.active, lane=self.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.active,
+            "queued": len(self._waiters),
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait_s,
+            "service_s": None if self._service_s is None else round(self._service_s, 4),
+        }
+
+
+lanes: Dict[str, Lane] = {name: Lane.from_env(name) for name in _DEFAULTS}
+
+
+def thread_tokens() -> int:
+    return sum(lane.concurrency for lane in lanes.values()) + THREAD_HEADROOM
+
+
+def configure_threadpool() -> None:
+    """Size the shared thread limiter so every lane's limit fits in it at once."""
+    if not ENABLED:
+        return
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, thread_tokens())
+
+
+async def _send_503(send: Any, err: Overloaded) -> None:
+    body = json.dumps({"detail": str(err), "lane": err.lane, "reason": err.reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(err.retry_after).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        lane = classify(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if not ENABLED or lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        q = lanes[lane]
+        try:
+            await q.acquire()
+        except Overloaded as err:
+            await _send_503(send, err)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            q.release(time.perf_counter() - start)
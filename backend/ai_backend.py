@@ -0,0 +1,238 @@
+# ai_backend.py
+"""
+Pluggable text-generation backends used by ai_client._generate.
+
+- GeminiBackend : the real google.generativeai client (default)
+- FakeBackend   : deterministic, offline stand-in with configurable latency and
+                  canned JSON, for benchmarks and local development
+
+Selection: AI_BACKEND=gemini|fake (or `set_backend(...)` programmatically).
+
+Fake backend environment variables (optional)
+---------------------------------------------
+FAKE_AI_LATENCY    : latency distribution, one of
+                     "none" | "const:<s>" | "uniform:<lo>,<hi>" |
+                     "lognormal:<median_s>,<sigma>"   (default: "lognormal:0.6,0.5")
+FAKE_AI_ERROR_RATE : fraction of calls that raise (default: 0)
+FAKE_AI_SEED       : RNG seed (default: 42)
+FAKE_AI_RESPONSES  : path to a JSON file {fn_name: {...canned response...}} that
+                     overrides the built-in generators
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.resilience import CLIENT_TIMEOUT_S, AIUnavailable
+
+
+class AIBackend:
+    """Interface: `check()` before the guarded call, `generate()` inside it."""
+
+    name = "base"
+
+    def check(self) -> None:
+        """Raise AIUnavailable if the backend cannot be used at all (config)."""
+
+    def generate(self, fn_name: str, prompt: str) -> Any:
+        """Return a Gemini-like response (`.text`, `.usage_metadata`, `.prompt_feedback`)."""
+        raise NotImplementedError
+
+
+# ---------------------------
+# Gemini
+# ---------------------------
+
+class GeminiBackend(AIBackend):
+    name = "gemini"
+
+    def check(self) -> None:
+        if not os.getenv("GEMINI_API_KEY"):
+            raise AIUnavailable("GEMINI_API_KEY not set", reason="no_api_key")
+
+    def generate(self, fn_name: str, prompt: str) -> Any:
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        model = genai.GenerativeModel(
+            model_name=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            generation_config={"response_mime_type": "application/json"},
+        )
+        # its own timeout: a call the guard gave up on still frees its thread
+        return model.generate_content(prompt, request_options={"timeout": CLIENT_TIMEOUT_S})
+
+
+# ---------------------------
+# Fake (offline, deterministic)
+# ---------------------------
+
+def _latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "const":
+        return lambda: nums[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(nums[0], nums[1])
+    if kind == "lognormal":
+        mu = math.log(max(nums[0], 1e-6))
+        return lambda: rng.lognormvariate(mu, nums[1])
+    raise ValueError(f"unknown FAKE_AI_LATENCY spec: {spec!r}")
+
+
+def _stable(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+_FAKE_CATEGORIES = ("Work", "Errands", "Health", "Personal", "Finance", "Family", "Study", "Groceries")
+
+
+def _quoted_after(prompt: str, marker: str) -> str:
+    m = re.search(re.escape(marker) + r'\s*"([^"]*)"', prompt)
+    return m.group(1) if m else ""
+
+
+def _fake_categorize(prompt: str) -> Dict[str, Any]:
+    text = _quoted_after(prompt, "Input text:")
+    h = _stable(text)
+    due = None
+    if h % 3:
+        due = (datetime.now() + timedelta(hours=1 + h % 96)).replace(microsecond=0).isoformat()
+    return {
+        "category_proposed": _FAKE_CATEGORIES[h % len(_FAKE_CATEGORIES)],
+        "priority": 1 + h % 5,
+        "due_dt_iso": due,
+        "rationale": "fake backend",
+    }
+
+
+def _fake_command(prompt: str) -> Dict[str, Any]:
+    text = _quoted_after(prompt, "Parse this user command:").lower()
+    action = "summarize" if text.startswith("summar") else "show"
+    timeframe = next((tf for tf in ("today", "tomorrow", "this_week") if tf.replace("_", " ") in text), "all")
+    return {"action": action, "category": None, "timeframe": timeframe, "rationale": "fake backend"}
+
+
+def _table_refs(prompt: str) -> List[int]:
+    # rows of the prompts.encode_tasks table start with "<ref>|"
+    return [int(x) for x in re.findall(r"^(\d+)\|", prompt, re.M)]
+
+
+def _fake_summary(prompt: str) -> Dict[str, Any]:
+    n = len(_table_refs(prompt))
+    return {
+        "headline": f"{n} tasks in view",
+        "kpis": {"open": n, "completed": 0, "overdue": 0, "due_today": 0},
+        "highlights": [],
+        "by_category": [],
+        "urgent_ids": [],
+        "overdue_ids": [],
+        "markdown": f"- {n} tasks",
+        "narrative": f"You have {n} tasks in view; this is a canned benchmark summary.",
+    }
+
+
+def _fake_filter(prompt: str) -> Dict[str, Any]:
+    return {"keep_ids": _table_refs(prompt)[::2]}
+
+
+def _fake_intent(prompt: str) -> Dict[str, Any]:
+    text = _quoted_after(prompt, "Input:").lower()
+    is_cmd = text.startswith(("show", "summar", "delete", "complete", "list"))
+    return {"intent": "command" if is_cmd else "add_task", "rationale": "fake backend"}
+
+
+_FAKE_GENERATORS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "categorize_and_enrich": _fake_categorize,
+    "parse_command_nlp": _fake_command,
+    "summarize_tasks": _fake_summary,
+    "filter_tasks_with_ai": _fake_filter,
+    "detect_intent": _fake_intent,
+}
+
+
+class FakeBackend(AIBackend):
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+        responses: Optional[Dict[str, Any]] = None,
+    ):
+        self._rng = random.Random(int(os.getenv("FAKE_AI_SEED", "42")) if seed is None else seed)
+        self._lock = threading.Lock()
+        self._latency = _latency_sampler(
+            latency or os.getenv("FAKE_AI_LATENCY", "lognormal:0.6,0.5"), self._rng
+        )
+        self.error_rate = (
+            float(os.getenv("FAKE_AI_ERROR_RATE", "0")) if error_rate is None else error_rate
+        )
+        if responses is None and os.getenv("FAKE_AI_RESPONSES"):
+            with open(os.environ["FAKE_AI_RESPONSES"], encoding="utf-8") as f:
+                responses = json.load(f)
+        self.responses = responses or {}
+
+    def generate(self, fn_name: str, prompt: str) -> Any:
+        with self._lock:
+            delay = self._latency()
+            fail = self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError("fake_backend_error")
+
+        if fn_name in self.responses:
+            data = self.responses[fn_name]
+        else:
+            data = _FAKE_GENERATORS.get(fn_name, lambda p: {})(prompt)
+        text = json.dumps(data)
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4,
+            total_token_count=len(prompt) // 4 + len(text) // 4,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage, prompt_feedback=None, candidates=[])
+
+
+# ---------------------------
+# Selection
+# ---------------------------
+
+_BACKENDS: Dict[str, Callable[[], AIBackend]] = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+}
+_backend: Optional[AIBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> AIBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.getenv("AI_BACKEND", "gemini").lower()
+                if name not in _BACKENDS:
+                    raise RuntimeError(f"unknown AI_BACKEND: {name}")
+                _backend = _BACKENDS[name]()
+    return _backend
+
+
+def set_backend(backend: Optional[AIBackend]) -> None:
+    """Swap the active backend (None → re-read AI_BACKEND on next use)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
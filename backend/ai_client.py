@@ -1,23 +1,27 @@
 # ai_client.py
-import os
 import json
 import re
+import time
 from datetime import datetime
-from typing import Optional, Dict, Any, Sequence
+from typing import Optional, Dict, Any, Callable, Sequence
 from collections import Counter
 
-import google.generativeai as genai
-import dateparser
 from dotenv import load_dotenv
 
 # Path B: local reconciliation happens AFTER Gemini proposes a raw category
 from backend.similarity import reconcile_category
+from backend.reconcile_memo import memo as reconcile_memo
+from backend.resilience import AIUnavailable, BadAIResponse, call_guarded
+from backend.ai_backend import get_backend
+from backend.metrics import observe_ai_call, AI_ERRORS, AI_PROMPT_TOKENS, RECONCILE_METHOD
+from backend import prompts
+from backend.profiling import note
+from backend.utils import parse_command
+from backend.dates import parse_due
 
 load_dotenv()
 
-TZ = os.getenv("LOCAL_TZ", "America/Toronto")
-now_iso = datetime.now().isoformat()
-_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+TZ = prompts.TZ
 
 
 # -------------------------
@@ -39,16 +43,8 @@ def _get_resp_text(resp: Any) -> str:
 
 
 def _parse_due_iso(s: Optional[str]) -> Optional[datetime]:
-    if not s:
-        return None
-    s = s.strip()
-    if s.endswith("Z"):
-        s = s.replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(s)
-    except Exception:
-        dt = dateparser.parse(s, settings={"PREFER_DATES_FROM": "future"})
-        return dt
+    # ISO first, then fast relative patterns, dateparser only as a last resort
+    return parse_due(s)
 
 
 def _norm(s: str) -> str:
@@ -59,13 +55,83 @@ def _norm(s: str) -> str:
     return s
 
 
+def _json_from(resp: Any, required: Sequence[str] = ()) -> Dict[str, Any]:
+    """Decoded JSON body of a response; BadAIResponse when it's unusable."""
+    pf = getattr(resp, "prompt_feedback", None)
+    if pf and getattr(pf, "block_reason", None):
+        raise BadAIResponse(f"blocked_by_safety: {pf.block_reason}")
+
+    text_out = _get_resp_text(resp)
+    if not text_out:
+        raise BadAIResponse("empty_response_from_gemini")
+
+    try:
+        data = json.loads(text_out)
+    except ValueError as e:
+        raise BadAIResponse(f"invalid_json_from_gemini: {e}")
+    if not isinstance(data, dict):
+        raise BadAIResponse("invalid_json_from_gemini: not an object")
+
+    for k in required:
+        if k not in data:
+            raise BadAIResponse(f"missing_key_in_gemini_json: {k}")
+    return data
+
+
+def _generate(fn_name: str, prompt: str, parse: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Single choke point for model round-trips. Dispatches to the active backend
+    (backend/ai_backend.py: Gemini or the offline fake) behind the circuit
+    breaker and the per-request budget (see backend/resilience.py); raises
+    AIUnavailable when the provider is skipped, too slow or erroring.
+
+    `parse(resp)` runs inside the guarded call, so a response it rejects
+    (BadAIResponse) counts as a provider failure and a hedge can still win.
+    Returns parse's result, or the raw response without one.
+    """
+    tokens = prompts.count_tokens(prompt)
+    AI_PROMPT_TOKENS.observe(tokens, fn=fn_name)
+    note("prompt", fn=fn_name, tokens=tokens, chars=len(prompt))
+
+    backend = get_backend()
+    try:
+        backend.check()
+    except AIUnavailable as e:
+        AI_ERRORS.inc(fn=fn_name, reason=e.reason)
+        raise
+
+    def _attempt() -> Any:
+        resp = backend.generate(fn_name, prompt)
+        return resp, (parse(resp) if parse is not None else resp)
+
+    start = time.perf_counter()
+    try:
+        resp, out = call_guarded(fn_name, _attempt)
+    except AIUnavailable as e:
+        if e.reason in ("circuit_open", "deadline_exceeded", "saturated"):
+            AI_ERRORS.inc(fn=fn_name, reason=e.reason)  # refused, never sent
+        else:
+            observe_ai_call(fn_name, time.perf_counter() - start, error=e.reason)
+        raise
+    observe_ai_call(fn_name, time.perf_counter() - start, resp)
+    return out
+
+
 # -------------------------
 # Gemini (RAW, creative pass)
 # -------------------------
 
+def _reconcile(proposed: str, existing: Sequence[str], session_id: Optional[str]) -> Any:
+    # with a session, repeat proposals come from its memo (backend/reconcile_memo.py)
+    if session_id is None:
+        return reconcile_category(proposed=proposed, existing=existing)
+    return reconcile_memo.resolve(session_id, proposed, existing)
+
+
 def categorize_and_enrich(
     text: str,
     existing_categories: Optional[Sequence[str]] = None,
+    session_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Path B:
@@ -75,92 +141,44 @@ def categorize_and_enrich(
 
     Also infers priority (1..5) and due_dt (datetime or None).
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-
-    genai.configure(api_key=api_key)
-
-    model = genai.GenerativeModel(
-        model_name=_MODEL,
-        generation_config={"response_mime_type": "application/json"},
-    )
-
     # IMPORTANT: We do NOT feed existing categories to Gemini here.
     # We want a truly "organic" raw proposal from the model.
-    user = f"""
-You are an API. Return JSON only—no prose, no markdown.
-
-Given a single to-do text, infer:
-- category_proposed: a short category string (<= 3 words). Use natural, human categories
-  like Errands/Groceries, Work, Health, Family, Personal, Finance, Travel, Study, etc.
-  Pick the most *sensible* everyday label for the task; do not overfit or invent niche labels.
-- priority: integer 1..5 (1=lowest, 5=highest) based on urgency/importance implied by the text.
-- due_dt_iso: an ISO 8601 datetime string with timezone offset if a due time/date is clearly implied, else null.
-- rationale: very short reason (one sentence).
-
-Rules:
-- If only a time is given (e.g., "by 17:30"), assume today in timezone "{TZ}"; if that time already passed,
-  roll to next day.
-- If only a day is given (e.g., "tomorrow", "next Monday"), default to 09:00 local time unless a time is stated.
-- Always return ISO 8601 with timezone offset (e.g., 2025-09-03T17:30:00-04:00).
-- Never return a datetime in the past relative to "{now_iso}".
-
-Input text:
-"{text.strip()}"
-
-Return JSON with exactly this shape:
-{{
-  "category_proposed": "string",
-  "priority": 1,
-  "due_dt_iso": "2025-09-02T18:00:00-04:00" | null,
-  "rationale": "string"
-}}
-"""
-
-    resp = model.generate_content(user)
-
-    pf = getattr(resp, "prompt_feedback", None)
-    if pf and getattr(pf, "block_reason", None):
-        raise RuntimeError(f"blocked_by_safety: {pf.block_reason}")
+    user = prompts.enrich_prompt(text)
 
-    text_out = _get_resp_text(resp)
-    if not text_out:
-        raise RuntimeError("empty_response_from_gemini")
-
-    try:
-        data = json.loads(text_out)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"invalid_json_from_gemini: {e}")
+    def _parse(resp: Any) -> Dict[str, Any]:
+        # Relaxed: we do NOT require "used_existing" from the model in Path B
+        data = _json_from(resp, ("category_proposed", "priority", "due_dt_iso"))
+        try:
+            data["priority"] = int(data["priority"])
+        except (TypeError, ValueError):
+            raise BadAIResponse(f"invalid_priority: {data['priority']!r}")
+        if data["priority"] < 1 or data["priority"] > 5:
+            raise BadAIResponse("priority_out_of_range")
+        return data
 
-    # Relaxed: we do NOT require "used_existing" from the model in Path B
-    for k in ("category_proposed", "priority", "due_dt_iso"):
-        if k not in data:
-            raise RuntimeError(f"missing_key_in_gemini_json: {k}")
+    data = _generate("categorize_and_enrich", user, _parse)
 
     proposed_raw = str(data["category_proposed"]).strip()
-    priority = int(data["priority"])
-    if priority < 1 or priority > 5:
-        raise RuntimeError("priority_out_of_range")
+    priority = data["priority"]
 
     due_dt = _parse_due_iso(data.get("due_dt_iso"))
 
-    # --- Debug before reconciliation
     existing_categories = list(existing_categories or [])
-    print("DEBUG — Raw category from Gemini:", proposed_raw)
-    print("DEBUG — Existing categories:", existing_categories)
 
     # -------------------------
     # Local reconciliation pass
     # -------------------------
-    final_category, rec_dbg = reconcile_category(
-        proposed=proposed_raw,
+    # thresholds/synonyms configurable via env or similarity.py defaults
+    final_category, rec_dbg = _reconcile(proposed_raw, existing_categories, session_id)
+    RECONCILE_METHOD.inc(method=rec_dbg["method"])
+    note(
+        "reconcile",
+        raw=proposed_raw,
+        final=final_category,
+        method=rec_dbg["method"],
+        scores=rec_dbg["scores"],
         existing=existing_categories,
-        # thresholds/synonyms configurable via env or similarity.py defaults
     )
-    print("DEBUG — Reconcile info:", rec_dbg)
-    print("DEBUG — Final category chosen:", final_category)
-    print(f"SAVE DEBUG — raw: {proposed_raw} | final: {final_category}")
 
     used_existing = _norm(final_category) in {_norm(c) for c in existing_categories}
 
@@ -178,59 +196,13 @@ Return JSON with exactly this shape:
 # -------------------------
 
 def parse_command_nlp(text: str, existing_categories: list[str]) -> dict:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
-
-    model = genai.GenerativeModel(
-        model_name=_MODEL,
-        generation_config={"response_mime_type": "application/json"},
-    )
+    prompt = prompts.command_prompt(text, existing_categories)
 
-    prompt = f"""
-You are an API. Return JSON only.
-
-Task:
-Parse this user command: "{text}"
-
-Context:
-- Existing categories: {existing_categories}
-- Valid actions: ["show", "complete_all", "delete_category", "summarize"]
-- Valid timeframes: ["today", "tomorrow", "this_week", "all"]
-
-Rules:
-- If user says things like "finish all", "mark everything done" → action=complete_all.
-- If user says "delete {{"some category"}}" → action=delete_category with category.
-- If user says "show all ..." → action=show with filters.
-- If timeframe not specified, set to "all".
-- If user says "summarize" (e.g. "summarize today") → action=summarize.
-- Always include a rationale.
-
-Return JSON:
-{{
-  "action": "show",
-  "category": "work",
-  "timeframe": "today",
-  "rationale": "User asked to show today's work tasks"
-}}
-"""
-
-    resp = model.generate_content(prompt)
-    text_out = _get_resp_text(resp)
-    if not text_out:
-        raise RuntimeError("empty_response_from_gemini")
-
-    try:
-        data = json.loads(text_out)
-    except Exception as e:
-        raise RuntimeError(f"invalid_json_from_gemini: {e}")
-
-    for k in ("action", "category", "timeframe", "rationale"):
-        if k not in data:
-            raise RuntimeError(f"missing_key_in_ai_response: {k}")
-
-    return data
+    return _generate(
+        "parse_command_nlp",
+        prompt,
+        lambda resp: _json_from(resp, ("action", "category", "timeframe", "rationale")),
+    )
 
 
 # -------------------------
@@ -287,50 +259,15 @@ def _fallback_narrative(task_slice: list[dict], intent: dict) -> str:
 
 
 def summarize_tasks(tasks: list[dict], intent: dict) -> dict:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
-
-    model = genai.GenerativeModel(
-        model_name=_MODEL,
-        generation_config={"response_mime_type": "application/json"},
-    )
-
     task_slice = tasks[:100]
 
-    prompt = f"""
-You are an API. Return JSON only.
-
-Create a summary of these tasks. The "narrative" must be 1–3 sentences, plain text, friendly, concise, and specific.
-
-Context:
-- Intent: {json.dumps(intent, ensure_ascii=False)}
-- Current time: {now_iso}
-- Tasks: {json.dumps(task_slice, default=str, ensure_ascii=False)}
-
-Return JSON:
-{{
-  "headline": "string",
-  "kpis": {{ "open": 0, "completed": 0, "overdue": 0, "due_today": 0 }},
-  "highlights": ["string"],
-  "by_category": [{{ "name": "Work", "open": 3, "done": 2 }}],
-  "urgent_ids": [1],
-  "overdue_ids": [2],
-  "markdown": "- bullet one\\n- bullet two",
-  "narrative": "Plain conversational recap"
-}}
-"""
-
-    resp = model.generate_content(prompt)
-    text_out = _get_resp_text(resp)
-    if not text_out:
-        raise RuntimeError("empty_response_from_gemini")
+    prompt, refs = prompts.summary_prompt(task_slice, intent)
 
-    try:
-        data = json.loads(text_out)
-    except Exception as e:
-        raise RuntimeError(f"invalid_json_from_gemini: {e}")
+    data = _generate("summarize_tasks", prompt, _json_from)
+
+    # the table addresses tasks by short refs; hand back real ids
+    for key in ("urgent_ids", "overdue_ids"):
+        data[key] = prompts.decode_refs(data.get(key), refs)
 
     nar = (data.get("narrative") or "").strip()
     md = (data.get("markdown") or "").strip()
@@ -345,70 +282,152 @@ Return JSON:
 # -------------------------
 
 def filter_tasks_with_ai(tasks: list[dict], category_query: str) -> list[dict]:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
-
-    model = genai.GenerativeModel(
-        model_name=_MODEL,
-        generation_config={"response_mime_type": "application/json"},
-    )
-
     task_slice = tasks[:100]
-    prompt = f"""
-You are an API. Return JSON only.
-
-From this list of tasks, select only those relevant to the user query.
-
-Query: "{category_query}"
-
-Tasks:
-{json.dumps(task_slice, ensure_ascii=False)}
-
-Return JSON:
-{{ "keep_ids": [1, 3, 7] }}
-"""
-    resp = model.generate_content(prompt)
+    prompt, refs = prompts.filter_prompt(task_slice, category_query)
+    resp = _generate("filter_tasks_with_ai", prompt)
     text_out = _get_resp_text(resp)
 
     try:
         data = json.loads(text_out)
-        keep_ids = set(data.get("keep_ids", []))
+        keep_ids = set(prompts.decode_refs(data.get("keep_ids", []), refs))
         return [t for t in tasks if t["id"] in keep_ids]
     except Exception:
         return tasks
 
 
 def detect_intent(user_text: str) -> dict:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
-
-    model = genai.GenerativeModel(
-        model_name=_MODEL,
-        generation_config={"response_mime_type": "application/json"},
-    )
+    prompt = prompts.intent_prompt(user_text)
 
-    prompt = f"""
-You are an API. Return JSON only.
+    return _generate("detect_intent", prompt, _json_from)
 
-Decide if the user is trying to ADD A TASK or issue a COMMAND.
+# -------------------------
+# Local fallbacks (degraded mode)
+# -------------------------
 
-Definitions:
-- "add_task": adding a new todo item (like "buy milk tomorrow").
-- "command": control requests (like "show all tasks", "summarize today", "delete category work", "complete all").
+# keyword -> category guess used when Gemini is unavailable; the guess is still
+# run through reconcile_category so it lands on the user's own categories.
+_KEYWORD_CATEGORIES: Dict[str, str] = {
+    "buy": "Errand", "pick": "Errand", "groceries": "Errand", "grocery": "Errand",
+    "milk": "Errand", "store": "Errand", "shop": "Errand", "shopping": "Errand",
+    "meeting": "Work", "meet": "Work", "email": "Work", "report": "Work",
+    "client": "Work", "deadline": "Work", "deploy": "Work", "review": "Work",
+    "gym": "Health", "run": "Health", "workout": "Health", "doctor": "Health",
+    "dentist": "Health", "yoga": "Health", "medicine": "Health",
+    "pay": "Finance", "bill": "Finance", "rent": "Finance", "bank": "Finance",
+    "tax": "Finance", "invoice": "Finance",
+    "call": "Family", "mom": "Family", "dad": "Family", "kids": "Family",
+    "study": "Study", "exam": "Study", "homework": "Study", "read": "Study",
+    "flight": "Travel", "hotel": "Travel", "pack": "Travel", "trip": "Travel",
+}
+
+
+def fallback_enrich(
+    text: str,
+    existing_categories: Optional[Sequence[str]] = None,
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Same shape as categorize_and_enrich, computed without Gemini."""
+    existing_categories = list(existing_categories or [])
+    guess = "Personal"
+    for word in _norm(text).split():
+        if word in _KEYWORD_CATEGORIES:
+            guess = _KEYWORD_CATEGORIES[word]
+            break
+
+    final_category, rec_dbg = _reconcile(guess, existing_categories, session_id)
+    RECONCILE_METHOD.inc(method=rec_dbg["method"])
+    used_existing = _norm(final_category) in {_norm(c) for c in existing_categories}
 
-Input: "{user_text}"
+    return {
+        "category": final_category.strip(),
+        "priority": 3,
+        "due_dt": None,
+        "raw_category": guess,
+        "used_existing": used_existing,
+        "degraded": True,
+    }
 
-Return JSON:
-{{
-  "intent": "add_task" | "command",
-  "rationale": "short one-sentence reason"
-}}
-"""
 
-    resp = model.generate_content(prompt)
-    text_out = _get_resp_text(resp)
-    return json.loads(text_out)
\ No newline at end of file
+def fallback_intent(user_text: str) -> dict:
+    """detect_intent via the CLI grammar (utils.parse_command)."""
+    cmd, _ = parse_command(user_text)
+    low = (user_text or "").strip().lower()
+    is_command = cmd != "add" or low.startswith(("summarize", "complete all", "finish all"))
+    return {
+        "intent": "command" if is_command else "add_task",
+        "rationale": f"local parser matched '{cmd}'",
+        "degraded": True,
+    }
+
+
+_TIMEFRAMES = ("today", "tomorrow", "this_week", "all")
+
+
+def fallback_command(text: str, existing_categories: list[str]) -> dict:
+    """parse_command_nlp via the CLI grammar plus a few NLP-only verbs."""
+    low = (text or "").strip().lower()
+    timeframe = "all"
+    for tf in _TIMEFRAMES:
+        if tf.replace("_", " ") in low or tf in low:
+            timeframe = tf
+            break
+
+    category = None
+    for c in existing_categories:
+        if c and _norm(c) in _norm(low).split():
+            category = c
+            break
+
+    if low.startswith("summar"):
+        action = "summarize"
+    elif low.startswith(("complete all", "finish all", "mark everything")):
+        action = "complete_all"
+    elif re.match(r"(del|delete|remove)\s+\D", low):
+        action = "delete_category"
+        if category is None:
+            category = low.split(None, 1)[1].strip()
+    else:
+        cmd, arg = parse_command(text)
+        action = "show"
+        if cmd == "show_category" and category is None and arg not in _TIMEFRAMES:
+            category = arg
+        elif cmd == "show_immediate":
+            timeframe = "today"
+
+    return {
+        "action": action,
+        "category": category,
+        "timeframe": timeframe,
+        "rationale": "local parser (AI unavailable)",
+        "degraded": True,
+    }
+
+
+def fallback_filter(tasks: list[dict], category_query: str) -> list[dict]:
+    """Substring match on category/text instead of filter_tasks_with_ai."""
+    q = _norm(category_query)
+    return [
+        t for t in tasks
+        if q in _norm(str(t.get("category", ""))) or q in _norm(str(t.get("text", "")))
+    ]
+
+
+def fallback_summary(task_slice: list[dict], intent: dict, kpis: dict, by_category: list[dict]) -> dict:
+    """summarize_tasks shape built from _fallback_narrative + SQL KPIs."""
+    narrative = _fallback_narrative(task_slice, intent)
+    now = datetime.now().isoformat()
+    overdue_ids = [
+        t["id"] for t in task_slice
+        if t.get("status") != "done" and t.get("due_dt") and str(t["due_dt"]) < now
+    ]
+    return {
+        "headline": f"{kpis.get('open', 0)} open, {kpis.get('overdue', 0)} overdue",
+        "kpis": kpis,
+        "highlights": [],
+        "by_category": by_category,
+        "urgent_ids": [t["id"] for t in task_slice if t.get("status") != "done" and int(t.get("priority") or 0) >= 4],
+        "overdue_ids": overdue_ids,
+        "markdown": "",
+        "narrative": narrative,
+        "degraded": True,
+    }
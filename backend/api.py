@@ -1,20 +1,60 @@
 # api.py
-from fastapi import FastAPI, HTTPException, Query, Header
+from fastapi import FastAPI, HTTPException, Query, Header, Request, Response
+import os
+import threading
 from typing import Optional
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, case, and_
 from backend.services import TaskService
 
 from backend.services import TaskService
 from backend.ai_client import parse_command_nlp, summarize_tasks, filter_tasks_with_ai 
-from backend.db import SessionLocal, TaskDB
+from backend.db import TaskDB, init_db, session_for
 from backend.ai_client import detect_intent
-
-
-
-
-app = FastAPI(title="Smart Todo (Gemini)")
+from backend.ai_client import (
+    fallback_intent, fallback_command, fallback_filter, fallback_summary,
+)
+from backend.resilience import AIUnavailable, request_budget
+from backend import metrics, profiling
+from backend.events import hub, sse_stream
+from backend.scheduler import scheduler
+from backend import admission, archive, idempotency, rollups, transfer, wire
+from backend.similarity import warmup as warmup_encoder
+
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    # room in the shared threadpool for every admission lane at once
+    admission.configure_threadpool()
+    # load/connect the sentence encoder in the background so the first
+    # add_task doesn't pay for it
+    if os.getenv("EMBED_WARMUP", "1") == "1":
+        threading.Thread(target=warmup_encoder, name="encoder-warmup", daemon=True).start()
+    # push due-soon/overdue events instead of clients polling /tasks/immediate
+    if os.getenv("DUE_SCHEDULER", "1") == "1":
+        scheduler.start()
+    # backfill + periodic drift correction of the stats rollups
+    stop_reconciler = rollups.start_reconciler()
+    # move long-done tasks to the archive table, then compact
+    stop_archiver = archive.start_archiver()
+    yield
+    stop_reconciler.set()
+    if stop_archiver is not None:
+        stop_archiver.set()
+    scheduler.stop()
+
+
+app = FastAPI(title="Smart Todo (Gemini)", lifespan=lifespan)
+app.router.route_class = profiling.route_class()
 
 
 class AddReq(BaseModel):
@@ -32,6 +72,11 @@ class NLPCommandReq(BaseModel):
     text: str
 
 
+class CategoryCorrectionReq(BaseModel):
+    proposed: str   # category as the AI proposes it, e.g. "Fitness"
+    category: str   # where the user wants such tasks filed, e.g. "Health"
+
+
 
 class SummaryReq(BaseModel):
     text: Optional[str] = None           # raw "summarize today"
@@ -40,50 +85,370 @@ class SummaryReq(BaseModel):
 
 
 
+app.add_middleware(wire.CompressionMiddleware)
+# shed requests get CORS headers and show up in the HTTP metrics
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],   # or ["http://localhost:5173"] for stricter
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Version", "Idempotent-Replayed"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of HTTP / SQL / AI metrics."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _require_debug(token: Optional[str]) -> None:
+    if not profiling.debug_allowed(token):
+        raise HTTPException(404, "Not Found")
+
+
+@app.get("/debug/requests")
+def debug_requests(
+    limit: int = 50,
+    route: Optional[str] = None,
+    session_id: Optional[str] = None,
+    min_ms: float = 0.0,
+    x_debug_token: Optional[str] = Header(default=None, alias="X-Debug-Token"),
+):
+    """Recent slow/profiled requests, newest first (summaries only, no session ids)."""
+    _require_debug(x_debug_token)
+    out = []
+    for tr in reversed(profiling.SLOW_LOG):
+        if route and tr.route != route:
+            continue
+        if session_id and tr.session_id != session_id:
+            continue
+        if tr.duration_ms < min_ms:
+            continue
+        out.append(tr.summary())
+        if len(out) >= limit:
+            break
+    return out
+
+
+@app.get("/debug/admission")
+def debug_admission(x_debug_token: Optional[str] = Header(default=None, alias="X-Debug-Token")):
+    """Per-lane admission state: running, queued, limits, recent service time."""
+    _require_debug(x_debug_token)
+    return {name: lane.snapshot() for name, lane in admission.lanes.items()}
+
+
+@app.get("/debug/requests/{req_id}")
+def debug_request_detail(
+    req_id: int,
+    x_debug_token: Optional[str] = Header(default=None, alias="X-Debug-Token"),
+):
+    """Full capture: SQL statements, AI calls, notes and top profile frames."""
+    _require_debug(x_debug_token)
+    tr = profiling.find(req_id)
+    if not tr:
+        raise HTTPException(404, "Request not captured (or evicted)")
+    return tr.to_dict()
+
+
+def _session_version(session_id: str) -> int:
+    with svc_for(session_id) as svc:
+        return svc.version()
+
+
+@app.get("/events")
+async def event_stream(
+    request: Request,
+    session_id: Optional[str] = Query(None),
+    since: Optional[int] = Query(None, ge=0),
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    """
+    Server-sent events for one session: the change feed (task.created /
+    task.updated / task.deleted, each with `seq`) plus task.due_soon /
+    task.overdue. Resume with ?since=N or Last-Event-ID; if the missed changes
+    are no longer buffered a single `reset` event is sent instead.
+    EventSource can't set headers, so ?session_id= is accepted too.
+    """
+    sid = session_id or x_session_id or "public"
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    sub = hub.subscribe(sid)  # before reading the version, so nothing falls in between
+    backlog: list = []
+    after = 0
+    if since is not None:
+        current = await run_in_threadpool(_session_version, sid)
+        replayed = hub.replay(sid, since, current)
+        if replayed is not None:
+            backlog, after = replayed, since
+        else:
+            # live events continue from the server's seq, even if `since` was ahead
+            backlog, after = [{"type": "reset", "seq": current}], current
+    return StreamingResponse(
+        sse_stream(sub, request.is_disconnected, backlog, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _idempotent(route: str, payload, session_id: str, key: Optional[str], response: Response, handler):
+    """
+    Run `handler` at most once per (session, Idempotency-Key); see idempotency.py.
+    Without a key this is just `handler()`. Responses below 500 (including
+    HTTPExceptions) are stored and replayed with `Idempotent-Replayed: true`.
+    """
+    if not key:
+        return handler()
+
+    def run():
+        try:
+            return 200, jsonable_encoder(handler())
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+
+    try:
+        status, body, replayed = idempotency.store.run(
+            session_id, key, idempotency.fingerprint(route, payload), run
+        )
+    except idempotency.IdempotencyConflict as e:
+        raise HTTPException(409, str(e), headers={"Retry-After": "1"})
+    except idempotency.IdempotencyMismatch as e:
+        raise HTTPException(422, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    headers = {"Idempotent-Replayed": "true"} if replayed else {}
+    if status >= 400:
+        raise HTTPException(status, body.get("detail"), headers=headers or None)
+    response.headers.update(headers)
+    return body
+
 
 @app.post("/nlp/intent")
-def classify_intent(req: NLPCommandReq):
+def classify_intent(
+    req: NLPCommandReq,
+    response: Response,
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    return _idempotent(
+        "POST /nlp/intent", req.model_dump(), x_session_id, idempotency_key, response,
+        lambda: _classify_intent(req),
+    )
+
+
+def _classify_intent(req: NLPCommandReq):
     try:
-        intent = detect_intent(req.text)
+        with request_budget():
+            intent = detect_intent(req.text)
         return intent
+    except AIUnavailable:
+        return fallback_intent(req.text)
     except Exception as e:
         raise HTTPException(500, str(e))
 
 @app.post("/tasks")
 def add_task(
-    req: AddReq, x_session_id: str = Header(default="public", alias="X-Session-Id")
+    req: AddReq,
+    response: Response,
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
+    return _idempotent(
+        "POST /tasks", req.model_dump(), x_session_id, idempotency_key, response,
+        lambda: _add_task(req, x_session_id),
+    )
+
+
+def _add_task(req: AddReq, x_session_id: str):
     try:
-        task = svc_for(x_session_id).add_task(req.text)
-        return task.model_dump()
+        with svc_for(x_session_id) as svc, request_budget():
+            task = svc.add_task(req.text)
+        out = task.model_dump()
+        if svc.last_degraded:
+            out["degraded"] = True
+        return out
     except Exception as e:
         raise HTTPException(500, str(e))
 
 
+_SHAPE = Query("rows", pattern="^(rows|columnar)$", description="columnar: one array per field")
+
+
 @app.get("/tasks")
 def list_tasks(
+    request: Request,
     category: Optional[str] = Query(None),
+    shape: str = _SHAPE,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
 ):
-    tasks = svc_for(x_session_id).list_tasks(category=category)
-    return [t.model_dump() for t in tasks]
+    """Tasks of the session; JSON or msgpack (Accept), rows or columnar (see wire.py)."""
+    with svc_for(x_session_id) as svc:
+        # read first: the list is at least this fresh, so resuming the change
+        # feed from it never misses a write
+        version = svc.version()
+        tasks = svc.list_tasks(category=category)
+    return wire.render(
+        [t.model_dump() for t in tasks], request.headers.get("accept"), shape,
+        headers={"X-Session-Version": str(version)},
+    )
+
+
+@app.get("/stats")
+def get_stats(x_session_id: str = Header(default="public", alias="X-Session-Id")):
+    """open / completed / overdue / due_today / total + per-category open/done."""
+    with svc_for(x_session_id) as svc:
+        return svc.stats()
+
+
+@app.get("/tasks/export")
+def export_tasks(request: Request, x_session_id: str = Header(default="public", alias="X-Session-Id")):
+    """All tasks of the session as streamed NDJSON, or msgpack maps (constant memory)."""
+    svc = svc_for(x_session_id)
+    svc.close()  # export pages use their own short-lived sessions
+    if wire.negotiate(request.headers.get("accept")) == wire.MSGPACK:
+        return StreamingResponse(
+            wire.stream_msgpack(svc.export_pages()),
+            media_type=wire.MSGPACK,
+            headers={
+                "Content-Disposition": f'attachment; filename="tasks-{x_session_id}.msgpack"',
+                "Vary": "Accept",
+            },
+        )
+    return StreamingResponse(
+        svc.export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="tasks-{x_session_id}.ndjson"', "Vary": "Accept"},
+    )
+
+
+@app.post("/tasks/import")
+async def import_tasks(
+    request: Request,
+    enrich: str = Query("missing", pattern="^(missing|all|none)$"),
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+):
+    """
+    Bulk import from a streamed NDJSON body, inserted in executemany batches.
+    enrich=missing (default) only calls the AI for rows lacking category,
+    priority or due_dt; enrich=none never does; enrich=all always does.
+    At most IMPORT_AI_MAX_ROWS rows per import are AI-enriched; the rest are
+    filled locally and counted in "over_ai_limit".
+    """
+    ai_left = [transfer.IMPORT_AI_MAX_ROWS]  # batches run one after another
+
+    def _batch(rows: list) -> dict:
+        # no request_budget: each AI call still has its own timeout, and a
+        # budget per batch would silently degrade everything after the first seconds
+        with svc_for(x_session_id) as svc:
+            res = svc.import_rows(rows, enrich, ai_rows=ai_left[0])
+        ai_left[0] -= res["enriched"]
+        return res
+
+    async def run_batch(rows: list) -> dict:
+        return await run_in_threadpool(_batch, list(rows))
+
+    try:
+        return await transfer.import_ndjson(request.stream(), run_batch)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@app.get("/tasks/archive")
+def list_archived(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, description="archive_id to continue after"),
+    q: Optional[str] = Query(None),
+    shape: str = _SHAPE,
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+):
+    """Archived done tasks, newest first; page with ?before=<last archive_id>."""
+    with svc_for(x_session_id) as svc:
+        rows = svc.archived(limit=limit, before=before, q=q)
+    return wire.render(rows, request.headers.get("accept"), shape)
+
+
+@app.post("/tasks/archive/{archive_id}/restore")
+def restore_archived(
+    archive_id: int,
+    response: Response,
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    return _idempotent(
+        "POST /tasks/archive/restore", {"archive_id": archive_id}, x_session_id, idempotency_key, response,
+        lambda: _restore_archived(archive_id, x_session_id),
+    )
+
+
+def _restore_archived(archive_id: int, x_session_id: str):
+    with svc_for(x_session_id) as svc:
+        task = svc.restore(archive_id)
+    if not task:
+        raise HTTPException(404, "Archived task not found")
+    return task.model_dump()
+
+
+@app.get("/categories/memo")
+def list_category_memo(x_session_id: str = Header(default="public", alias="X-Session-Id")):
+    """Remembered AI-proposal → category decisions of the session (method "user" = correction)."""
+    with svc_for(x_session_id) as svc:
+        return svc.category_memo()
+
+
+@app.put("/categories/memo")
+def correct_category(
+    req: CategoryCorrectionReq,
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+):
+    """Record a correction; it overrides reconciliation for that proposal from now on."""
+    with svc_for(x_session_id) as svc:
+        try:
+            return svc.correct_category(req.proposed, req.category)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+
+@app.delete("/categories/memo")
+def forget_category(
+    proposed: str = Query(..., min_length=1),
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+):
+    with svc_for(x_session_id) as svc:
+        if not svc.forget_category(proposed):
+            raise HTTPException(404, "No memo entry for that proposal")
+    return {"ok": True}
+
+
+@app.get("/tasks/search")
+def search_tasks(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=200),
+    status: Optional[str] = Query(None),
+    x_session_id: str = Header(default="public", alias="X-Session-Id"),
+):
+    """Keyword search (FTS5, BM25-ranked, prefix matching) with <mark> snippets."""
+    with svc_for(x_session_id) as svc:
+        return svc.search(q, limit=limit, status=status)
 
 
 @app.get("/tasks/immediate")
 def list_immediate(
+    request: Request,
     hours: int = 24,
+    shape: str = _SHAPE,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
 ):
     cutoff = datetime.now() + timedelta(hours=hours)
-    tasks = svc_for(x_session_id).list_immediate(cutoff=cutoff)
-    return [t.model_dump() for t in tasks]
+    with svc_for(x_session_id) as svc:
+        tasks = svc.list_immediate(cutoff=cutoff)
+    return wire.render([t.model_dump() for t in tasks], request.headers.get("accept"), shape)
 
 
 @app.patch("/tasks/{task_id}")
@@ -92,10 +457,9 @@ def update_task(
     req: UpdateReq,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
 ):
-    svc = svc_for(x_session_id)
-
     if req.status == "done":
-        task = svc.mark_done(task_id)
+        with svc_for(x_session_id) as svc:
+            task = svc.mark_done(task_id)
         if not task:
             raise HTTPException(404, "Task not found or already done")
         return task.model_dump()
@@ -108,8 +472,8 @@ def delete_task(
     task_id: int,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
 ):
-    svc = svc_for(x_session_id)
-    task = svc.delete(task_id)
+    with svc_for(x_session_id) as svc:
+        task = svc.delete(task_id)
     if not task:
         raise HTTPException(404, "Task not found")
     return task.model_dump()
@@ -118,14 +482,23 @@ def delete_task(
 @app.post("/nlp/command")
 def nlp_command(
     req: NLPCommandReq,
+    response: Response,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
     """
     Accepts a natural language command (e.g. 'show all work tasks today')
     Returns structured intent JSON via AI.
     """
+    return _idempotent(
+        "POST /nlp/command", req.model_dump(), x_session_id, idempotency_key, response,
+        lambda: _nlp_command(req, x_session_id),
+    )
+
+
+def _nlp_command(req: NLPCommandReq, x_session_id: str):
     try:
-        db = SessionLocal()
+        db = session_for(x_session_id)
         # collect current categories for this session
         existing = [
             row[0]
@@ -136,92 +509,166 @@ def nlp_command(
         ]
         db.close()
 
-        intent = parse_command_nlp(req.text, existing_categories=existing)
+        try:
+            with request_budget():
+                intent = parse_command_nlp(req.text, existing_categories=existing)
+        except AIUnavailable:
+            intent = fallback_command(req.text, existing)
         return intent
     except Exception as e:
         raise HTTPException(500, str(e))
     
 
+def _sql_kpis(session_id: str, ids: list[int]) -> tuple[dict, list[dict]]:
+    """KPIs for the degraded summary, aggregated in SQL instead of by Gemini."""
+    now = datetime.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=1)
+    is_open = TaskDB.status == "open"
+    is_done = TaskDB.status == "done"
+
+    db = session_for(session_id)
+    try:
+        base = db.query(TaskDB).filter(TaskDB.session_id == session_id, TaskDB.id.in_(ids))
+        open_n, done_n, overdue_n, today_n = base.with_entities(
+            func.sum(case((is_open, 1), else_=0)),
+            func.sum(case((is_done, 1), else_=0)),
+            func.sum(case((and_(is_open, TaskDB.due_dt < now), 1), else_=0)),
+            func.sum(case((and_(is_open, TaskDB.due_dt >= start, TaskDB.due_dt < end), 1), else_=0)),
+        ).one()
+        by_category = [
+            {"name": name, "open": int(o or 0), "done": int(d or 0)}
+            for name, o, d in base.with_entities(
+                TaskDB.category,
+                func.sum(case((is_open, 1), else_=0)),
+                func.sum(case((is_done, 1), else_=0)),
+            ).group_by(TaskDB.category).all()
+        ]
+    finally:
+        db.close()
+
+    kpis = {
+        "open": int(open_n or 0),
+        "completed": int(done_n or 0),
+        "overdue": int(overdue_n or 0),
+        "due_today": int(today_n or 0),
+    }
+    return kpis, by_category
+
+
 @app.post("/summary")
 def generate_summary(
     req: SummaryReq,
+    response: Response,
     x_session_id: str = Header(default="public", alias="X-Session-Id"),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
     """
     Summarize the tasks for the user. if the 'text' is provided run through NLP Parser
     Else use timeframe/catgeory directly
+
+    Every AI step has a local fallback; if any of them was used the response
+    carries "degraded": true.
     """
+    return _idempotent(
+        "POST /summary", req.model_dump(), x_session_id, idempotency_key, response,
+        lambda: _generate_summary(req, x_session_id),
+    )
 
-    try:
-        db = SessionLocal()
-
-        # 1. resolve intent
-        if req.text:
-            # collect catgeories for parser context
-            existing = [
-                row[0]
-                for row in db.query(TaskDB.category)
-                .filter(TaskDB.session_id == x_session_id)
-                .distinct()
-                .all()
-            ]
-            intent = parse_command_nlp(req.text, existing_categories=existing)
 
-        else:
-            intent = {
-                "action": "summarize",
-                "category": req.category,
-                "timeframe": req.timeframe or "all",
-                "rationale": "direct summary request"
-            }
-
-        # 2. select tasks by session
-        q = db.query(TaskDB).filter(TaskDB.session_id == x_session_id)
-
-        if intent.get("timeframe") == "today":
-            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            end = start + timedelta(days=1)
-            q = q.filter(TaskDB.due_dt >= start, TaskDB.due_dt < end)
-        elif intent.get("timeframe") == "this_week":
-            start = datetime.now() - timedelta(days=datetime.now().weekday())
-            end = start + timedelta(days=7)
-            q = q.filter(TaskDB.due_dt >= start, TaskDB.due_dt < end)
-
-        tasks = [
-            {
-                "id": t.id,
-                "text": t.text,
-                "category": t.category,
-                "status": t.status,
-                "priority": t.priority,
-                "due_dt": t.due_dt.isoformat() if t.due_dt else None,
-            }
-            for t in q.all()
-        ]
-        db.close()
+def _generate_summary(req: SummaryReq, x_session_id: str):
 
-        # NEW STEP: refine by category_query if it's not an exact match
-        category_query = intent.get("category")
-        if category_query:
-            existing_categories = {t["category"] for t in tasks}
-            if category_query not in existing_categories:
-                # call AI filter
-                tasks = filter_tasks_with_ai(tasks, category_query)
-
-        if not tasks:
-            return {
-                "headline": "No tasks matched your request",
-                "kpis": { "open": 0, "completed": 0, "overdue": 0, "due_today": 0 },
-                "highlights": [],
-                "by_category": [],
-                "urgent_ids": [],
-                "overdue_ids": [],
-                "markdown": f"No tasks found for '{category_query}' in {intent.get('timeframe')}"
-            }
-
-        # 3. Call summarizer
-        summary = summarize_tasks(tasks, intent)
+    try:
+        degraded = False
+        db = session_for(x_session_id)
+
+        with request_budget():
+            # 1. resolve intent
+            if req.text:
+                # collect catgeories for parser context
+                existing = [
+                    row[0]
+                    for row in db.query(TaskDB.category)
+                    .filter(TaskDB.session_id == x_session_id)
+                    .distinct()
+                    .all()
+                ]
+                try:
+                    intent = parse_command_nlp(req.text, existing_categories=existing)
+                except AIUnavailable:
+                    intent = fallback_command(req.text, existing)
+                    degraded = True
+
+            else:
+                intent = {
+                    "action": "summarize",
+                    "category": req.category,
+                    "timeframe": req.timeframe or "all",
+                    "rationale": "direct summary request"
+                }
+
+            # 2. select tasks by session
+            q = db.query(TaskDB).filter(TaskDB.session_id == x_session_id)
+
+            if intent.get("timeframe") == "today":
+                start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                end = start + timedelta(days=1)
+                q = q.filter(TaskDB.due_dt >= start, TaskDB.due_dt < end)
+            elif intent.get("timeframe") == "this_week":
+                start = datetime.now() - timedelta(days=datetime.now().weekday())
+                end = start + timedelta(days=7)
+                q = q.filter(TaskDB.due_dt >= start, TaskDB.due_dt < end)
+
+            tasks = [
+                {
+                    "id": t.id,
+                    "text": t.text,
+                    "category": t.category,
+                    "status": t.status,
+                    "priority": t.priority,
+                    "due_dt": t.due_dt.isoformat() if t.due_dt else None,
+                }
+                for t in q.all()
+            ]
+            db.close()
+
+            # NEW STEP: refine by category_query if it's not an exact match
+            category_query = intent.get("category")
+            if category_query:
+                existing_categories = {t["category"] for t in tasks}
+                if category_query not in existing_categories:
+                    # call AI filter
+                    try:
+                        tasks = filter_tasks_with_ai(tasks, category_query)
+                    except AIUnavailable:
+                        tasks = fallback_filter(tasks, category_query)
+                        degraded = True
+
+            if not tasks:
+                empty = {
+                    "headline": "No tasks matched your request",
+                    "kpis": { "open": 0, "completed": 0, "overdue": 0, "due_today": 0 },
+                    "highlights": [],
+                    "by_category": [],
+                    "urgent_ids": [],
+                    "overdue_ids": [],
+                    "markdown": f"No tasks found for '{category_query}' in {intent.get('timeframe')}"
+                }
+                if degraded:
+                    empty["degraded"] = True
+                return empty
+
+            # 3. Call summarizer
+            try:
+                summary = summarize_tasks(tasks, intent)
+            except AIUnavailable:
+                kpis, by_category = _sql_kpis(x_session_id, [t["id"] for t in tasks])
+                summary = fallback_summary(tasks[:100], intent, kpis, by_category)
+                degraded = True
+
+        if degraded:
+            summary["degraded"] = True
         return summary
 
     except Exception as e:
-        raise HTTPException(500, str(e))
\ No newline at end of file
+        raise HTTPException(500, str(e))
@@ -0,0 +1,237 @@
+# archive.py
+"""
+Hot/cold split of task history: done tasks older than ARCHIVE_AFTER_DAYS move
+from `tasks` to `tasks_archive` (same shard file), so `tasks` — and every
+listing, DISTINCT-category query, summary scan and FTS lookup over it —
+stays proportional to active work instead of lifetime usage.
+
+- Opt-in: set ARCHIVE_AFTER_DAYS (e.g. 30) to enable it. Archived tasks
+  leave `GET /tasks` and listings, which existing deployments may not expect.
+- A daemon thread (`start_archiver`) runs a pass at startup and then every
+  ARCHIVE_INTERVAL_S. Each pass moves rows in ARCHIVE_BATCH-sized
+  transactions (INSERT … SELECT + DELETE) and pauses between batches, so
+  request writes are never locked out for long. Several workers running it
+  at once is fine: each batch selects its rows under the write lock.
+- Each touched session gets a version bump and a `reset` change event (its
+  cached lists and open clients refetch). Rollups are unaffected: archived
+  rows still count as "done" (see rollups.reconcile).
+- After moving rows a pass returns up to VACUUM_PAGES free pages to the OS
+  (`PRAGMA incremental_vacuum`) and runs `PRAGMA optimize` (ANALYZE of the
+  tables whose statistics went stale). Files created before auto_vacuum was
+  enabled need one full VACUUM first: `python -m backend.archive --vacuum`.
+- Archived tasks stay reachable through `GET /tasks/archive` (keyset pages,
+  optional text filter) and `POST /tasks/archive/{archive_id}/restore`.
+
+    python -m backend.archive               # one pass now (--days, default ARCHIVE_AFTER_DAYS or 30)
+    python -m backend.archive --vacuum      # + full VACUUM (enables incremental vacuum)
+
+Environment variables (optional)
+--------------------------------
+ARCHIVE_AFTER_DAYS : archive tasks done for longer than this; 0 disables (default: 0, disabled)
+ARCHIVE_INTERVAL_S : seconds between passes (default: 3600)
+ARCHIVE_BATCH      : rows moved per transaction (default: 500)
+VACUUM_PAGES       : max free pages released per pass (default: 2000)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert, delete, literal, text, DateTime
+from sqlalchemy.engine import Engine
+
+from backend.db import TaskDB, TaskArchiveDB, engines
+from backend.events import hub
+from backend.metrics import Counter
+from backend.task_cache import bump_version
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+# age used by explicit passes (`python -m backend.archive`, run_once()) when
+# ARCHIVE_AFTER_DAYS leaves the background archiver off
+DEFAULT_DAYS = ARCHIVE_AFTER_DAYS if ARCHIVE_AFTER_DAYS > 0 else 30.0
+ARCHIVE_INTERVAL_S = float(os.getenv("ARCHIVE_INTERVAL_S", "3600"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "500"))
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "2000"))
+BATCH_PAUSE_S = 0.05
+
+ARCHIVED = Counter("todo_tasks_archived_total", "Done tasks moved to the archive table.", ())
+VACUUMED = Counter("todo_vacuum_pages_total", "Free pages released by incremental vacuum.", ())
+
+_tasks = TaskDB.__table__
+_archive = TaskArchiveDB.__table__
+_MOVED = ("id", "session_id", "text", "category", "priority", "due_dt", "status", "created_at", "done_at")
+
+
+# ---------------------------
+# Moving rows
+# ---------------------------
+
+def archive_batch(conn: Any, cutoff: datetime, limit: int = ARCHIVE_BATCH) -> Tuple[int, Dict[str, int]]:
+    """Move up to `limit` tasks done before `cutoff`; returns (moved, {session_id: new version})."""
+    conn.execute(text("UPDATE tasks SET id = id WHERE 0"))  # write lock before choosing rows
+    rows = conn.execute(
+        select(_tasks.c.id, _tasks.c.session_id)
+        .where(_tasks.c.status == "done", _tasks.c.done_at < cutoff)
+        .order_by(_tasks.c.done_at)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return 0, {}
+    ids = [r.id for r in rows]
+    conn.execute(
+        insert(_archive).from_select(
+            [*_MOVED, "archived_at"],
+            select(*(_tasks.c[c] for c in _MOVED), literal(datetime.now(), DateTime))
+            .where(_tasks.c.id.in_(ids)),
+        )
+    )
+    conn.execute(delete(_tasks).where(_tasks.c.id.in_(ids)))
+    return len(ids), {sid: bump_version(conn, sid) for sid in {r.session_id for r in rows}}
+
+
+def compact(eng: Engine, pages: int = VACUUM_PAGES) -> int:
+    """Release free pages (if the file has incremental auto_vacuum) and refresh stats."""
+    if eng.dialect.name != "sqlite":
+        return 0
+    raw = eng.raw_connection()
+    try:
+        cur = raw.cursor()
+        freed = 0
+        if cur.execute("PRAGMA auto_vacuum").fetchone()[0] == 2 and pages > 0:
+            before = cur.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion (execute frees one page)
+            raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            freed = before - cur.execute("PRAGMA freelist_count").fetchone()[0]
+        cur.execute("PRAGMA analysis_limit = 400")
+        cur.execute("PRAGMA optimize")
+        cur.close()
+    finally:
+        raw.close()
+    if freed:
+        VACUUMED.inc(freed)
+    return freed
+
+
+def vacuum(eng: Engine) -> None:
+    """Full VACUUM; also switches a pre-existing file to incremental auto_vacuum."""
+    raw = eng.raw_connection()
+    try:
+        raw.driver_connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+    finally:
+        raw.close()
+
+
+def run_once(older_than: Optional[timedelta] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """One archival pass over every shard; returns {"archived": n, "sessions": k, "freed_pages": p}."""
+    age = older_than if older_than is not None else timedelta(days=DEFAULT_DAYS)
+    cutoff = (now or datetime.now()) - age
+    total, freed = 0, 0
+    touched: Dict[str, int] = {}
+    for eng in engines:
+        moved_here = 0
+        while True:
+            with eng.begin() as conn:
+                moved, versions = archive_batch(conn, cutoff)
+            if not moved:
+                break
+            moved_here += moved
+            touched.update(versions)
+            time.sleep(BATCH_PAUSE_S)  # let queued request writes in
+        total += moved_here
+        freed += compact(eng)
+    for sid, version in touched.items():
+        hub.publish_change(sid, {"type": "reset", "seq": version})
+    if total:
+        ARCHIVED.inc(total)
+        log.info("archived %d done task(s) from %d session(s); freed %d page(s)", total, len(touched), freed)
+    return {"archived": total, "sessions": len(touched), "freed_pages": freed}
+
+
+def start_archiver() -> Optional[threading.Event]:
+    """Archive now, then every ARCHIVE_INTERVAL_S in a daemon thread (None if disabled)."""
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while True:
+            try:
+                run_once()
+            except Exception:
+                log.exception("archive pass failed")
+            if stop.wait(ARCHIVE_INTERVAL_S):
+                return
+
+    threading.Thread(target=_loop, name="task-archiver", daemon=True).start()
+    return stop
+
+
+# ---------------------------
+# Reading / restoring
+# ---------------------------
+
+def list_archived(
+    db: Any, session_id: str, limit: int = 50, before: Optional[int] = None, q: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Archived tasks of a session, most recently archived first (keyset on archive_id)."""
+    stmt = select(_archive).where(_archive.c.session_id == session_id)
+    if before is not None:
+        stmt = stmt.where(_archive.c.archive_id < before)
+    if q:
+        stmt = stmt.where(_archive.c.text.contains(q, autoescape=True))  # % and _ match literally
+    rows = db.execute(stmt.order_by(_archive.c.archive_id.desc()).limit(limit)).mappings()
+    return [dict(r) for r in rows]
+
+
+def restore(db: Any, session_id: str, archive_id: int) -> Optional[TaskDB]:
+    """Move one archived task back into `tasks` (caller commits). Keeps its id unless reused."""
+    row = db.execute(
+        select(_archive).where(_archive.c.archive_id == archive_id, _archive.c.session_id == session_id)
+    ).mappings().first()
+    if row is None:
+        return None
+    values = {c: row[c] for c in _MOVED}
+    values["done_at"] = datetime.now()  # a full archive age before it goes back
+    if db.execute(select(_tasks.c.id).where(_tasks.c.id == row["id"])).first() is not None:
+        del values["id"]
+    obj = TaskDB(**values)
+    db.add(obj)
+    db.execute(delete(_archive).where(_archive.c.archive_id == archive_id))
+    db.flush()
+    return obj
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument(
+        "--days",
+        type=float,
+        default=DEFAULT_DAYS,
+        help="archive tasks done longer ago than this",
+    )
+    ap.add_argument("--vacuum", action="store_true", help="full VACUUM of every shard afterwards")
+    args = ap.parse_args(argv)
+
+    from backend.db import init_db
+    init_db()
+    report = run_once(timedelta(days=args.days))
+    print(f"archived {report['archived']} task(s) from {report['sessions']} session(s), "
+          f"freed {report['freed_pages']} page(s)")
+    if args.vacuum:
+        for eng in engines:
+            vacuum(eng)
+            print(f"vacuumed {eng.url}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# dates.py
+"""
+Layered due-date parser: cheap precompiled patterns first, dateparser last.
+
+Layers (first hit wins)
+-----------------------
+1) ISO 8601 via datetime.fromisoformat (a trailing "Z" is accepted)
+2) Relative phrases, anchored on the whole phrase, e.g.
+     "tomorrow 7am", "by 17:30", "next monday", "friday at 3pm",
+     "in 2 hours", "in 3 days", "tonight", "today at noon"
+   Same rules as the enrichment prompt: a bare time is today (rolled to
+   tomorrow if already passed); a bare day defaults to 09:00. A bare
+   "today"/"tonight" whose default time already passed means end of day.
+3) dateparser, through a DateDataParser restricted to DATEPARSER_LANGUAGES
+   (default "en"), so language detection is skipped. Relative phrases are
+   resolved against the caller's `now` (RELATIVE_BASE); parsers are reused
+   per reference minute.
+
+Results are memoized per (phrase, reference time to the minute).
+
+Environment variables (optional)
+--------------------------------
+DATEPARSER_LANGUAGES : comma-separated language codes for the fallback (default: "en")
+DATE_PARSE_CACHE     : memo size (default: 4096)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+DEFAULT_DAY_TIME = (9, 0)
+END_OF_DAY = (23, 59)
+
+_WEEKDAYS = {
+    "mon": 0, "monday": 0,
+    "tue": 1, "tues": 1, "tuesday": 1,
+    "wed": 2, "weds": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3,
+    "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5,
+    "sun": 6, "sunday": 6,
+}
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                 "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "couple": 2}
+_UNITS = {"min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+          "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+          "day": "days", "days": "days", "week": "weeks", "weeks": "weeks"}
+
+_PREFIX = r"(?:(?:by|at|on|due|before|until|for)\s+)?"
+_TIME = (
+    r"(?:(?P<named>noon|midday|midnight|eod|end of day)"
+    r"|(?P<h>\d{1,2})(?::(?P<m>\d{2}))?\s*(?P<ap>am|pm|a\.m\.|p\.m\.)?)"
+)
+_DAY = (
+    r"(?P<day>today|tonight|tomorrow|tmrw|tmr|day after tomorrow"
+    r"|(?:(?P<rel>next|this|coming)\s+)?(?P<wd>" + "|".join(sorted(_WEEKDAYS, key=len, reverse=True)) + r")"
+    r"|next week)"
+)
+
+_RE_IN = re.compile(
+    r"^(?:in|within)\s+(?P<n>\d+|" + "|".join(_NUMBER_WORDS) + r")(?:\s+of)?\s+(?P<unit>"
+    + "|".join(sorted(_UNITS, key=len, reverse=True)) + r")$"
+)
+_RE_DAY_TIME = re.compile(rf"^{_PREFIX}{_DAY}(?:\s*(?:,|at|by|@)?\s*{_TIME})?$")
+_RE_TIME_DAY = re.compile(rf"^{_PREFIX}{_TIME}\s+(?:on\s+)?{_DAY}$")
+_RE_TIME = re.compile(rf"^(?P<pre>(?:by|at|before|until|due)\s+)?{_TIME}$")
+_RE_SPACES = re.compile(r"\s+")
+
+
+# ---------------------------
+# Fast path
+# ---------------------------
+
+def _clock(m: "re.Match[str]") -> Optional[Tuple[int, int]]:
+    named = m.group("named")
+    if named:
+        return {"noon": (12, 0), "midday": (12, 0), "midnight": (23, 59),
+                "eod": (17, 0), "end of day": (17, 0)}[named]
+    if m.group("h") is None:
+        return None
+    h = int(m.group("h"))
+    mi = int(m.group("m") or 0)
+    ap = (m.group("ap") or "").replace(".", "")
+    if ap:
+        if not 1 <= h <= 12:
+            return (-1, -1)
+        if ap == "pm" and h != 12:
+            h += 12
+        elif ap == "am" and h == 12:
+            h = 0
+    if h > 23 or mi > 59:
+        return (-1, -1)
+    return h, mi
+
+
+def _day_offset(m: "re.Match[str]", now: datetime, clock: Optional[Tuple[int, int]]) -> Optional[int]:
+    day = m.group("day")
+    if day == "today":
+        return 0
+    if day == "tonight":
+        return 0
+    if day in ("tomorrow", "tmrw", "tmr"):
+        return 1
+    if day == "day after tomorrow":
+        return 2
+    if day == "next week":
+        return 7
+    wd = _WEEKDAYS.get(m.group("wd") or "")
+    if wd is None:
+        return None
+    ahead = (wd - now.weekday()) % 7
+    if ahead == 0:
+        # "monday" on a monday: later today if the time is still ahead, else next week
+        if m.group("rel") == "next":
+            ahead = 7
+        elif clock is None or (clock[0], clock[1]) <= (now.hour, now.minute):
+            ahead = 7
+    return ahead
+
+
+def _fast_parse(phrase: str, now: datetime) -> Optional[datetime]:
+    m = _RE_IN.match(phrase)
+    if m:
+        n = m.group("n")
+        qty = int(n) if n.isdigit() else _NUMBER_WORDS[n]
+        return now + timedelta(**{_UNITS[m.group("unit")]: qty})
+
+    m = _RE_DAY_TIME.match(phrase) or _RE_TIME_DAY.match(phrase)
+    if m:
+        clock = _clock(m)
+        if clock == (-1, -1):
+            return None
+        offset = _day_offset(m, now, clock)
+        if offset is None:
+            return None
+        explicit = clock is not None
+        if clock is None:
+            clock = (20, 0) if m.group("day") == "tonight" else DEFAULT_DAY_TIME
+        base = (now + timedelta(days=offset)).replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+        if not explicit and offset == 0 and base <= now:
+            # "today" at 15:30: still today, by end of day (not 09:00 this morning)
+            base = base.replace(hour=END_OF_DAY[0], minute=END_OF_DAY[1])
+        return base
+
+    m = _RE_TIME.match(phrase)
+    # a bare number ("5") is too ambiguous; require ":mm", am/pm, a name or a prefix
+    if m and (m.group("named") or m.group("m") or m.group("ap") or m.group("pre")):
+        clock = _clock(m)
+        if clock is None or clock == (-1, -1):
+            return None
+        dt = now.replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+        if dt <= now:
+            dt += timedelta(days=1)
+        return dt
+    return None
+
+
+def _normalize(text: str) -> str:
+    return _RE_SPACES.sub(" ", text.strip().lower()).rstrip(".!?,;")
+
+
+# ---------------------------
+# dateparser fallback (one reused, language-restricted parser)
+# ---------------------------
+
+@lru_cache(maxsize=8)
+def _parser_for(ref_minute: datetime) -> Any:
+    # RELATIVE_BASE is fixed per parser; language data is loaded once and shared
+    from dateparser.date import DateDataParser
+
+    langs = [x.strip() for x in os.getenv("DATEPARSER_LANGUAGES", "en").split(",") if x.strip()]
+    return DateDataParser(
+        languages=langs, settings={"PREFER_DATES_FROM": "future", "RELATIVE_BASE": ref_minute}
+    )
+
+
+def _dateparser_parse(text: str, now: datetime) -> Optional[datetime]:
+    try:
+        return _parser_for(now).get_date_data(text).date_obj
+    except Exception:
+        return None
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+
+@lru_cache(maxsize=int(os.getenv("DATE_PARSE_CACHE", "4096")))
+def _parse_memo(phrase: str, ref_minute: datetime) -> Tuple[Optional[datetime], str]:
+    # ISO 8601
+    iso = phrase[:-1] + "+00:00" if phrase.endswith(("z", "Z")) else phrase
+    try:
+        return datetime.fromisoformat(iso), "iso"
+    except ValueError:
+        pass
+
+    norm = _normalize(phrase)
+    dt = _fast_parse(norm, ref_minute)
+    if dt is not None:
+        return dt, "fast"
+    return _dateparser_parse(phrase, ref_minute), "dateparser"
+
+
+def parse_due(text: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """Parse a due-date phrase; None if nothing matches."""
+    dt, _ = parse_due_with_layer(text, now)
+    return dt
+
+
+def parse_due_with_layer(
+    text: Optional[str], now: Optional[datetime] = None
+) -> Tuple[Optional[datetime], Optional[str]]:
+    """Like parse_due, but also returns which layer answered (iso/fast/dateparser)."""
+    if not text or not text.strip():
+        return None, None
+    now = now or datetime.now()
+    ref = now.replace(second=0, microsecond=0)
+    return _parse_memo(text.strip(), ref)
+
+
+def cache_clear() -> None:
+    _parse_memo.cache_clear()
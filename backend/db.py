@@ -1,12 +1,36 @@
 # db.py
+"""
+SQLite storage, optionally hash-sharded by session_id.
+
+Sessions never query across each other, so each one is routed to one of N
+SQLite files by a stable hash (jump consistent hash over blake2b) with its
+own engine and connection pool — N independent write locks instead of one.
+Growing N → M with jump hash moves only ~(M-N)/M of the sessions; see
+`python -m backend.reshard` to move them offline.
+
+Shard files: shard 0 is TODO_DB_PATH itself, shard i is the same path with
+"-i" before the extension (tasks.db, tasks-1.db, tasks-2.db, ...), so going
+from 1 to N shards keeps the existing file in place.
+
+Environment variables (optional)
+--------------------------------
+TODO_DB_PATH       : SQLAlchemy URL of shard 0 (default: "sqlite:///tasks.db")
+TODO_DB_SHARDS     : number of shards (default: 1)
+TODO_DB_SHARD_URLS : comma-separated explicit URLs, one per shard (overrides both above)
+"""
+
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
-from sqlalchemy.orm import sessionmaker, declarative_base
+import hashlib
+from sqlalchemy import create_engine, update, Column, Float, Integer, String, DateTime, Text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from datetime import datetime
+from typing import List
+
+from backend.metrics import instrument_engine
+from backend import search
 
 DB_PATH = os.getenv("TODO_DB_PATH", "sqlite:///tasks.db")
-engine = create_engine(DB_PATH, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
 
@@ -19,9 +43,178 @@ class TaskDB(Base):
     due_dt = Column(DateTime, nullable=True)
     status = Column(String(20), default="open")
     created_at = Column(DateTime, default=datetime.utcnow)
+    done_at = Column(DateTime, nullable=True, index=True)  # set by mark_done; drives archival
 
     # NEW: per-visitor isolation without login
     session_id = Column(String(64), index=True, nullable=False, default="public")
 
+
+class TaskArchiveDB(Base):
+    """Done tasks moved out of `tasks` by the archiver (see archive.py).
+    `id` is the task's id at archive time; SQLite may hand it out again to a
+    new task, so archived rows are addressed by `archive_id`."""
+    __tablename__ = "tasks_archive"
+    __table_args__ = {"sqlite_autoincrement": True}
+    archive_id = Column(Integer, primary_key=True)
+    id = Column(Integer, nullable=False)
+    session_id = Column(String(64), index=True, nullable=False)
+    text = Column(Text, nullable=False)
+    category = Column(String(50))
+    priority = Column(Integer)
+    due_dt = Column(DateTime, nullable=True)
+    status = Column(String(20), default="done")
+    created_at = Column(DateTime)
+    done_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False)
+
+
+class SessionVersionDB(Base):
+    """Bumped in the same transaction as every task mutation of a session;
+    lets each worker tell whether its cached copy is still current."""
+    __tablename__ = "session_versions"
+    session_id = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TaskRollupDB(Base):
+    """Task counts per bucket, maintained by TaskService (see rollups.py)."""
+    __tablename__ = "task_rollups"
+    session_id = Column(String(64), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    due_day = Column(String(10), primary_key=True)  # "YYYY-MM-DD"; "" = no due date / done
+    n = Column(Integer, nullable=False, default=0)
+
+
+class ReconcileMemoDB(Base):
+    """Remembered reconcile_category decisions per session (see reconcile_memo.py)."""
+    __tablename__ = "reconcile_memo"
+    session_id = Column(String(64), primary_key=True)
+    proposal = Column(String(100), primary_key=True)  # normalized proposed category
+    final = Column(String(50), nullable=False)
+    method = Column(String(32), nullable=False)  # cascade method, or "user" for corrections
+    score = Column(Float, nullable=True)
+    categories_sig = Column(String(16), nullable=False, default="")  # category set it was decided against
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class IdempotencyKeyDB(Base):
+    """Claimed Idempotency-Key values and their stored responses (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+    session_id = Column(String(64), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # route + request body
+    state = Column(String(10), nullable=False)  # "pending" | "done"
+    status = Column(Integer, nullable=True)
+    body = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class JobLeaseDB(Base):
+    """Which process currently runs a periodic job (see leases.py; shard 0 only)."""
+    __tablename__ = "job_leases"
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)  # "host:pid"
+    expires_at = Column(Float, nullable=False)  # Unix time
+
+
+# ---------------------------
+# Shard routing
+# ---------------------------
+
+def shard_urls(n: int, base: str = DB_PATH) -> List[str]:
+    """URLs of an n-shard layout derived from `base` (shard 0 is `base`)."""
+    explicit = os.getenv("TODO_DB_SHARD_URLS")
+    if explicit and base == DB_PATH:
+        urls = [u.strip() for u in explicit.split(",") if u.strip()]
+        if len(urls) < n:
+            raise RuntimeError(f"TODO_DB_SHARD_URLS lists {len(urls)} shards, need {n}")
+        return urls[:n]
+    if n > 1 and base.rstrip("/") in ("sqlite:", "sqlite://", "sqlite:///:memory:"):
+        raise RuntimeError("sharding needs a file-backed TODO_DB_PATH")
+    root, ext = os.path.splitext(base)
+    return [base] + [f"{root}-{i}{ext}" for i in range(1, n)]
+
+
+def _jump_hash(key: int, buckets: int) -> int:
+    # Lamping & Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_index(session_id: str, n: int) -> int:
+    """Stable shard for a session (independent of PYTHONHASHSEED)."""
+    if n <= 1:
+        return 0
+    key = int.from_bytes(hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest(), "big")
+    return _jump_hash(key, n)
+
+
+def make_engine(url: str) -> Engine:
+    eng = create_engine(url, echo=False, future=True)
+    instrument_engine(eng)
+    return eng
+
+
+SHARD_URLS = shard_urls(
+    int(os.getenv("TODO_DB_SHARDS", "0"))
+    or len([u for u in os.getenv("TODO_DB_SHARD_URLS", "").split(",") if u.strip()])
+    or 1
+)
+engines: List[Engine] = [make_engine(u) for u in SHARD_URLS]
+sessionmakers: List[sessionmaker] = [
+    sessionmaker(bind=e, autoflush=False, autocommit=False) for e in engines
+]
+
+# shard 0; what the single-file layout always used
+engine = engines[0]
+SessionLocal = sessionmakers[0]
+
+
+def sessionmaker_for(session_id: str) -> sessionmaker:
+    return sessionmakers[shard_index(session_id, len(sessionmakers))]
+
+
+def session_for(session_id: str) -> Session:
+    """New ORM session on the shard that owns `session_id`."""
+    return sessionmaker_for(session_id)()
+
+
+def engine_for(session_id: str) -> Engine:
+    return engines[shard_index(session_id, len(engines))]
+
+
+def _upgrade(eng: Engine) -> None:
+    """Columns added after a database was first created (create_all never alters)."""
+    with eng.begin() as conn:
+        cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(tasks)")}
+        if "done_at" not in cols:
+            conn.exec_driver_sql("ALTER TABLE tasks ADD COLUMN done_at DATETIME")
+            # tasks already done start their archive clock now
+            conn.execute(
+                update(TaskDB.__table__)
+                .where(TaskDB.__table__.c.status == "done")
+                .values(done_at=datetime.now())
+            )
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tasks_done_at ON tasks (done_at)")
+
+
+def create_schema(eng: Engine) -> None:
+    sqlite = eng.dialect.name == "sqlite"
+    if sqlite:
+        with eng.connect() as conn:
+            # only takes effect on a new file; `python -m backend.archive --vacuum` converts old ones
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    Base.metadata.create_all(bind=eng)
+    if sqlite:
+        _upgrade(eng)
+    search.install(eng)  # FTS5 index + sync triggers
+
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    for e in engines:
+        create_schema(e)
@@ -0,0 +1,271 @@
+# embed_server.py
+"""
+Shared sentence-encoder service for multi-worker deployments.
+
+One process loads (and warms) the SentenceTransformer once and serves every
+uvicorn worker over a Unix socket; concurrent requests are micro-batched into
+a single `model.encode` call.
+
+    python -m backend.embed_server --socket /tmp/todo-embed.sock
+    EMBED_SOCKET=/tmp/todo-embed.sock uvicorn backend.api:app --workers 4
+
+With EMBED_SOCKET set, `similarity._load_encoder` returns a client for this
+server instead of loading the model in-process.
+
+Wire protocol (both directions): 4-byte big-endian length + payload.
+  request  : JSON {"op": "encode", "texts": [...]} | {"op": "ping"}
+  response : JSON header {"n": k, "dim": d, "model": ...} followed by one more
+             frame with k*d little-endian float32 values; or {"error": "..."}
+
+Environment variables (optional)
+--------------------------------
+EMBED_SOCKET          : socket path (server default: /tmp/todo-embed.sock)
+EMBED_BATCH_WINDOW_MS : how long to gather requests into one batch (default: 3)
+EMBED_MAX_BATCH       : max texts per encode call (default: 128)
+EMBED_TIMEOUT_S       : client socket timeout (default: 2)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+from array import array
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+DEFAULT_SOCKET = "/tmp/todo-embed.sock"
+_LEN = struct.Struct(">I")
+
+
+# ---------------------------
+# Framing
+# ---------------------------
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embed socket closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (n,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    return _recv_exact(sock, n)
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(_LEN.pack(len(payload)) + payload)
+
+
+def _pack_vectors(vectors: Any) -> Tuple[int, int, bytes]:
+    rows = [list(map(float, v)) for v in vectors]
+    dim = len(rows[0]) if rows else 0
+    arr = array("f", (x for r in rows for x in r))
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return len(rows), dim, arr.tobytes()
+
+
+def _unpack_vectors(n: int, dim: int, raw: bytes) -> List[List[float]]:
+    arr = array("f")
+    arr.frombytes(raw)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return [arr[i * dim:(i + 1) * dim].tolist() for i in range(n)]
+
+
+# ---------------------------
+# Server
+# ---------------------------
+
+class MicroBatcher:
+    """Collects encode requests for a short window and runs them as one batch."""
+
+    def __init__(self, encode: Callable[[List[str]], Any], window_s: float, max_batch: int):
+        self.encode = encode
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._q: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        fut: Future = Future()
+        self._q.put((texts, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.window_s
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [t for req, _ in batch for t in req]
+            try:
+                vecs = self.encode(texts)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            i = 0
+            for req, fut in batch:
+                fut.set_result(vecs[i:i + len(req)])
+                i += len(req)
+
+
+def serve(
+    socket_path: str,
+    model_id: str,
+    encode: Optional[Callable[[List[str]], Any]] = None,
+) -> None:
+    """Load + warm the model (unless `encode` is given) and serve until killed."""
+    if encode is None:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_id)
+
+        def encode(texts: List[str]) -> Any:
+            return model.encode(texts, normalize_embeddings=True, batch_size=64)
+
+    _encode = encode
+
+    # warm up: first encode pays for lazy init / kernel selection
+    _encode(["warmup", "groceries", "work meeting"])
+
+    batcher = MicroBatcher(
+        _encode,
+        window_s=float(os.getenv("EMBED_BATCH_WINDOW_MS", "3")) / 1000.0,
+        max_batch=int(os.getenv("EMBED_MAX_BATCH", "128")),
+    )
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self) -> None:
+            sock = self.request
+            while True:
+                try:
+                    frame = _recv_frame(sock)
+                except (ConnectionError, OSError):
+                    return
+                try:
+                    req = json.loads(frame)
+                    if not isinstance(req, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:  # framing is intact, so the connection stays usable
+                    _send_frame(sock, json.dumps({"error": f"bad_request: {e}"}).encode())
+                    continue
+                try:
+                    if req.get("op") == "ping":
+                        _send_frame(sock, json.dumps({"model": model_id, "n": 0, "dim": 0}).encode())
+                        _send_frame(sock, b"")
+                        continue
+                    texts = [str(t) for t in req.get("texts", [])]
+                    vecs = batcher.submit(texts).result() if texts else []
+                    n, dim, raw = _pack_vectors(vecs)
+                    _send_frame(sock, json.dumps({"model": model_id, "n": n, "dim": dim}).encode())
+                    _send_frame(sock, raw)
+                except Exception as e:
+                    _send_frame(sock, json.dumps({"error": str(e)}).encode())
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    with Server(socket_path, Handler) as srv:
+        print(f"embed server: {model_id} ready on {socket_path}", flush=True)
+        try:
+            srv.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+# ---------------------------
+# Client
+# ---------------------------
+
+class EmbedClient:
+    """Thread-safe client; one persistent connection per calling thread."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = float(os.getenv("EMBED_TIMEOUT_S", "2")) if timeout is None else timeout
+        self._local = threading.local()
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, req: dict) -> Tuple[dict, bytes]:
+        for attempt in (0, 1):  # one reconnect on a stale connection
+            try:
+                sock = self._conn()
+                _send_frame(sock, json.dumps(req).encode())
+                head = json.loads(_recv_frame(sock))
+                if "error" in head:
+                    raise RuntimeError(f"embed_server_error: {head['error']}")
+                return head, _recv_frame(sock)
+            except (ConnectionError, OSError):
+                self._drop()
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def ping(self) -> str:
+        head, _ = self._call({"op": "ping"})
+        return head["model"]
+
+    def encode(self, texts: Sequence[str]) -> List[List[float]]:
+        head, raw = self._call({"op": "encode", "texts": list(texts)})
+        return _unpack_vectors(head["n"], head["dim"], raw)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Shared sentence-encoder server")
+    ap.add_argument("--socket", default=os.getenv("EMBED_SOCKET", DEFAULT_SOCKET))
+    ap.add_argument(
+        "--model",
+        default=os.getenv("SENTENCE_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"),
+    )
+    args = ap.parse_args(argv)
+    serve(args.socket, args.model)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
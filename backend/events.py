@@ -0,0 +1,205 @@
+# events.py
+"""
+In-process pub/sub of per-session events, delivered to clients over SSE.
+
+Publishers (TaskService in the threadpool, the due-time scheduler thread)
+call `hub.publish(session_id, event)` from any thread; each subscriber is an
+asyncio queue owned by one streaming response and is fed through
+`loop.call_soon_threadsafe`, so publishing never blocks on a slow client. A
+subscriber that falls SUBSCRIBER_QUEUE events behind loses the oldest ones.
+
+Events are plain dicts with a "type" key; `sse_format` renders one as a
+`text/event-stream` frame.
+
+Change feed
+-----------
+TaskService publishes task.created / task.updated / task.deleted with the
+full task and `seq` = the session's version after the write (see
+task_cache.bump_version), so sequence numbers are per session, monotonic and
+shared by all workers. The last REPLAY_BUFFER change events per session are
+kept; a client reconnecting with "resume from N" (`?since=N` or the
+Last-Event-ID header EventSource sends by itself) gets the missed events
+replayed if the buffer covers (N, current] without gaps, otherwise a single
+`reset` event telling it to refetch; so does a client ahead of the server
+(N > current, e.g. after the database was reset). Changes made through
+another worker never reach this worker's buffer, so they show up as a gap
+→ reset.
+
+Environment variables (optional)
+--------------------------------
+SUBSCRIBER_QUEUE : per-subscriber buffered events (default: 256)
+SSE_KEEPALIVE_S  : idle seconds between keep-alive comments (default: 15)
+REPLAY_BUFFER    : change events kept per session for resume (default: 256)
+REPLAY_SESSIONS  : sessions with a replay buffer, least recently written evicted (default: 10000)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import asyncio
+import threading
+from bisect import insort
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from backend.metrics import Counter, Gauge
+
+SUBSCRIBER_QUEUE = int(os.getenv("SUBSCRIBER_QUEUE", "256"))
+SSE_KEEPALIVE_S = float(os.getenv("SSE_KEEPALIVE_S", "15"))
+REPLAY_BUFFER = int(os.getenv("REPLAY_BUFFER", "256"))
+REPLAY_SESSIONS = int(os.getenv("REPLAY_SESSIONS", "10000"))
+
+EVENTS_PUBLISHED = Counter("todo_events_published_total", "Events published to the hub by type.", ("type",))
+EVENTS_DROPPED = Counter("todo_events_dropped_total", "Events dropped for subscribers that fell behind.", ())
+RESUMES = Counter("todo_event_resumes_total", "Stream resumes by outcome (replayed/reset/current).", ("result",))
+
+
+class Subscription:
+    def __init__(self, hub: "Hub", session_id: str, loop: asyncio.AbstractEventLoop):
+        self.hub = hub
+        self.session_id = session_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+
+    def _offer(self, event: Dict[str, Any]) -> None:
+        # runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            EVENTS_DROPPED.inc()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub._unsubscribe(self)
+
+
+class Hub:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subs: Dict[str, Set[Subscription]] = {}
+        # session_id -> [(seq, event)] sorted by seq; most recently written last
+        self._replay: "OrderedDict[str, List[Tuple[int, Dict[str, Any]]]]" = OrderedDict()
+
+    def subscribe(self, session_id: str) -> Subscription:
+        """Call from the event loop that will consume the subscription."""
+        sub = Subscription(self, session_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subs.setdefault(session_id, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.session_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.session_id]
+
+    def publish(self, session_id: str, event: Dict[str, Any]) -> None:
+        EVENTS_PUBLISHED.inc(type=event.get("type", "unknown"))
+        with self._lock:
+            subs: List[Subscription] = list(self._subs.get(session_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:  # loop already closed
+                self._unsubscribe(sub)
+
+    def publish_change(self, session_id: str, event: Dict[str, Any]) -> None:
+        """Publish a change event carrying `seq` and keep it for replay."""
+        seq = event["seq"]
+        with self._lock:
+            buf = self._replay.get(session_id)
+            if buf is None:
+                buf = self._replay[session_id] = []
+                if len(self._replay) > REPLAY_SESSIONS:
+                    self._replay.popitem(last=False)
+            self._replay.move_to_end(session_id)
+            insort(buf, (seq, event), key=lambda x: x[0])  # concurrent writers may publish out of order
+            if len(buf) > REPLAY_BUFFER:
+                del buf[: len(buf) - REPLAY_BUFFER]
+        self.publish(session_id, event)
+
+    def replay(self, session_id: str, since: int, current: int) -> Optional[List[Dict[str, Any]]]:
+        """Change events with since < seq <= current, or None if the buffer has a gap
+        or the client is ahead of the server (reset database, moved session)."""
+        if since == current:
+            RESUMES.inc(result="current")
+            return []
+        if since > current:
+            RESUMES.inc(result="reset")
+            return None
+        with self._lock:
+            buf = list(self._replay.get(session_id, ()))
+        events = [e for s, e in buf if since < s <= current]
+        if [e["seq"] for e in events] != list(range(since + 1, current + 1)):
+            RESUMES.inc(result="reset")
+            return None
+        RESUMES.inc(result="replayed")
+        return events
+
+    def has_subscribers(self, session_id: str) -> bool:
+        return session_id in self._subs
+
+    def sessions(self) -> List[str]:
+        """Sessions with at least one open subscription in this process."""
+        with self._lock:
+            return list(self._subs)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._subs), "subscribers": sum(len(s) for s in self._subs.values())}
+
+
+hub = Hub()
+
+SUBSCRIBERS = Gauge("todo_event_subscribers", "Open event streams (sessions / subscribers).", ("kind",))
+SUBSCRIBERS.set_function(lambda: {(k,): v for k, v in hub.counts().items()})
+
+
+def sse_format(event: Dict[str, Any]) -> str:
+    lines = [f"event: {event.get('type', 'message')}"]
+    if "seq" in event:
+        lines.append(f"id: {event['seq']}")
+    lines.append("data: " + json.dumps(event, default=str, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(
+    sub: Subscription,
+    is_disconnected: Any,
+    backlog: Optional[List[Dict[str, Any]]] = None,
+    after_seq: int = 0,
+) -> AsyncIterator[str]:
+    """
+    Yield SSE frames for `sub` until the client goes away: first `backlog`
+    (a replay or a reset), then live events; change events at or below the
+    last sequence already sent are skipped.
+    """
+    try:
+        yield ": connected\n\n"
+        for event in backlog or ():
+            after_seq = max(after_seq, event.get("seq", 0))
+            yield sse_format(event)
+        while True:
+            event = await sub.get(timeout=SSE_KEEPALIVE_S)
+            if event is None:
+                if await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            seq = event.get("seq")
+            if seq is not None:
+                if seq <= after_seq:
+                    continue
+                after_seq = seq
+            yield sse_format(event)
+    finally:
+        sub.close()
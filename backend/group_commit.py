@@ -0,0 +1,146 @@
+# group_commit.py
+"""
+Optional group-commit writer for SQLite.
+
+Instead of one transaction (and one fsync) per mutation, a single writer
+thread per database (per shard) gathers the write operations that arrive within a short
+window (or up to N ops) and runs them in one transaction. Each caller blocks
+on its own future, which is resolved only *after* the shared COMMIT returns,
+so a caller that got a result knows its write is durable — the same guarantee
+as before, with one fsync per batch instead of per request.
+
+If any op in a batch raises, the batch is rolled back and its ops are re-run
+one by one (each with its own commit), so one bad op never fails its
+neighbours.
+
+An op is a callable `op(session) -> result` that must not commit itself.
+
+Environment variables (optional)
+--------------------------------
+GROUP_COMMIT           : "1" to route TaskService writes through the writer (default: "0")
+GROUP_COMMIT_WINDOW_MS : how long to gather ops after the first one (default: 2)
+GROUP_COMMIT_MAX_OPS   : max ops per transaction (default: 64)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.metrics import WRITE_BATCH_OPS, WRITE_BATCH_LATENCY
+
+Op = Callable[[Any], Any]
+
+
+def enabled() -> bool:
+    return os.getenv("GROUP_COMMIT", "0") == "1"
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        window_s: Optional[float] = None,
+        max_ops: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.window_s = (
+            float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2")) / 1000.0 if window_s is None else window_s
+        )
+        self.max_ops = int(os.getenv("GROUP_COMMIT_MAX_OPS", "64")) if max_ops is None else max_ops
+        self._q: "queue.Queue[Optional[Tuple[Op, Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: Op) -> Future:
+        fut: Future = Future()
+        self._q.put((op, fut))
+        return fut
+
+    def run(self, op: Op) -> Any:
+        """Submit and wait until the op's transaction has committed."""
+        return self.submit(op).result()
+
+    def close(self) -> None:
+        self._q.put(None)
+        self._thread.join()
+
+    # -- writer thread --------------------------------------------------
+
+    def _gather(self, first: Tuple[Op, Future]) -> Tuple[List[Tuple[Op, Future]], bool]:
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            while True:
+                first = self._q.get()
+                if first is None:
+                    return
+                batch, stop = self._gather(first)
+                self._execute(db, batch)
+                if stop:
+                    return
+        finally:
+            db.close()
+
+    def _execute(self, db: Any, batch: List[Tuple[Op, Future]]) -> None:
+        t0 = time.perf_counter()
+        results: List[Any] = []
+        try:
+            for op, _ in batch:
+                results.append(op(db))
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._execute_one_by_one(db, batch)
+        else:
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+        finally:
+            WRITE_BATCH_OPS.observe(len(batch))
+            WRITE_BATCH_LATENCY.observe(time.perf_counter() - t0)
+
+    @staticmethod
+    def _execute_one_by_one(db: Any, batch: List[Tuple[Op, Future]]) -> None:
+        for op, fut in batch:
+            try:
+                res = op(db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                fut.set_exception(e)
+            else:
+                fut.set_result(res)
+
+
+_writers: Dict[Any, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(session_factory: Callable[[], Any]) -> GroupCommitWriter:
+    """One writer per session factory (i.e. per database)."""
+    w = _writers.get(session_factory)
+    if w is None:
+        with _writers_lock:
+            w = _writers.get(session_factory)
+            if w is None:
+                w = _writers[session_factory] = GroupCommitWriter(session_factory)
+    return w
@@ -0,0 +1,220 @@
+# hedging.py
+"""
+Hedged AI requests: cut the tail of slow Gemini calls with a second attempt.
+
+A call to a hedged function starts as usual. If it hasn't answered by that
+function's adaptive threshold (AI_HEDGE_QUANTILE of its recent latencies,
+p90 by default), an identical second request is fired. The first successful
+response wins and the other future is cancelled. A Gemini call that is
+already running can't be interrupted, so its result is simply dropped.
+
+Cost stays bounded by a budget shared by all functions. Every call earns
+AI_HEDGE_BUDGET of a hedge (0.05 means at most ~5% extra requests) and every
+hedge spends one, with at most AI_HEDGE_BURST saved up. No hedge fires:
+- until a function has AI_HEDGE_MIN_SAMPLES latencies (no threshold yet);
+- when the budget is spent;
+- when every AI worker is busy (resilience.py's slot cap);
+- when less than that function's p50 is left of the call's timeout (the
+  hedge couldn't finish in time anyway; this follows the request budget in
+  resilience.py).
+
+Latencies are recorded per attempt when it completes, including attempts
+that lost, so the threshold isn't biased toward fast responses.
+
+Metrics: todo_ai_hedges_total{fn,result} with result in fired, primary_won,
+hedge_won, budget_denied, deadline_denied, slot_denied, plus the current threshold as
+todo_ai_hedge_threshold_seconds{fn}. Hedge rate = fired / todo_ai_calls.
+
+Environment variables (optional)
+--------------------------------
+AI_HEDGE             : "1" to hedge (default: "0"; every hedge is an extra Gemini request)
+AI_HEDGE_FNS         : functions to hedge, comma-separated
+                       (default: "categorize_and_enrich,parse_command_nlp,detect_intent")
+AI_HEDGE_QUANTILE    : latency quantile used as the hedge threshold (default: 0.9)
+AI_HEDGE_BUDGET      : hedges earned per call, i.e. max extra traffic (default: 0.05)
+AI_HEDGE_BURST       : most hedges that can be saved up (default: 10)
+AI_HEDGE_MIN_SAMPLES : latencies needed before hedging a function (default: 20)
+AI_HEDGE_WINDOW      : recent latencies kept per function (default: 200)
+AI_HEDGE_MIN_DELAY_S : lower bound for the threshold (default: 0.05)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError as FutureTimeout, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+from backend.metrics import Counter, Gauge
+
+ENABLED = os.getenv("AI_HEDGE", "0") == "1"
+FNS = {
+    f.strip()
+    for f in os.getenv("AI_HEDGE_FNS", "categorize_and_enrich,parse_command_nlp,detect_intent").split(",")
+    if f.strip()
+}
+QUANTILE = float(os.getenv("AI_HEDGE_QUANTILE", "0.9"))
+BUDGET = float(os.getenv("AI_HEDGE_BUDGET", "0.05"))
+BURST = float(os.getenv("AI_HEDGE_BURST", "10"))
+MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+WINDOW = int(os.getenv("AI_HEDGE_WINDOW", "200"))
+MIN_DELAY_S = float(os.getenv("AI_HEDGE_MIN_DELAY_S", "0.05"))
+
+HEDGES = Counter(
+    "todo_ai_hedges_total",
+    "Hedged AI calls by outcome (fired / primary_won / hedge_won / budget_denied / deadline_denied / slot_denied).",
+    ("fn", "result"),
+)
+THRESHOLD = Gauge(
+    "todo_ai_hedge_threshold_seconds", "Current hedge delay per AI function.", ("fn",)
+)
+
+
+class LatencyWindow:
+    """Recent attempt latencies of one function; quantiles over the window."""
+
+    def __init__(self, size: int = WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._sorted: Optional[list] = None
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            s = self._sorted
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class HedgeBudget:
+    """Token bucket refilled by calls: `ratio` tokens per call, `burst` max."""
+
+    def __init__(self, ratio: float = BUDGET, burst: float = BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+windows: Dict[str, LatencyWindow] = {}
+budget = HedgeBudget()
+_windows_lock = threading.Lock()
+
+
+def _window(fn: str) -> LatencyWindow:
+    w = windows.get(fn)
+    if w is None:
+        with _windows_lock:
+            w = windows.setdefault(fn, LatencyWindow())
+    return w
+
+
+def _thresholds() -> Dict[tuple, float]:
+    out = {}
+    for fn, w in list(windows.items()):
+        q = w.quantile(QUANTILE)
+        if q is not None:
+            out[(fn,)] = max(MIN_DELAY_S, q)
+    return out
+
+
+THRESHOLD.set_function(_thresholds)
+
+
+def enabled(fn: str) -> bool:
+    return ENABLED and fn in FNS
+
+
+def _start(fn: str, submit: Callable[[], Future]) -> Future:
+    t0 = time.perf_counter()
+    fut = submit()
+
+    def _done(f: Future) -> None:
+        if not f.cancelled() and f.exception() is None:
+            _window(fn).observe(time.perf_counter() - t0)
+
+    fut.add_done_callback(_done)
+    return fut
+
+
+def call(fn: str, submit: Callable[[], Future], timeout: float) -> Any:
+    """
+    Result of the first successful attempt; `submit()` starts one attempt.
+    Raises concurrent.futures.TimeoutError when nothing succeeded in
+    `timeout`, or the last attempt's error when all of them failed.
+    """
+    deadline = time.monotonic() + timeout
+    window = _window(fn)
+    budget.earn()
+    primary = _start(fn, submit)
+
+    delay = window.quantile(QUANTILE)
+    if delay is None or max(MIN_DELAY_S, delay) >= timeout:
+        return _result(primary, timeout)
+    try:
+        return primary.result(timeout=max(MIN_DELAY_S, delay))
+    except FutureTimeout:
+        pass
+
+    left = deadline - time.monotonic()
+    p50 = window.quantile(0.5) or 0.0
+    if left < p50:
+        HEDGES.inc(fn=fn, result="deadline_denied")
+        return _result(primary, left)
+    if not budget.spend():
+        HEDGES.inc(fn=fn, result="budget_denied")
+        return _result(primary, left)
+
+    try:
+        hedge = _start(fn, submit)
+    except Exception:  # no free worker for a second attempt
+        HEDGES.inc(fn=fn, result="slot_denied")
+        return _result(primary, left)
+    HEDGES.inc(fn=fn, result="fired")
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        left = deadline - time.monotonic()
+        done, pending = wait(pending, timeout=max(0.0, left), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for f in done:
+            if f.exception() is None:
+                HEDGES.inc(fn=fn, result="hedge_won" if f is hedge else "primary_won")
+                for p in pending:
+                    p.cancel()  # not started yet: never sent; running: result dropped
+                return f.result()
+            error = f.exception()
+    for p in pending:
+        p.cancel()
+    if error is not None and not pending:
+        raise error
+    raise FutureTimeout()
+
+
+def _result(fut: Future, timeout: float) -> Any:
+    try:
+        return fut.result(timeout=max(0.0, timeout))
+    except FutureTimeout:
+        fut.cancel()
+        raise
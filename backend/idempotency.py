@@ -0,0 +1,206 @@
+# idempotency.py
+"""
+`Idempotency-Key` support for POST routes that call Gemini or write tasks.
+
+A client that times out and retries `POST /tasks` with the same key must not
+get a second Gemini call or a duplicate row. The first request with a given
+(session, key) claims it in `idempotency_keys` on the session's shard; the
+INSERT is the claim, so this holds across uvicorn workers. Then:
+
+- a retry while the original is still running waits for it (an in-process
+  Event when both are in the same worker, otherwise polling the row) and
+  gets its response, or 409 after IDEMPOTENCY_WAIT_S;
+- a retry after completion gets the stored status and body back, marked
+  with `Idempotent-Replayed: true`;
+- reusing a key for a different request (route or body) is rejected with 422;
+- 5xx results are not stored: the claim is released so a retry runs again.
+  A claim whose owner died is taken over after IDEMPOTENCY_PENDING_S.
+
+Stored responses expire after IDEMPOTENCY_TTL_S; expired rows are purged by
+the claiming path at most once a minute per shard, which bounds the table.
+
+Environment variables (optional)
+--------------------------------
+IDEMPOTENCY_TTL_S     : how long a completed response is replayed (default: 86400)
+IDEMPOTENCY_WAIT_S    : how long a retry waits for the in-flight original (default: 30)
+IDEMPOTENCY_PENDING_S : after this, an unfinished claim is considered abandoned (default: 120)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import IdempotencyKeyDB, engine_for
+from backend.metrics import Counter
+
+log = logging.getLogger(__name__)
+
+TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "30"))
+PENDING_S = float(os.getenv("IDEMPOTENCY_PENDING_S", "120"))
+POLL_S = 0.05
+PURGE_EVERY_S = 60.0
+MAX_KEY_LEN = 255
+
+IDEMPOTENT_REQUESTS = Counter(
+    "todo_idempotent_requests_total",
+    "Requests carrying an Idempotency-Key by outcome (executed/replayed/attached/conflict/mismatch).",
+    ("result",),
+)
+
+_keys = IdempotencyKeyDB.__table__
+
+Result = Tuple[int, Any]  # (status, JSON-able body)
+
+
+class IdempotencyConflict(RuntimeError):
+    """The key is in use by a request that is still running (→ 409)."""
+
+
+class IdempotencyMismatch(RuntimeError):
+    """The key was first used with a different route or body (→ 422)."""
+
+
+def fingerprint(route: str, payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{route}\n{raw}".encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_s: float = TTL_S, wait_s: float = WAIT_S, pending_s: float = PENDING_S):
+        self.ttl_s = ttl_s
+        self.wait_s = wait_s
+        self.pending_s = pending_s
+        self._lock = threading.Lock()
+        self._local: Dict[Tuple[str, str], threading.Event] = {}  # claims owned by this process
+        self._purged: Dict[str, float] = {}
+
+    def run(self, session_id: str, key: str, fp: str, fn: Callable[[], Result]) -> Tuple[int, Any, bool]:
+        """Run `fn` once per (session, key); returns (status, body, replayed)."""
+        if len(key) > MAX_KEY_LEN:
+            raise ValueError(f"Idempotency-Key longer than {MAX_KEY_LEN} characters")
+        eng = engine_for(session_id)
+        self._maybe_purge(eng)
+
+        deadline = time.monotonic() + self.wait_s
+        waited = False
+        while True:
+            if self._claim(eng, session_id, key, fp):
+                IDEMPOTENT_REQUESTS.inc(result="executed")
+                return (*self._execute(eng, session_id, key, fn), False)
+
+            row = self._load(eng, session_id, key)
+            if row is None:
+                continue  # released between our claim and read; try again
+            if row.fingerprint != fp:
+                IDEMPOTENT_REQUESTS.inc(result="mismatch")
+                raise IdempotencyMismatch("Idempotency-Key was already used for a different request")
+            if row.state == "done":
+                IDEMPOTENT_REQUESTS.inc(result="attached" if waited else "replayed")
+                return row.status, json.loads(row.body), True
+            if datetime.now() - row.created_at > timedelta(seconds=self.pending_s) and self._take_over(
+                eng, session_id, key, row.created_at
+            ):
+                IDEMPOTENT_REQUESTS.inc(result="executed")
+                return (*self._execute(eng, session_id, key, fn), False)
+
+            left = deadline - time.monotonic()
+            if left <= 0:
+                IDEMPOTENT_REQUESTS.inc(result="conflict")
+                raise IdempotencyConflict("A request with this Idempotency-Key is still in progress")
+            waited = True
+            with self._lock:
+                event = self._local.get((session_id, key))
+            if event is not None:
+                event.wait(left)  # same process: wake as soon as the original finishes
+            else:
+                time.sleep(min(POLL_S, left))
+
+    # -- internals -------------------------------------------------------
+
+    def _claim(self, eng: Any, session_id: str, key: str, fp: str) -> bool:
+        with self._lock:
+            if (session_id, key) in self._local:
+                return False
+        with eng.begin() as conn:
+            inserted = conn.execute(
+                sqlite_insert(_keys)
+                .values(session_id=session_id, key=key, fingerprint=fp, state="pending", created_at=datetime.now())
+                .on_conflict_do_nothing(index_elements=["session_id", "key"])
+            ).rowcount
+        if inserted:
+            with self._lock:
+                self._local[(session_id, key)] = threading.Event()
+        return bool(inserted)
+
+    def _take_over(self, eng: Any, session_id: str, key: str, seen_created: datetime) -> bool:
+        with eng.begin() as conn:
+            n = conn.execute(
+                update(_keys)
+                .where(_keys.c.session_id == session_id, _keys.c.key == key,
+                       _keys.c.state == "pending", _keys.c.created_at == seen_created)
+                .values(created_at=datetime.now())
+            ).rowcount
+        if n:
+            with self._lock:
+                self._local[(session_id, key)] = threading.Event()
+        return bool(n)
+
+    def _execute(self, eng: Any, session_id: str, key: str, fn: Callable[[], Result]) -> Result:
+        where = (_keys.c.session_id == session_id, _keys.c.key == key)
+        try:
+            try:
+                status, body = fn()
+            except BaseException:
+                try:
+                    with eng.begin() as conn:
+                        conn.execute(delete(_keys).where(*where))
+                except Exception:
+                    # keep the handler's error; the claim goes stale after IDEMPOTENCY_PENDING_S
+                    log.exception("could not release idempotency claim %r", key)
+                raise
+            with eng.begin() as conn:
+                if status >= 500:
+                    conn.execute(delete(_keys).where(*where))  # transient: let a retry run again
+                else:
+                    conn.execute(update(_keys).where(*where).values(
+                        state="done", status=status, body=json.dumps(body, default=str),
+                    ))
+            return status, body
+        finally:
+            # wake same-process waiters on every path, once the row is final
+            with self._lock:
+                event = self._local.pop((session_id, key), None)
+            if event is not None:
+                event.set()
+
+    def _load(self, eng: Any, session_id: str, key: str) -> Optional[Any]:
+        with eng.connect() as conn:
+            return conn.execute(
+                select(_keys.c.fingerprint, _keys.c.state, _keys.c.status, _keys.c.body, _keys.c.created_at)
+                .where(_keys.c.session_id == session_id, _keys.c.key == key)
+            ).first()
+
+    def _maybe_purge(self, eng: Any) -> None:
+        url = str(eng.url)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._purged.get(url, 0.0) < PURGE_EVERY_S:
+                return
+            self._purged[url] = now
+        cutoff = datetime.now() - timedelta(seconds=self.ttl_s)
+        with eng.begin() as conn:
+            conn.execute(delete(_keys).where(_keys.c.state == "done", _keys.c.created_at < cutoff))
+
+
+store = IdempotencyStore()
@@ -0,0 +1,49 @@
+# leases.py
+"""
+Run-once-across-workers leases for periodic jobs.
+
+Every uvicorn worker starts the same background threads. Jobs that scan the
+database (e.g. the rollup reconcile) should run in one of them
+only: before each pass a worker calls `acquire(name, ttl_s)`, which claims
+or renews the lease row in shard 0 and says whether this process holds it.
+A lease whose holder stopped renewing expires after `ttl_s` and is taken
+over by the next worker that asks, so the job survives a worker restart.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import socket
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import JobLeaseDB, engines
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+_leases = JobLeaseDB.__table__
+
+
+def acquire(name: str, ttl_s: float) -> bool:
+    """Claim or renew `name` for `ttl_s` seconds; True when this process holds it."""
+    now = time.time()
+    with engines[0].begin() as conn:
+        conn.execute(
+            sqlite_insert(_leases)
+            .values(name=name, holder=HOLDER, expires_at=now + ttl_s)
+            .on_conflict_do_update(
+                index_elements=["name"],
+                set_={"holder": HOLDER, "expires_at": now + ttl_s},
+                where=(_leases.c.holder == HOLDER) | (_leases.c.expires_at < now),
+            )
+        )
+        holder = conn.execute(select(_leases.c.holder).where(_leases.c.name == name)).scalar()
+    return holder == HOLDER
+
+
+def release(name: str) -> None:
+    """Give the lease up (on shutdown) so another worker can take over right away."""
+    with engines[0].begin() as conn:
+        conn.execute(delete(_leases).where(_leases.c.name == name, _leases.c.holder == HOLDER))
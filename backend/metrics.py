@@ -0,0 +1,330 @@
+# metrics.py
+"""
+Dependency-free metrics registry rendered in Prometheus text format.
+
+Feeds
+-----
+- HTTP : `MetricsMiddleware` (pure ASGI) → per-route latency histogram + status counts
+- SQL  : `instrument_engine(engine)` → SQLAlchemy before/after_cursor_execute hooks,
+         latency per statement type (SELECT/INSERT/UPDATE/DELETE/...)
+- AI   : `observe_ai_call(...)` from ai_client._generate → per-function latency,
+         errors and token usage; estimated prompt size per call
+- Writes: group-commit batch size and commit latency (backend/group_commit.py)
+- Misc : reconciliation method counter, generic cache hit/miss counter
+
+Each observation is a dict lookup + a bisect under a lock, so the hot-path cost
+is a few microseconds. Scrape with `GET /metrics`.
+"""
+
+from __future__ import annotations
+
+import time
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from backend import profiling
+
+LabelKey = Tuple[str, ...]
+
+# seconds; covers sub-ms SQLite statements up to multi-second LLM calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+# ---------------------------
+# Metric types
+# ---------------------------
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:  # pragma: no cover - overridden
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        out = self._header()
+        for key, v in items:
+            out.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_num(v)}")
+        return out
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time via `set_function`."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn: Callable[[], Dict[LabelKey, float]] | None = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Dict[LabelKey, float]]) -> None:
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        if self._fn is not None:
+            try:
+                items = list(self._fn().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        out = self._header()
+        for key, v in items:
+            out.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_num(v)}")
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: Any) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        out = self._header()
+        for key, counts, total in items:
+            cum = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le = f'le="{_fmt_num(bound)}"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cum}")
+            lbl = _fmt_labels(self.labelnames, key)
+            out.append(f"{self.name}_sum{lbl} {_fmt_num(total)}")
+            out.append(f"{self.name}_count{lbl} {cum}")
+        return out
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in list(REGISTRY):
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---------------------------
+# Metric families
+# ---------------------------
+
+HTTP_LATENCY = Histogram(
+    "todo_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+HTTP_REQUESTS = Counter(
+    "todo_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+
+DB_LATENCY = Histogram(
+    "todo_db_statement_duration_seconds", "SQL statement latency by statement type.", ("stmt",)
+)
+DB_ERRORS = Counter(
+    "todo_db_statement_errors_total", "SQL statements that raised.", ("stmt",)
+)
+WRITE_BATCH_OPS = Histogram(
+    "todo_group_commit_batch_ops", "Write ops per group-commit transaction.", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+WRITE_BATCH_LATENCY = Histogram(
+    "todo_group_commit_duration_seconds", "Time to run and commit one group-commit batch.", ()
+)
+
+AI_LATENCY = Histogram(
+    "todo_ai_call_duration_seconds", "Gemini call latency by ai_client function.", ("fn",)
+)
+AI_ERRORS = Counter(
+    "todo_ai_call_errors_total", "Gemini calls that failed, timed out or were refused.", ("fn", "reason")
+)
+AI_TOKENS = Counter(
+    "todo_ai_tokens_total", "Gemini token usage by function and kind.", ("fn", "kind")
+)
+AI_PROMPT_TOKENS = Histogram(
+    "todo_ai_prompt_tokens", "Estimated prompt tokens per call, before sending (prompts.count_tokens).", ("fn",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+
+RECONCILE_METHOD = Counter(
+    "todo_reconcile_decisions_total", "reconcile_category decisions by method.", ("method",)
+)
+CACHE_REQUESTS = Counter(
+    "todo_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result")
+)
+
+
+# ---------------------------
+# HTTP middleware (pure ASGI; no BaseHTTPMiddleware buffering)
+# ---------------------------
+
+class MetricsMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            # route template (e.g. /tasks/{task_id}) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+
+
+# ---------------------------
+# SQLAlchemy hooks
+# ---------------------------
+
+def _stmt_type(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+def instrument_engine(engine: Any) -> None:
+    """Attach cursor-execute timing hooks to a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_metrics_t0")
+        if stack:
+            dt = time.perf_counter() - stack.pop()
+            DB_LATENCY.observe(dt, stmt=_stmt_type(statement))
+            profiling.record_sql(statement, dt)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        stack = ctx.connection.info.get("_metrics_t0") if ctx.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_ERRORS.inc(stmt=_stmt_type(ctx.statement or ""))
+
+
+# ---------------------------
+# AI helpers
+# ---------------------------
+
+def observe_ai_call(fn: str, seconds: float, resp: Any = None, error: str | None = None) -> None:
+    """Record one Gemini round-trip (called from ai_client._generate)."""
+    AI_LATENCY.observe(seconds, fn=fn)
+    profiling.record_ai(fn, seconds, error)
+    if error:
+        AI_ERRORS.inc(fn=fn, reason=error)
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is not None:
+        for kind, attr in (
+            ("prompt", "prompt_token_count"),
+            ("completion", "candidates_token_count"),
+            ("total", "total_token_count"),
+        ):
+            n = getattr(usage, attr, None)
+            if n:
+                AI_TOKENS.inc(float(n), fn=fn, kind=kind)
@@ -0,0 +1,371 @@
+# profiling.py
+"""
+Opt-in per-request profiling + slow-request capture.
+
+Every HTTP request gets a lightweight `RequestTrace` (contextvar) that collects
+the SQL statements and AI calls it made, with durations, plus free-form notes
+(`note(...)`, which replaces the old print("DEBUG — ...") lines).
+
+A request is *profiled* when:
+  - it carries `X-Profile: 1|cprofile|sample` together with a valid
+    `X-Debug-Token` (unless PROFILE_HEADER_ENABLED=0), or
+  - it is picked by PROFILE_SAMPLE_RATE.
+Profiling runs on the thread that executes the endpoint (see `route_class`):
+  - cprofile : deterministic cProfile, top frames by cumulative time
+  - sample   : wall-clock stack sampling (low overhead, sees time blocked in I/O)
+
+Requests slower than SLOW_REQUEST_MS, and every profiled request, are kept in a
+bounded in-memory log queryable at `GET /debug/requests`.
+
+Captures hold SQL and task text, and the session id is the only access
+control in this app, so all of this is off unless DEBUG_TOKEN is set: the
+debug routes answer 404 and `X-Profile` is ignored. With a token, both need
+`X-Debug-Token: <token>`. Listings never carry session ids or notes; only
+the per-request detail does.
+
+Environment variables (optional)
+--------------------------------
+DEBUG_TOKEN            : enables /debug/* and X-Profile for holders of this token (default: unset, disabled)
+SLOW_REQUEST_MS        : capture threshold in ms (default: 1000)
+SLOW_LOG_SIZE          : how many captured requests to keep (default: 200)
+PROFILE_SAMPLE_RATE    : fraction of requests profiled automatically (default: 0)
+PROFILE_MODE           : "cprofile" or "sample" for sampled requests (default: "cprofile")
+PROFILE_HEADER_ENABLED : "1"/"0", honour the X-Profile header when DEBUG_TOKEN allows it (default: "1")
+PROFILE_SAMPLE_INTERVAL_MS : stack sampling interval (default: 5)
+PROFILE_TOP_N          : frames kept per profile (default: 25)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import hmac
+import time
+import random
+import logging
+import functools
+import itertools
+import threading
+import contextvars
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+log = logging.getLogger("backend.trace")
+
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+PROFILE_HEADER_ENABLED = bool(int(os.getenv("PROFILE_HEADER_ENABLED", "1")))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+_MAX_SQL_PER_TRACE = 500
+_ids = itertools.count(1)
+
+
+# ---------------------------
+# Request trace
+# ---------------------------
+
+class RequestTrace:
+    __slots__ = (
+        "id", "method", "route", "session_id", "started_at", "t0",
+        "duration_ms", "status", "mode", "streaming", "sql", "ai", "notes", "frames",
+    )
+
+    def __init__(self, method: str, path: str, session_id: str, mode: Optional[str]):
+        self.id = next(_ids)
+        self.method = method
+        self.route = path
+        self.session_id = session_id
+        self.started_at = datetime.now()
+        self.t0 = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status = 0
+        self.mode = mode
+        self.streaming = False  # text/event-stream response
+        self.sql: List[Dict[str, Any]] = []
+        self.ai: List[Dict[str, Any]] = []
+        self.notes: List[Dict[str, Any]] = []
+        self.frames: List[Dict[str, Any]] = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "status": self.status,
+            "profiled": self.mode,
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(s["ms"] for s in self.sql), 2),
+            "ai_count": len(self.ai),
+            "ai_ms": round(sum(a["ms"] for a in self.ai), 2),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = self.summary()
+        out.update(session_id=self.session_id, sql=self.sql, ai=self.ai, notes=self.notes, frames=self.frames)
+        return out
+
+
+_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "request_trace", default=None
+)
+
+SLOW_LOG: Deque[RequestTrace] = deque(maxlen=int(os.getenv("SLOW_LOG_SIZE", "200")))
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _trace.get()
+
+
+def record_sql(statement: str, seconds: float) -> None:
+    tr = _trace.get()
+    if tr is not None and len(tr.sql) < _MAX_SQL_PER_TRACE:
+        tr.sql.append({"statement": " ".join(statement.split())[:300], "ms": round(seconds * 1000, 3)})
+
+
+def record_ai(fn: str, seconds: float, error: Optional[str] = None) -> None:
+    tr = _trace.get()
+    if tr is not None:
+        tr.ai.append({"fn": fn, "ms": round(seconds * 1000, 3), "error": error})
+
+
+def note(kind: str, **data: Any) -> None:
+    """Attach a diagnostic to the current request trace (and the debug log)."""
+    log.debug("%s %s", kind, data)
+    tr = _trace.get()
+    if tr is not None:
+        tr.notes.append({"kind": kind, **{k: _jsonable(v) for k, v in data.items()}})
+
+
+def _jsonable(v: Any) -> Any:
+    if isinstance(v, (str, int, float, bool)) or v is None:
+        return v
+    if isinstance(v, dict):
+        return {str(k): _jsonable(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple, set)):
+        return [_jsonable(x) for x in v]
+    return str(v)
+
+
+def debug_allowed(token: Optional[str]) -> bool:
+    """True when debugging is enabled and `token` matches DEBUG_TOKEN."""
+    return bool(DEBUG_TOKEN) and hmac.compare_digest((token or "").encode(), DEBUG_TOKEN.encode())
+
+
+def find(req_id: int) -> Optional[RequestTrace]:
+    for tr in list(SLOW_LOG):
+        if tr.id == req_id:
+            return tr
+    return None
+
+
+# ---------------------------
+# Profilers
+# ---------------------------
+
+def _cprofile_top(prof: Any) -> List[Dict[str, Any]]:
+    import pstats
+
+    st = pstats.Stats(prof)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in st.stats.items():  # type: ignore[attr-defined]
+        rows.append({
+            "frame": f"{func} ({os.path.basename(filename)}:{line})",
+            "ncalls": nc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:PROFILE_TOP_N]
+
+
+class StackSampler:
+    """Wall-clock sampler for a single thread via sys._current_frames()."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.inclusive: Counter = Counter()
+        self.leaf: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                if leaf:
+                    self.leaf[key] += 1
+                    leaf = False
+                if key not in seen:
+                    self.inclusive[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def top(self) -> List[Dict[str, Any]]:
+        n = max(self.samples, 1)
+        return [
+            {
+                "frame": key,
+                "samples": cnt,
+                "inclusive_pct": round(100.0 * cnt / n, 1),
+                "self_pct": round(100.0 * self.leaf.get(key, 0) / n, 1),
+            }
+            for key, cnt in self.inclusive.most_common(PROFILE_TOP_N)
+        ]
+
+
+def _run_profiled(tr: RequestTrace, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    if tr.mode == "cprofile":
+        import cProfile
+
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # another profiler already active on this interpreter → sample instead
+            tr.mode = "sample"
+            return _run_profiled(tr, fn, *args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            tr.frames = _cprofile_top(prof)
+
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sampler.stop()
+        tr.frames = sampler.top()
+
+
+def route_class() -> type:
+    """
+    APIRoute subclass that runs the endpoint under the request's profiler (if any).
+    Sync endpoints stay sync, so FastAPI still runs them in the threadpool and
+    the profiler sees the worker thread that does the actual work.
+    (Built lazily so the SQL/AI hooks above don't pull FastAPI into the CLI.)
+    """
+    from fastapi.routing import APIRoute
+
+    class ProfiledRoute(APIRoute):
+        def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+            super().__init__(path, _wrap_endpoint(endpoint), **kwargs)
+
+    return ProfiledRoute
+
+
+def _wrap_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    import asyncio
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def _async(*args: Any, **kwargs: Any) -> Any:
+            tr = _trace.get()
+            if tr is None or tr.mode is None:
+                return await endpoint(*args, **kwargs)
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                sampler.stop()
+                tr.frames = sampler.top()
+        return _async
+
+    @functools.wraps(endpoint)
+    def _sync(*args: Any, **kwargs: Any) -> Any:
+        tr = _trace.get()
+        if tr is None or tr.mode is None:
+            return endpoint(*args, **kwargs)
+        return _run_profiled(tr, endpoint, *args, **kwargs)
+    return _sync
+
+
+# ---------------------------
+# ASGI middleware
+# ---------------------------
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for k, v in scope.get("headers", ()):
+        if k == name:
+            return v.decode("latin-1")
+    return None
+
+
+def _pick_mode(scope: Dict[str, Any]) -> Optional[str]:
+    if PROFILE_HEADER_ENABLED and debug_allowed(_header(scope, b"x-debug-token")):
+        h = (_header(scope, b"x-profile") or "").strip().lower()
+        if h in ("1", "true", "cprofile"):
+            return "cprofile"
+        if h == "sample":
+            return "sample"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_MODE
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tr = RequestTrace(
+            scope.get("method", ""),
+            scope.get("path", ""),
+            _header(scope, b"x-session-id") or "public",
+            _pick_mode(scope),
+        )
+        token = _trace.set(tr)
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                tr.status = message["status"]
+                tr.streaming = any(
+                    k == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in message.get("headers", ())
+                )
+                if tr.mode is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-request-trace", str(tr.id).encode())
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _trace.reset(token)
+            tr.duration_ms = (time.perf_counter() - tr.t0) * 1000
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                tr.route = route
+            # long-lived event streams are slow by design
+            if tr.mode is not None or (tr.duration_ms >= SLOW_REQUEST_MS and not tr.streaming):
+                SLOW_LOG.append(tr)
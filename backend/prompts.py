@@ -0,0 +1,223 @@
+# prompts.py
+"""
+Prompt construction for ai_client.
+
+- Static instruction blocks are built once at import; each call only appends
+  its variable tail (input text, current time, task table). Keeping the
+  prefix byte-identical across calls also lets the provider reuse its
+  prefix cache.
+- Task lists go in as a compact table instead of `json.dumps` of full dicts:
+  one header line, then one `|`-separated row per task. Rows are addressed
+  by a short `ref` (1..n) that `decode_refs` maps back to task ids, and due
+  dates are offsets from now ("+3h", "-2d") instead of ISO strings.
+- `count_tokens` is a cheap, tokenizer-free estimate (≈ SentencePiece on
+  English text) used to report prompt size per call before it is sent; the
+  provider's exact counts still arrive via usage_metadata (AI_TOKENS).
+
+See `python -m bench.prompts` for token counts and latency against the
+previous JSON prompts.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+TZ = os.getenv("LOCAL_TZ", "America/Toronto")
+
+TABLE_HEADER = "ref|text|category|pri|due|status"
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_CELL_BAD = re.compile(r"[|\r\n]+")
+
+
+# ---------------------------
+# Encoding helpers
+# ---------------------------
+
+def count_tokens(text: str) -> int:
+    """Estimated LLM tokens: ~4 chars per word piece, 1 per punctuation mark."""
+    n = 0
+    for m in _TOKEN.finditer(text):
+        tok = m.group()
+        n += max(1, (len(tok) + 3) // 4) if tok[0].isalnum() or tok[0] == "_" else 1
+    return n
+
+
+def _cell(v: Any) -> str:
+    s = str(v or "")
+    if "|" in s or "\n" in s or "\r" in s:
+        s = _CELL_BAD.sub(" ", s)
+    return s.strip()
+
+
+def _as_dt(v: Any) -> Optional[datetime]:
+    if v is None or isinstance(v, datetime):
+        return v
+    try:
+        return datetime.fromisoformat(str(v))
+    except ValueError:
+        return None
+
+
+def rel_due(due: Any, now: datetime) -> str:
+    """Offset of `due` from `now`: "+45m", "+3h", "-2d"; "" without a due date."""
+    dt = _as_dt(due)
+    if dt is None:
+        return ""
+    if dt.tzinfo is not None and now.tzinfo is None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    secs = (dt - now).total_seconds()
+    sign = "-" if secs < 0 else "+"
+    secs = abs(secs)
+    if secs < 3600:
+        return f"{sign}{round(secs / 60)}m"
+    if secs < 48 * 3600:
+        return f"{sign}{round(secs / 3600)}h"
+    return f"{sign}{round(secs / 86400)}d"
+
+
+def encode_tasks(tasks: Sequence[Dict[str, Any]], now: datetime) -> Tuple[str, Dict[int, Any]]:
+    """Task dicts → (table text, {ref: task id})."""
+    refs: Dict[int, Any] = {}
+    lines = [TABLE_HEADER]
+    for ref, t in enumerate(tasks, 1):
+        refs[ref] = t.get("id")
+        lines.append("|".join((
+            str(ref),
+            _cell(t.get("text")),
+            _cell(t.get("category")),
+            str(t.get("priority") or ""),
+            rel_due(t.get("due_dt"), now),
+            "done" if t.get("status") == "done" else "open",
+        )))
+    return "\n".join(lines), refs
+
+
+def decode_refs(values: Iterable[Any], refs: Dict[int, Any]) -> List[Any]:
+    """Refs returned by the model → task ids (unknown refs dropped)."""
+    out = []
+    for v in values or ():
+        try:
+            ref = int(v)
+        except (TypeError, ValueError):
+            continue
+        if ref in refs:
+            out.append(refs[ref])
+    return out
+
+
+def _now() -> str:
+    return datetime.now().replace(microsecond=0).isoformat()
+
+
+# ---------------------------
+# Static blocks (built once)
+# ---------------------------
+
+_TABLE_LEGEND = (
+    "Tasks are a table: one row per task, columns separated by |. "
+    "ref = short task reference; due = offset from the current time "
+    "(+3h = in 3 hours, -2d = 2 days ago, empty = no due date)."
+)
+
+_ENRICH = f"""You are an API. Return JSON only—no prose, no markdown.
+
+Given a single to-do text, infer:
+- category_proposed: a short category string (<= 3 words). Use natural, human categories
+  like Errands/Groceries, Work, Health, Family, Personal, Finance, Travel, Study, etc.
+  Pick the most *sensible* everyday label for the task; do not overfit or invent niche labels.
+- priority: integer 1..5 (1=lowest, 5=highest) based on urgency/importance implied by the text.
+- due_dt_iso: an ISO 8601 datetime string with timezone offset if a due time/date is clearly implied, else null.
+- rationale: very short reason (one sentence).
+
+Rules:
+- If only a time is given (e.g., "by 17:30"), assume today in timezone "{TZ}"; if that time already passed,
+  roll to next day.
+- If only a day is given (e.g., "tomorrow", "next Monday"), default to 09:00 local time unless a time is stated.
+- Always return ISO 8601 with timezone offset (e.g., 2025-09-03T17:30:00-04:00).
+- Never return a datetime in the past relative to the current time below.
+
+Return JSON with exactly this shape:
+{{"category_proposed": "string", "priority": 1, "due_dt_iso": "2025-09-02T18:00:00-04:00" | null, "rationale": "string"}}
+"""
+
+_COMMAND = """You are an API. Return JSON only.
+
+Parse the user command below.
+
+Valid actions: ["show", "complete_all", "delete_category", "summarize"]
+Valid timeframes: ["today", "tomorrow", "this_week", "all"]
+
+Rules:
+- If user says things like "finish all", "mark everything done" → action=complete_all.
+- If user says "delete <some category>" → action=delete_category with category.
+- If user says "show all ..." → action=show with filters.
+- If timeframe not specified, set to "all".
+- If user says "summarize" (e.g. "summarize today") → action=summarize.
+- Always include a rationale.
+
+Return JSON:
+{"action": "show", "category": "work", "timeframe": "today", "rationale": "User asked to show today's work tasks"}
+"""
+
+_SUMMARY = f"""You are an API. Return JSON only.
+
+Create a summary of the tasks below. The "narrative" must be 1–3 sentences, plain text, friendly, concise, and specific.
+{_TABLE_LEGEND} Use refs in urgent_ids and overdue_ids.
+
+Return JSON:
+{{"headline": "string", "kpis": {{"open": 0, "completed": 0, "overdue": 0, "due_today": 0}}, "highlights": ["string"], "by_category": [{{"name": "Work", "open": 3, "done": 2}}], "urgent_ids": [1], "overdue_ids": [2], "markdown": "- bullet one\\n- bullet two", "narrative": "Plain conversational recap"}}
+"""
+
+_FILTER = f"""You are an API. Return JSON only.
+
+From the tasks below, select only those relevant to the user query.
+{_TABLE_LEGEND}
+
+Return JSON with the refs to keep:
+{{"keep_ids": [1, 3, 7]}}
+"""
+
+_INTENT = """You are an API. Return JSON only.
+
+Decide if the user is trying to ADD A TASK or issue a COMMAND.
+
+Definitions:
+- "add_task": adding a new todo item (like "buy milk tomorrow").
+- "command": control requests (like "show all tasks", "summarize today", "delete category work", "complete all").
+
+Return JSON:
+{"intent": "add_task" | "command", "rationale": "short one-sentence reason"}
+"""
+
+
+# ---------------------------
+# Builders (static prefix + variable tail)
+# ---------------------------
+
+def enrich_prompt(text: str) -> str:
+    return f'{_ENRICH}\nCurrent time: {_now()}\nInput text:\n"{text.strip()}"\n'
+
+
+def command_prompt(text: str, existing_categories: Sequence[str]) -> str:
+    cats = json.dumps(list(existing_categories), ensure_ascii=False)
+    return f'{_COMMAND}\nExisting categories: {cats}\nParse this user command: "{text}"\n'
+
+
+def summary_prompt(tasks: Sequence[Dict[str, Any]], intent: Dict[str, Any]) -> Tuple[str, Dict[int, Any]]:
+    now = datetime.now().replace(microsecond=0)
+    table, refs = encode_tasks(tasks, now)
+    intent_s = json.dumps(intent, ensure_ascii=False, separators=(",", ":"))
+    return f"{_SUMMARY}\nIntent: {intent_s}\nCurrent time: {now.isoformat()}\nTasks:\n{table}\n", refs
+
+
+def filter_prompt(tasks: Sequence[Dict[str, Any]], query: str) -> Tuple[str, Dict[int, Any]]:
+    table, refs = encode_tasks(tasks, datetime.now().replace(microsecond=0))
+    return f'{_FILTER}\nQuery: "{query}"\nTasks:\n{table}\n', refs
+
+
+def intent_prompt(user_text: str) -> str:
+    return f'{_INTENT}\nInput: "{user_text}"\n'
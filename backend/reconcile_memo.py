@@ -0,0 +1,188 @@
+# reconcile_memo.py
+"""
+Per-session memo of reconcile_category decisions.
+
+A session sees the same Gemini proposals ("Groceries", "Fitness", "Work
+Meeting") over and over, and each one used to rerun the whole cascade. Now
+each decision (normalized proposal → final category, method, score) is
+stored in `reconcile_memo` on the session's shard and kept in a per-process
+dict, so a repeat proposal is a single dict lookup.
+
+When a memoized decision still holds (checked on every lookup, no
+invalidation hooks on the write path):
+- exact / synonym_existing: the target category still exists and no
+  category named like the proposal itself has appeared (that would now be
+  an exact match);
+- model / fuzzy / keep_proposed / synonym_new: the session's category set is
+  unchanged (`categories_sig`), since any added or removed category can
+  change which one scores best;
+- user: always. Corrections recorded with `correct()` override the cascade
+  until removed with `forget()`.
+
+An entry that no longer holds is recomputed and overwritten. Each process
+reloads a session from SQLite after RECONCILE_MEMO_TTL_S, which is how
+corrections made through another worker reach it.
+
+Hits/misses go to `todo_cache_requests_total{cache="reconcile_memo"}`.
+
+Environment variables (optional)
+--------------------------------
+RECONCILE_MEMO          : "0" to always run the full cascade (default: "1")
+RECONCILE_MEMO_TTL_S    : seconds a process trusts its copy of a session (default: 300)
+RECONCILE_MEMO_SESSIONS : sessions kept in memory, least recently used evicted (default: 10000)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import ReconcileMemoDB, engine_for
+from backend.metrics import CACHE_REQUESTS
+from backend.similarity import _norm, reconcile_category
+
+ENABLED = os.getenv("RECONCILE_MEMO", "1") == "1"
+TTL_S = float(os.getenv("RECONCILE_MEMO_TTL_S", "300"))
+MAX_SESSIONS = int(os.getenv("RECONCILE_MEMO_SESSIONS", "10000"))
+
+_memo = ReconcileMemoDB.__table__
+
+# depend only on the target (and the proposal itself) existing
+_STABLE = ("exact", "synonym_existing")
+# never stored: trivial or nothing to remember
+_SKIP = ("noop-empty-proposed", "noop-no-existing")
+
+Entry = Tuple[str, str, Optional[float], str]  # (final, method, score, categories_sig)
+
+
+def categories_sig(existing_norm: Set[str]) -> str:
+    return hashlib.blake2b("\x1f".join(sorted(existing_norm)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _holds(entry: Entry, key: str, existing_norm: Set[str], sig: str) -> bool:
+    final, method, _, entry_sig = entry
+    if method == "user":
+        return True
+    if method in _STABLE:
+        target = _norm(final)
+        return target in existing_norm and (key == target or key not in existing_norm)
+    return entry_sig == sig
+
+
+class ReconcileMemo:
+    def __init__(self, ttl_s: float = TTL_S, max_sessions: int = MAX_SESSIONS):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # session_id -> (loaded_at, {proposal: Entry}); most recently used last
+        self._sessions: "OrderedDict[str, Tuple[float, Dict[str, Entry]]]" = OrderedDict()
+
+    # -- lookups ---------------------------------------------------------
+
+    def _entries(self, session_id: str) -> Dict[str, Entry]:
+        now = time.monotonic()
+        with self._lock:
+            cur = self._sessions.get(session_id)
+            if cur is not None and now - cur[0] < self.ttl_s:
+                self._sessions.move_to_end(session_id)
+                return cur[1]
+        with engine_for(session_id).connect() as conn:
+            rows = conn.execute(
+                select(_memo.c.proposal, _memo.c.final, _memo.c.method, _memo.c.score, _memo.c.categories_sig)
+                .where(_memo.c.session_id == session_id)
+            ).all()
+        entries = {r.proposal: (r.final, r.method, r.score, r.categories_sig) for r in rows}
+        with self._lock:
+            self._sessions[session_id] = (now, entries)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return entries
+
+    def resolve(self, session_id: str, proposed: str, existing: Sequence[str]) -> Tuple[str, Dict[str, Any]]:
+        """reconcile_category, answered from the memo when the decision still holds."""
+        key = _norm(proposed)[:100]
+        if not ENABLED or not key:
+            return reconcile_category(proposed=proposed, existing=existing)
+
+        existing_norm = {_norm(e) for e in existing}
+        sig = categories_sig(existing_norm)
+        entry = self._entries(session_id).get(key)
+        if entry is not None and _holds(entry, key, existing_norm, sig):
+            CACHE_REQUESTS.inc(cache="reconcile_memo", result="hit")
+            final, method, score, _ = entry
+            return final, {
+                "proposed": proposed,
+                "method": "user" if method == "user" else "memo",
+                "memo": {"method": method, "score": score},
+                "scores": {},
+            }
+
+        CACHE_REQUESTS.inc(cache="reconcile_memo", result="stale" if entry is not None else "miss")
+        final, dbg = reconcile_category(proposed=proposed, existing=existing)
+        if dbg["method"] not in _SKIP and final:
+            score = dbg["scores"].get("model_best") if dbg["method"] == "model" else dbg["scores"].get("fuzzy_best")
+            self._put(session_id, key, (final.strip()[:50], dbg["method"], score, sig))
+        return final, dbg
+
+    # -- writes ----------------------------------------------------------
+
+    def _put(self, session_id: str, key: str, entry: Entry) -> None:
+        final, method, score, sig = entry
+        values = dict(final=final, method=method, score=score, categories_sig=sig, updated_at=datetime.now())
+        with engine_for(session_id).begin() as conn:
+            conn.execute(
+                sqlite_insert(_memo)
+                .values(session_id=session_id, proposal=key, **values)
+                .on_conflict_do_update(index_elements=["session_id", "proposal"], set_=values)
+            )
+        with self._lock:
+            cur = self._sessions.get(session_id)
+            if cur is not None:
+                cur[1][key] = entry
+
+    def correct(self, session_id: str, proposed: str, category: str) -> Dict[str, Any]:
+        """Record a user correction: `proposed` always maps to `category` from now on."""
+        key = _norm(proposed)[:100]
+        category = category.strip()[:50]
+        if not key or not category:
+            raise ValueError("proposed and category must be non-empty")
+        self._put(session_id, key, (category, "user", None, ""))
+        return {"proposal": key, "final": category, "method": "user"}
+
+    def forget(self, session_id: str, proposed: str) -> bool:
+        """Drop the memo entry (learned or corrected) for a proposal."""
+        key = _norm(proposed)[:100]
+        with engine_for(session_id).begin() as conn:
+            n = conn.execute(
+                delete(_memo).where(_memo.c.session_id == session_id, _memo.c.proposal == key)
+            ).rowcount
+        with self._lock:
+            cur = self._sessions.get(session_id)
+            if cur is not None:
+                cur[1].pop(key, None)
+        return bool(n)
+
+    def entries(self, session_id: str) -> List[Dict[str, Any]]:
+        with engine_for(session_id).connect() as conn:
+            rows = conn.execute(
+                select(_memo.c.proposal, _memo.c.final, _memo.c.method, _memo.c.score, _memo.c.updated_at)
+                .where(_memo.c.session_id == session_id)
+                .order_by(_memo.c.proposal)
+            ).mappings()
+            return [dict(r) for r in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+
+memo = ReconcileMemo()
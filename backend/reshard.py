@@ -0,0 +1,176 @@
+# reshard.py
+"""
+Offline shard rebalancer: move every session to the shard it hashes to
+under a new shard count.
+
+    python -m backend.reshard --from 1 --to 4 --dry-run
+    python -m backend.reshard --from 1 --to 4 --mapping id-remap.json
+    TODO_DB_SHARDS=4 uvicorn backend.api:app ...
+
+Stop the API/CLI first. Shard files follow backend/db.py (shard 0 is
+TODO_DB_PATH, shard i is "<name>-i<ext>"), so only the sessions whose shard
+changes are touched; with jump hashing that is ~(M-N)/M of them when growing.
+
+Each session is copied in one transaction on the target, then deleted in one
+transaction on the source. A crash in between leaves a duplicate copy that
+the next run discards before copying again, so the tool can simply be re-run.
+The session's version moves along (+1), so change-feed sequence numbers and
+cached copies never see it go backwards.
+Task ids are kept where the target shard has them free; the others are
+reassigned and reported (and written to --mapping as {session: {old: new}}).
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import (
+    TaskDB, TaskArchiveDB, TaskRollupDB, SessionVersionDB, ReconcileMemoDB,
+    DB_PATH, create_schema, make_engine, shard_index, shard_urls,
+)
+from backend.task_cache import read_version
+from backend import rollups
+
+tasks = TaskDB.__table__
+archived = TaskArchiveDB.__table__
+versions = SessionVersionDB.__table__
+rollup_rows = TaskRollupDB.__table__
+memo_rows = ReconcileMemoDB.__table__
+
+
+def _move_session(src, dst, session_id: str) -> Dict[int, int]:
+    """Copy one session's rows src → dst, then delete them from src. Returns id remaps."""
+    with src.connect() as conn:
+        rows = [dict(r) for r in conn.execute(select(tasks).where(tasks.c.session_id == session_id)).mappings()]
+        cold = [dict(r) for r in conn.execute(select(archived).where(archived.c.session_id == session_id)).mappings()]
+        memo = [dict(r) for r in conn.execute(select(memo_rows).where(memo_rows.c.session_id == session_id)).mappings()]
+        src_version = read_version(conn, session_id)
+    if not rows and not cold:
+        return {}
+
+    remap: Dict[int, int] = {}
+    with dst.begin() as conn:
+        # leftovers of an interrupted earlier run; under the old layout the
+        # session lived only on `src`, so anything here is ours
+        conn.execute(delete(tasks).where(tasks.c.session_id == session_id))
+        conn.execute(delete(archived).where(archived.c.session_id == session_id))
+        for r in cold:
+            del r["archive_id"]  # a fresh one on the target; `id` is informational there
+        if cold:
+            conn.execute(archived.insert(), cold)
+        conn.execute(delete(memo_rows).where(memo_rows.c.session_id == session_id))
+        if memo:
+            conn.execute(memo_rows.insert(), memo)
+        taken = set(conn.execute(select(tasks.c.id).where(tasks.c.id.in_([r["id"] for r in rows]))).scalars())
+        keep = [r for r in rows if r["id"] not in taken]
+        if keep:
+            conn.execute(tasks.insert(), keep)
+        for r in rows:
+            if r["id"] in taken:
+                old = r.pop("id")
+                remap[old] = conn.execute(tasks.insert(), r).inserted_primary_key[0]
+        # continue from the source's version: any cached copy is now stale,
+        # and a client's `since` stays at or below the new value
+        version = max(src_version, read_version(conn, session_id)) + 1
+        conn.execute(
+            sqlite_insert(versions).values(session_id=session_id, version=version)
+            .on_conflict_do_update(index_elements=[versions.c.session_id], set_={"version": version})
+        )
+        rollups.reconcile(conn, session_id)
+
+    with src.begin() as conn:
+        conn.execute(delete(tasks).where(tasks.c.session_id == session_id))
+        conn.execute(delete(archived).where(archived.c.session_id == session_id))
+        conn.execute(delete(versions).where(versions.c.session_id == session_id))
+        conn.execute(delete(rollup_rows).where(rollup_rows.c.session_id == session_id))
+        conn.execute(delete(memo_rows).where(memo_rows.c.session_id == session_id))
+    return remap
+
+
+def reshard(n_from: int, n_to: int, base: str = DB_PATH, dry_run: bool = False) -> dict:
+    src_urls = shard_urls(n_from, base)
+    dst_urls = shard_urls(n_to, base)
+    engines = {u: make_engine(u) for u in dict.fromkeys(src_urls + dst_urls)}
+    if not dry_run:
+        for e in engines.values():  # targets may be new; sources may predate later columns
+            create_schema(e)
+
+    moved_sessions: Counter = Counter()
+    moved_rows: Counter = Counter()
+    remaps: Dict[str, Dict[int, int]] = {}
+    kept = 0
+    for src_url in src_urls:
+        src = engines[src_url]
+        with src.connect() as conn:
+            if not src.dialect.has_table(conn, tasks.name):
+                continue
+            per_session = Counter(dict(conn.execute(
+                select(tasks.c.session_id, func.count()).group_by(tasks.c.session_id)
+            ).all()))
+            if src.dialect.has_table(conn, archived.name):
+                per_session.update(dict(conn.execute(
+                    select(archived.c.session_id, func.count()).group_by(archived.c.session_id)
+                ).all()))
+        for sid, n in per_session.items():
+            dst_url = dst_urls[shard_index(sid, n_to)]
+            if dst_url == src_url:
+                kept += 1
+                continue
+            key = f"{src_url} -> {dst_url}"
+            moved_sessions[key] += 1
+            moved_rows[key] += n
+            if not dry_run:
+                remap = _move_session(src, engines[dst_url], sid)
+                if remap:
+                    remaps[sid] = remap
+
+    for e in engines.values():
+        e.dispose()
+    return {
+        "from": n_from,
+        "to": n_to,
+        "dry_run": dry_run,
+        "sessions_kept": kept,
+        "sessions_moved": dict(moved_sessions),
+        "rows_moved": dict(moved_rows),
+        "id_remaps": remaps,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--from", dest="n_from", type=int, required=True, help="current shard count")
+    ap.add_argument("--to", dest="n_to", type=int, required=True, help="new shard count")
+    ap.add_argument("--base", default=DB_PATH, help="URL of shard 0 (default: TODO_DB_PATH)")
+    ap.add_argument("--dry-run", action="store_true", help="only report what would move")
+    ap.add_argument("--mapping", help="write {session: {old_id: new_id}} for reassigned ids here")
+    args = ap.parse_args(argv)
+    if args.n_from < 1 or args.n_to < 1:
+        ap.error("shard counts must be >= 1")
+
+    report = reshard(args.n_from, args.n_to, args.base, args.dry_run)
+
+    verb = "would move" if args.dry_run else "moved"
+    print(f"{args.n_from} → {args.n_to} shards: {report['sessions_kept']} session(s) stay put")
+    for key, n in sorted(report["sessions_moved"].items()):
+        print(f"  {verb} {n} session(s) / {report['rows_moved'][key]} task(s): {key}")
+    remapped = sum(len(m) for m in report["id_remaps"].values())
+    if remapped:
+        print(f"  {remapped} task id(s) reassigned on the target shard")
+    if args.mapping:
+        with open(args.mapping, "w", encoding="utf-8") as f:
+            json.dump({s: {str(k): v for k, v in m.items()} for s, m in report["id_remaps"].items()}, f, indent=2)
+    if args.n_to < args.n_from and not args.dry_run:
+        print(f"  shards {args.n_to}..{args.n_from - 1} are now empty and can be removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# resilience.py
+"""
+Circuit breaker + per-request latency budget for AI calls.
+
+Every Gemini round-trip goes through `call_guarded`, which:
+  1) refuses immediately when the request's latency budget is spent,
+  2) refuses immediately while the breaker is open,
+  3) runs the call on a worker thread and waits at most the remaining budget
+     (hedged with a second attempt for slow calls when AI_HEDGE=1, see
+     backend/hedging.py).
+
+Refusals, timeouts and provider errors all surface as `AIUnavailable`, so the
+API layer can switch to its local (degraded) path instead of hanging/500ing.
+That includes unusable output (safety blocks, empty or malformed JSON): the
+caller validates it inside the guarded call and raises `BadAIResponse`.
+
+A timed-out call can't be stopped: `Future.cancel()` only drops attempts that
+haven't started, and a running Gemini request keeps its thread until the
+client returns. Two bounds keep hung calls from draining the pool:
+  - the Gemini client has its own request timeout (AI_CLIENT_TIMEOUT_S), so
+    an abandoned thread is freed soon after the caller gave up;
+  - at most AI_MAX_WORKERS attempts are outstanding, abandoned ones included.
+    Past that, calls fail fast with reason "saturated" instead of queueing.
+
+Environment variables (optional)
+--------------------------------
+AI_BREAKER_FAILURES : consecutive failures before the breaker opens (default: 5)
+AI_BREAKER_RESET_S  : seconds the breaker stays open before a trial call (default: 30)
+AI_REQUEST_BUDGET_S : total seconds of AI time allowed per request (default: 8)
+AI_CALL_TIMEOUT_S   : cap for a single AI call (default: 6)
+AI_CLIENT_TIMEOUT_S : provider-side request timeout, bounds abandoned calls (default: 10)
+AI_MAX_WORKERS      : threads / outstanding attempts for AI calls (default: 8)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Optional
+
+from backend.metrics import Gauge
+from backend import hedging
+
+
+class AIUnavailable(RuntimeError):
+    """The AI provider was skipped (breaker open, budget spent) or failed."""
+
+    def __init__(self, message: str, reason: str = "error"):
+        super().__init__(message)
+        self.reason = reason  # short label: circuit_open | deadline_exceeded | timeout | error | ...
+
+
+class BadAIResponse(AIUnavailable):
+    """The provider answered, but with nothing usable (blocked, empty, malformed)."""
+
+    def __init__(self, message: str):
+        super().__init__(message, reason="bad_response")
+
+
+# ---------------------------
+# Circuit breaker
+# ---------------------------
+
+class CircuitBreaker:
+    """
+    Classic closed → open → half-open breaker.
+
+    closed    : calls flow; consecutive failures are counted
+    open      : calls are refused until `reset_timeout` has elapsed
+    half_open : exactly one trial call is let through; success closes,
+                failure re-opens
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_inflight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._trial_inflight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == "open":
+                return False
+            if self._state == "half_open":
+                if self._trial_inflight:
+                    return False
+                self._trial_inflight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_inflight = False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot that was never used (nothing was sent)."""
+        with self._lock:
+            self._trial_inflight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_inflight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=int(os.getenv("AI_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("AI_BREAKER_RESET_S", "30")),
+)
+
+_STATE_VALUE = {"closed": 0, "half_open": 1, "open": 2}
+BREAKER_STATE = Gauge(
+    "todo_ai_breaker_state", "Circuit breaker state (0=closed, 1=half_open, 2=open).", ("breaker",)
+)
+BREAKER_STATE.set_function(lambda: {(breaker.name,): _STATE_VALUE[breaker.state]})
+
+
+# ---------------------------
+# Per-request latency budget
+# ---------------------------
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "ai_deadline", default=None
+)
+
+
+@contextmanager
+def request_budget(seconds: Optional[float] = None):
+    """Bound the total AI time spent inside this block (one HTTP request)."""
+    if seconds is None:
+        seconds = float(os.getenv("AI_REQUEST_BUDGET_S", "8"))
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request budget, or None outside a budget."""
+    dl = _deadline.get()
+    if dl is None:
+        return None
+    return dl - time.monotonic()
+
+
+# ---------------------------
+# Guarded call
+# ---------------------------
+
+MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "8"))
+CLIENT_TIMEOUT_S = float(os.getenv("AI_CLIENT_TIMEOUT_S", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ai-call")
+# outstanding attempts, including timed-out ones still running on a thread
+_slots = threading.BoundedSemaphore(MAX_WORKERS)
+
+
+def _submit(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise AIUnavailable("saturated: every AI worker is busy", reason="saturated")
+    try:
+        fut = _executor.submit(fn, *args, **kwargs)
+    except BaseException:
+        _slots.release()
+        raise
+    fut.add_done_callback(lambda _f: _slots.release())
+    return fut
+
+
+def call_guarded(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run `fn(*args, **kwargs)` behind the breaker and the request budget.
+    Raises AIUnavailable instead of blocking past the deadline.
+    """
+    timeout = float(os.getenv("AI_CALL_TIMEOUT_S", "6"))
+    rem = remaining_budget()
+    if rem is not None:
+        if rem <= 0:
+            raise AIUnavailable(f"deadline_exceeded: {name}", reason="deadline_exceeded")
+        timeout = min(timeout, rem)
+
+    if not breaker.allow():
+        raise AIUnavailable(f"circuit_open: {name}", reason="circuit_open")
+
+    # copy the caller's context so request-scoped state follows the call
+    # (a fresh copy per attempt: one Context can't be entered by two threads)
+    def submit() -> Future:
+        return _submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    try:
+        if hedging.enabled(name):
+            result = hedging.call(name, submit, timeout)
+        else:
+            fut = submit()
+            try:
+                result = fut.result(timeout=timeout)
+            except FutureTimeout:
+                fut.cancel()  # only helps if it hasn't started; see module docstring
+                raise
+    except AIUnavailable as e:
+        if e.reason == "saturated":
+            breaker.release_trial()  # nothing was sent; let the next call be the trial
+        else:
+            breaker.record_failure()
+        raise
+    except FutureTimeout:
+        breaker.record_failure()
+        raise AIUnavailable(f"timeout: {name} exceeded {timeout:.2f}s", reason="timeout")
+    except Exception as e:
+        breaker.record_failure()
+        raise AIUnavailable(f"{name}_failed: {e}") from e
+
+    breaker.record_success()
+    return result
@@ -0,0 +1,250 @@
+# rollups.py
+"""
+Per-session task counts, maintained incrementally for dashboard stats.
+
+`task_rollups` holds one row per (session_id, category, status, due_day) with
+a count. TaskService adjusts it in the same transaction as each mutation
+(add: +1 open, done: -1 open/+1 done, delete: -1), so `GET /stats` reads a
+handful of rows instead of scanning the session's tasks.
+
+Bucketing keeps the table small regardless of history: open tasks are
+bucketed by due day ("YYYY-MM-DD", or "" without a due date), while done
+tasks all share due_day "" — so a session costs O(categories + distinct open
+due days) rows. Overdue / due today are therefore day-granular: "overdue"
+means due on an earlier day.
+
+A reconcile pass recomputes the counts from `tasks` (plus `tasks_archive`,
+whose rows count as done) and rewrites any rows that drifted (e.g. after an
+offline import or a crash between releases). It works one session per
+transaction: the write lock is held only for that session's indexed GROUP
+BY, so request writes on the shard interleave with the sweep instead of
+stalling behind a full scan. The API runs a pass at startup, which also
+backfills an existing database, and then every ROLLUP_RECONCILE_S, in a
+single worker (the one holding the "rollup-reconcile" lease, see leases.py).
+
+Environment variables (optional)
+--------------------------------
+ROLLUP_RECONCILE_S : seconds between reconcile passes; 0 = only at startup (default: 600)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, case, text, union
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import TaskDB, TaskArchiveDB, TaskRollupDB, engines
+from backend import leases
+from backend.metrics import Counter
+
+log = logging.getLogger(__name__)
+
+_rollups = TaskRollupDB.__table__
+_tasks = TaskDB.__table__
+_archive = TaskArchiveDB.__table__
+
+ROLLUP_DRIFT = Counter("todo_rollup_drift_total", "Rollup rows corrected by the reconcile job.", ())
+
+Key = Tuple[str, str, str, str]  # (session_id, category, status, due_day)
+
+
+def due_day(status: str, due_dt: Optional[datetime]) -> str:
+    if status != "open" or due_dt is None:
+        return ""
+    return due_dt.strftime("%Y-%m-%d")
+
+
+def apply(db: Any, session_id: str, category: str, status: str, due_dt: Optional[datetime], delta: int) -> None:
+    """Adjust one bucket inside the caller's transaction."""
+    _apply_bucket(db, session_id, category, status, due_day(status, due_dt), delta)
+
+
+def apply_rows(db: Any, session_id: str, rows: List[Dict[str, Any]], sign: int = +1) -> None:
+    """Bulk version of `apply` for inserted/deleted rows (one executemany upsert)."""
+    buckets: Dict[Tuple[str, str, str], int] = {}
+    for r in rows:
+        key = (r["category"], r["status"], due_day(r["status"], r.get("due_dt")))
+        buckets[key] = buckets.get(key, 0) + sign
+    if not buckets:
+        return
+    ins = sqlite_insert(_rollups)
+    db.execute(
+        ins.on_conflict_do_update(
+            index_elements=["session_id", "category", "status", "due_day"],
+            set_={"n": _rollups.c.n + ins.excluded.n},
+        ),
+        [
+            {"session_id": session_id, "category": c, "status": st, "due_day": d, "n": n}
+            for (c, st, d), n in buckets.items()
+        ],
+    )
+    if sign < 0:
+        db.execute(delete(_rollups).where(_rollups.c.session_id == session_id, _rollups.c.n <= 0))
+
+
+def _apply_bucket(db: Any, session_id: str, category: str, status: str, day: str, delta: int) -> None:
+    db.execute(
+        sqlite_insert(_rollups)
+        .values(session_id=session_id, category=category, status=status, due_day=day, n=delta)
+        .on_conflict_do_update(
+            index_elements=["session_id", "category", "status", "due_day"],
+            set_={"n": _rollups.c.n + delta},
+        )
+    )
+    if delta < 0:
+        db.execute(
+            delete(_rollups).where(
+                _rollups.c.session_id == session_id,
+                _rollups.c.category == category,
+                _rollups.c.status == status,
+                _rollups.c.due_day == day,
+                _rollups.c.n <= 0,
+            )
+        )
+
+
+def stats(db: Any, session_id: str, today: Optional[date] = None) -> Dict[str, Any]:
+    today_s = (today or date.today()).isoformat()
+    rows = db.execute(
+        select(_rollups.c.category, _rollups.c.status, _rollups.c.due_day, _rollups.c.n)
+        .where(_rollups.c.session_id == session_id)
+    ).all()
+
+    kpis = {"open": 0, "completed": 0, "overdue": 0, "due_today": 0}
+    by_cat: Dict[str, Dict[str, int]] = {}
+    for category, status, day, n in rows:
+        cat = by_cat.setdefault(category, {"open": 0, "done": 0})
+        if status == "open":
+            kpis["open"] += n
+            cat["open"] += n
+            if day and day < today_s:
+                kpis["overdue"] += n
+            elif day == today_s:
+                kpis["due_today"] += n
+        elif status == "done":
+            kpis["completed"] += n
+            cat["done"] += n
+    return {
+        **kpis,
+        "total": kpis["open"] + kpis["completed"],
+        "by_category": [{"name": k, **v} for k, v in sorted(by_cat.items())],
+    }
+
+
+# ---------------------------
+# Reconcile
+# ---------------------------
+
+def _actual(conn: Any, session_id: str) -> Dict[Key, int]:
+    day = case(
+        ((_tasks.c.status == "open") & _tasks.c.due_dt.isnot(None), func.substr(_tasks.c.due_dt, 1, 10)),
+        else_="",
+    )
+    q = (
+        select(_tasks.c.category, _tasks.c.status, day, func.count())
+        .where(_tasks.c.session_id == session_id)
+        .group_by(_tasks.c.category, _tasks.c.status, day)
+    )
+    actual = {(session_id, c or "", st or "", d or ""): n for c, st, d, n in conn.execute(q)}
+
+    # archived tasks (all done) keep counting as completed
+    aq = (
+        select(_archive.c.category, func.count())
+        .where(_archive.c.session_id == session_id)
+        .group_by(_archive.c.category)
+    )
+    for c, n in conn.execute(aq):
+        key = (session_id, c or "", "done", "")
+        actual[key] = actual.get(key, 0) + n
+    return actual
+
+
+def reconcile(conn: Any, session_id: str) -> int:
+    """Rewrite one session's drifted rollup rows from `tasks`. Returns rows fixed."""
+    # take the write lock first so no mutation lands between our read and write;
+    # the reads below are index lookups on session_id, so the lock is brief
+    conn.execute(text("UPDATE task_rollups SET n = n WHERE 0"))
+    actual = _actual(conn, session_id)
+    q = select(_rollups.c.session_id, _rollups.c.category, _rollups.c.status, _rollups.c.due_day, _rollups.c.n)
+    q = q.where(_rollups.c.session_id == session_id)
+    stored = {(s, c, st, d): n for s, c, st, d, n in conn.execute(q)}
+
+    fixed = 0
+    for key in stored.keys() - actual.keys():
+        s, c, st, d = key
+        conn.execute(delete(_rollups).where(
+            _rollups.c.session_id == s, _rollups.c.category == c,
+            _rollups.c.status == st, _rollups.c.due_day == d,
+        ))
+        fixed += 1
+    for key, n in actual.items():
+        if stored.get(key) != n:
+            s, c, st, d = key
+            conn.execute(
+                sqlite_insert(_rollups)
+                .values(session_id=s, category=c, status=st, due_day=d, n=n)
+                .on_conflict_do_update(
+                    index_elements=["session_id", "category", "status", "due_day"], set_={"n": n}
+                )
+            )
+            fixed += 1
+    return fixed
+
+
+def _sessions(eng: Any) -> List[str]:
+    """Every session with tasks, archived tasks or rollup rows on a shard (read, no lock)."""
+    q = union(
+        select(_tasks.c.session_id), select(_archive.c.session_id), select(_rollups.c.session_id)
+    )
+    with eng.connect() as conn:
+        return [s for (s,) in conn.execute(q)]
+
+
+def reconcile_all() -> int:
+    """Reconcile every session, one transaction each."""
+    fixed = 0
+    for eng in engines:
+        for session_id in _sessions(eng):
+            with eng.begin() as conn:
+                fixed += reconcile(conn, session_id)
+    if fixed:
+        ROLLUP_DRIFT.inc(fixed)
+        log.warning("rollup reconcile corrected %d row(s)", fixed)
+    return fixed
+
+
+def start_reconciler() -> threading.Event:
+    """
+    Reconcile now (also backfills), then every ROLLUP_RECONCILE_S in a daemon
+    thread. Only the worker holding the lease runs the passes.
+    """
+    interval = float(os.getenv("ROLLUP_RECONCILE_S", "600"))
+    # outlives one interval, so the holder keeps it while it's alive
+    ttl = 2 * max(interval, 60.0)
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while True:
+            t0 = time.monotonic()
+            try:
+                if leases.acquire("rollup-reconcile", ttl):
+                    reconcile_all()
+            except Exception:
+                log.exception("rollup reconcile failed")
+            if interval <= 0:
+                return
+            if stop.wait(max(0.0, interval - (time.monotonic() - t0))):
+                try:
+                    leases.release("rollup-reconcile")  # let another worker take over now
+                except Exception:
+                    log.exception("rollup lease release failed")
+                return
+
+    threading.Thread(target=_loop, name="rollup-reconcile", daemon=True).start()
+    return stop
@@ -0,0 +1,311 @@
+# scheduler.py
+"""
+In-process due-time scheduler: pushes "due soon" and "overdue" events at the
+moment they happen instead of clients polling `/tasks/immediate`.
+
+One min-heap of (fire_at, task) entries, two per open task with a due_dt:
+`task.due_soon` at due_dt - DUE_SOON_MINUTES and `task.overdue` at due_dt.
+A single daemon thread sleeps on a condition variable until the earliest
+entry (or until a mutation pushes an earlier one) and publishes to
+`events.hub`. Entries are invalidated lazily: a popped entry only fires if
+the task is still tracked with the same due_dt and that event hasn't fired.
+A task whose overdue event fired stays tracked until it drops behind the
+session's reload horizon (below), so a reload never fires it twice.
+
+Events only reach clients subscribed to this process's hub, so the heap
+only covers *watched* sessions, those with an open event stream here:
+- A session is loaded (one indexed query) when its first stream opens; times
+  already in the past are not replayed. It's dropped when the last one closes.
+- TaskService mutations update the heap directly and advance the session's
+  known version (the change feed's `seq`).
+- Every DUE_SYNC_S the versions of watched sessions are read from
+  `session_versions` (primary-key lookups). A session whose version moved
+  without passing through this process (another uvicorn worker, an import)
+  is reloaded from its horizon: the previous check minus 2 * DUE_SYNC_S.
+  A task discovered that way fires immediately if one of its times passed
+  since then, which covers tasks falling due between two checks and tasks
+  created just past due elsewhere; older past-due times are not replayed.
+So database work grows with connected sessions and their writes, not with
+the total number of tasks. DUE_RESYNC_S optionally reloads every watched
+session regardless of versions, as a safety net.
+
+Environment variables (optional)
+--------------------------------
+DUE_SCHEDULER     : "1" to run the scheduler in the API process (default: "1")
+DUE_SOON_MINUTES  : lead time of the due-soon event (default: 60)
+DUE_SYNC_S        : seconds between version checks of watched sessions (default: 2)
+DUE_RESYNC_S      : seconds between full reloads of watched sessions; 0 disables (default: 0)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from backend.db import SessionVersionDB, TaskDB, sessionmaker_for, sessionmakers, shard_index
+from backend.events import hub
+from backend.metrics import Gauge
+from backend.models import Task
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[str, int]  # (session_id, task_id)
+
+
+class _Tracked:
+    __slots__ = ("task", "fired")
+
+    def __init__(self, task: Task):
+        self.task = task
+        self.fired: Set[str] = set()
+
+
+class DueScheduler:
+    def __init__(
+        self,
+        due_soon: Optional[timedelta] = None,
+        sync_s: Optional[float] = None,
+        resync_s: Optional[float] = None,
+    ):
+        self.due_soon = due_soon or timedelta(minutes=float(os.getenv("DUE_SOON_MINUTES", "60")))
+        self.sync_s = float(os.getenv("DUE_SYNC_S", "2")) if sync_s is None else sync_s
+        self.resync_s = float(os.getenv("DUE_RESYNC_S", "0")) if resync_s is None else resync_s
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[datetime, int, str, int, str, datetime]] = []
+        self._tasks: Dict[Key, _Tracked] = {}
+        self._versions: Dict[str, int] = {}  # watched session -> version the heap reflects
+        self._horizon: Dict[str, datetime] = {}  # watched session -> reloads look back to here
+        self.lookback = timedelta(seconds=2 * max(self.sync_s, 0.1))
+        self._counter = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    # -- lifecycle ------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="due-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    # -- mutations (called by TaskService after commit) -----------------
+
+    def track(self, session_id: str, task: Task, version: Optional[int] = None) -> None:
+        if not self.running or session_id not in self._versions:
+            return
+        if task.status != "open" or task.due_dt is None:
+            self.untrack(session_id, task.id, version)
+            return
+        with self._cond:
+            self._track(session_id, task, datetime.now(), initial=False)
+            self._advance(session_id, version)
+            self._cond.notify()
+
+    def untrack(self, session_id: str, task_id: int, version: Optional[int] = None) -> None:
+        if not self.running or session_id not in self._versions:
+            return
+        with self._cond:
+            self._tasks.pop((session_id, task_id), None)
+            self._advance(session_id, version)
+
+    def pending(self) -> int:
+        return sum(1 for t in self._tasks.values() if "overdue" not in t.fired)
+
+    # -- internals ------------------------------------------------------
+
+    def _advance(self, session_id: str, version: Optional[int]) -> None:
+        # call with self._cond held; a write we saw right after the last known
+        # version needs no reload, anything else is left for sync() to catch
+        known = self._versions.get(session_id)
+        if version is not None and known is not None and version == known + 1:
+            self._versions[session_id] = version
+
+    def _track(self, session_id: str, task: Task, now: datetime, initial: bool) -> None:
+        # call with self._cond held
+        key = (session_id, task.id)
+        cur = self._tasks.get(key)
+        if cur is not None and cur.task.due_dt == task.due_dt:
+            cur.task = task  # same schedule; refresh the payload only
+            return
+        tracked = self._tasks[key] = _Tracked(task)
+        due = task.due_dt
+        for kind, at in (("due_soon", due - self.due_soon), ("overdue", due)):
+            if at <= now:
+                # at startup, times already passed were (or should have been)
+                # seen by the client before; a live or newly discovered task
+                # fires right away, except due_soon for one already overdue
+                if initial or (kind == "due_soon" and due <= now):
+                    tracked.fired.add(kind)
+                    continue
+                at = now
+            heapq.heappush(self._heap, (at, next(self._counter), session_id, task.id, kind, due))
+
+    def _set_horizon(self, session_id: str, at: datetime) -> None:
+        # call with self._cond held; never moves back
+        old = self._horizon.get(session_id)
+        horizon = at - self.lookback if old is None else max(old, at - self.lookback)
+        self._horizon[session_id] = horizon
+        # fired tasks behind the horizon can't be loaded again; forget them
+        for key in [
+            k for k, t in self._tasks.items()
+            if k[0] == session_id and "overdue" in t.fired and t.task.due_dt <= horizon
+        ]:
+            del self._tasks[key]
+
+    def _load_session(self, session_id: str, version: int) -> None:
+        """(Re)load one session's open tasks due after its horizon."""
+        now = datetime.now()
+        with self._cond:
+            # a first load marks what it finds past due as fired (see _track)
+            since = self._horizon.get(session_id, now - self.lookback)
+        db = sessionmaker_for(session_id)()
+        try:
+            q = db.query(TaskDB).filter(
+                TaskDB.session_id == session_id,
+                TaskDB.status == "open",
+                TaskDB.due_dt.isnot(None),
+                TaskDB.due_dt > since,
+            )
+            tasks = [Task.model_validate(o.__dict__) for o in q]
+        finally:
+            db.close()
+
+        with self._cond:
+            initial = session_id not in self._versions
+            seen = set()
+            for task in tasks:
+                seen.add((session_id, task.id))
+                self._track(session_id, task, now, initial)
+            # closed/deleted elsewhere (unfired ones behind the horizon stay until they fire)
+            for key in [
+                k for k, t in self._tasks.items()
+                if k[0] == session_id and k not in seen and t.task.due_dt > since
+            ]:
+                del self._tasks[key]
+            self._versions[session_id] = version
+            self._set_horizon(session_id, now)
+            self._cond.notify()
+
+    def _read_versions(self, session_ids: List[str]) -> Dict[str, int]:
+        by_shard: Dict[int, List[str]] = {}
+        for sid in session_ids:
+            by_shard.setdefault(shard_index(sid, len(sessionmakers)), []).append(sid)
+        versions = SessionVersionDB.__table__
+        out: Dict[str, int] = {}
+        for idx, sids in by_shard.items():
+            db = sessionmakers[idx]()
+            try:
+                for i in range(0, len(sids), 500):
+                    q = select(versions.c.session_id, versions.c.version).where(
+                        versions.c.session_id.in_(sids[i:i + 500])
+                    )
+                    out.update({s: v for s, v in db.execute(q)})
+            finally:
+                db.close()
+        return out
+
+    def sync(self, force: bool = False) -> None:
+        """Follow stream subscriptions and reload watched sessions whose version moved."""
+        watched = set(hub.sessions())
+        with self._cond:
+            for sid in [s for s in self._versions if s not in watched]:
+                del self._versions[sid]
+            for key in [k for k in self._tasks if k[0] not in watched]:
+                del self._tasks[key]
+            for sid in [s for s in self._horizon if s not in watched]:
+                del self._horizon[sid]
+            # drop invalidated heap entries
+            self._heap = [e for e in self._heap if self._valid(e)]
+            heapq.heapify(self._heap)
+            known = dict(self._versions)
+        if not watched:
+            return
+        read_at = datetime.now()
+        current = self._read_versions(sorted(watched))
+        for sid in watched:
+            version = current.get(sid, 0)
+            if force or known.get(sid) != version:
+                self._load_session(sid, version)
+            else:
+                with self._cond:
+                    if sid in self._versions:
+                        self._set_horizon(sid, read_at)
+
+    def load(self) -> None:
+        """Reload every watched session from the database."""
+        self.sync(force=True)
+
+    def _valid(self, entry: Tuple[datetime, int, str, int, str, datetime]) -> bool:
+        _, _, sid, tid, kind, due = entry
+        tracked = self._tasks.get((sid, tid))
+        return tracked is not None and tracked.task.due_dt == due and kind not in tracked.fired
+
+    def _pop_ready(self, now: datetime) -> List[Tuple[str, Dict[str, Any]]]:
+        out = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._valid(entry):
+                continue
+            _, _, sid, tid, kind, due = entry
+            tracked = self._tasks[(sid, tid)]
+            tracked.fired.add(kind)
+            out.append((sid, {
+                "type": f"task.{kind}",
+                "task": tracked.task.model_dump(mode="json"),
+                "due_dt": due.isoformat(),
+                "at": now.isoformat(),
+            }))
+        return out
+
+    def _run(self) -> None:
+        next_sync = time.monotonic()
+        next_resync = time.monotonic() + self.resync_s if self.resync_s > 0 else None
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                ready = self._pop_ready(datetime.now())
+                if not ready:
+                    timeout = max(0.0, next_sync - time.monotonic())
+                    if self._heap:
+                        timeout = min(timeout, max(0.0, (self._heap[0][0] - datetime.now()).total_seconds()))
+                    self._cond.wait(timeout)
+            for sid, event in ready:
+                hub.publish(sid, event)
+            if time.monotonic() >= next_sync:
+                force = next_resync is not None and time.monotonic() >= next_resync
+                try:
+                    self.sync(force=force)
+                except Exception:
+                    log.exception("due scheduler sync failed")
+                finally:
+                    next_sync = time.monotonic() + max(0.1, self.sync_s)
+                    if force:
+                        next_resync = time.monotonic() + self.resync_s
+
+
+scheduler = DueScheduler()
+
+PENDING = Gauge("todo_due_scheduler_tasks", "Open tasks tracked by the due-time scheduler.", ())
+PENDING.set_function(lambda: {(): scheduler.pending()})
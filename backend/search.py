@@ -0,0 +1,132 @@
+# search.py
+"""
+Full-text task search over SQLite FTS5 — no LLM round-trip.
+
+`tasks_fts` is an external-content FTS5 table over tasks.text and
+tasks.category (content='tasks', rowid = tasks.id), kept in sync by
+AFTER INSERT/DELETE/UPDATE triggers, so the index costs no extra code on the
+write path and is rebuilt once from `tasks` when first created.
+
+Queries are tokenized on our side and every term becomes a quoted prefix
+term ("groc"* AND "mon"*), so user input can never be FTS5 syntax; results
+are ranked by BM25 (text weighted over category), scoped by session_id, and
+come with a `snippet()` excerpt around the match.
+
+If the SQLite build lacks FTS5, search degrades to LIKE matching (unranked).
+"""
+
+from __future__ import annotations
+
+import re
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text, DateTime
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+FTS_TABLE = "tasks_fts"
+BM25_WEIGHTS = (10.0, 2.0)  # text, category
+SNIPPET_TOKENS = 12
+HIGHLIGHT = ("<mark>", "</mark>")
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, category,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text, category) VALUES (new.id, new.text, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, category)
+        VALUES ('delete', old.id, old.text, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text, category ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, category)
+        VALUES ('delete', old.id, old.text, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, text, category) VALUES (new.id, new.text, new.category);
+    END""",
+]
+
+_fts_ok: Dict[str, bool] = {}
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+_COLUMNS = "t.id, t.text, t.category, t.priority, t.due_dt, t.status, t.created_at"
+
+
+def install(engine: Engine) -> bool:
+    """Create the FTS table + triggers on `engine` if missing. False if FTS5 is unavailable."""
+    if engine.dialect.name != "sqlite":
+        _fts_ok[str(engine.url)] = False
+        return False
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}
+        ).first()
+        try:
+            if not exists:
+                conn.execute(text(_DDL[0]))
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            for ddl in _DDL[1:]:
+                conn.execute(text(ddl))
+        except Exception as e:  # e.g. "no such module: fts5"
+            log.warning("FTS5 unavailable on %s, search falls back to LIKE: %s", engine.url, e)
+            _fts_ok[str(engine.url)] = False
+            return False
+    _fts_ok[str(engine.url)] = True
+    return True
+
+
+def fts_query(q: str) -> Optional[str]:
+    """User text → safe FTS5 query: every token a quoted prefix term, ANDed."""
+    tokens = _TOKEN.findall(q.lower())
+    if not tokens:
+        return None
+    return " AND ".join(f'"{t}"*' for t in tokens)
+
+
+def search(
+    db: Any,
+    session_id: str,
+    q: str,
+    limit: int = 20,
+    status: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Rows (task columns + score + snippet) best match first."""
+    match = fts_query(q)
+    if match is None:
+        return []
+    params: Dict[str, Any] = {"sid": session_id, "limit": limit}
+    status_sql = ""
+    if status:
+        status_sql = " AND t.status = :status"
+        params["status"] = status
+
+    url = str(db.get_bind().url)
+    if _fts_ok.get(url) is None:
+        install(db.get_bind())
+    if _fts_ok.get(url):
+        params.update(match=match, open=HIGHLIGHT[0], close=HIGHLIGHT[1])
+        sql = (
+            f"SELECT {_COLUMNS}, bm25({FTS_TABLE}, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]}) AS score,"
+            f" snippet({FTS_TABLE}, 0, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet"
+            f" FROM {FTS_TABLE} JOIN tasks t ON t.id = {FTS_TABLE}.rowid"
+            f" WHERE {FTS_TABLE} MATCH :match AND t.session_id = :sid{status_sql}"
+            " ORDER BY score LIMIT :limit"
+        )
+    else:
+        likes = []
+        for i, tok in enumerate(_TOKEN.findall(q.lower())):
+            params[f"p{i}"] = f"%{tok}%"
+            likes.append(f"(lower(t.text) LIKE :p{i} OR lower(t.category) LIKE :p{i})")
+        sql = (
+            f"SELECT {_COLUMNS}, 0.0 AS score, t.text AS snippet FROM tasks t"
+            f" WHERE t.session_id = :sid{status_sql} AND {' AND '.join(likes)}"
+            " ORDER BY t.created_at DESC LIMIT :limit"
+        )
+    stmt = text(sql).columns(due_dt=DateTime, created_at=DateTime)
+    return [dict(r) for r in db.execute(stmt, params).mappings()]
@@ -1,27 +1,60 @@
 # services.py
 from datetime import datetime
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
 from sqlalchemy import and_, or_
 
-from backend.db import SessionLocal, init_db, TaskDB
+from backend.db import TaskDB, sessionmaker_for
 from backend.models import Task
-from backend.ai_client import categorize_and_enrich
-
-init_db()
+from backend.ai_client import categorize_and_enrich, fallback_enrich
+from backend.resilience import AIUnavailable
+from backend.profiling import note
+from backend import archive, group_commit, rollups, search, task_cache, transfer
+from backend.task_cache import bump_version, read_version
+from backend.scheduler import scheduler
+from backend.events import hub
+from backend.reconcile_memo import memo as reconcile_memo
 
 
 class TaskService:
     def __init__(self, session_id: str = "local"):
-        self.db = SessionLocal()
         self.session_id = session_id  # stick to one session per service
+        self._sessionmaker = sessionmaker_for(session_id)  # the shard owning this session
+        self.db = self._sessionmaker()
+        self.last_degraded = False  # True when the last add skipped Gemini
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "TaskService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def _to_task(self, obj: TaskDB) -> Task:
         # Pydantic (v2) ignores extra fields like session_id by default
         return Task.model_validate(obj.__dict__)
 
-    def add_task(self, text: str) -> Task:
-        # collect existing categories for this session
-        existing = [
+    def _write(self, op: Callable[[Any], Any]) -> Any:
+        # op(session) does the mutation without committing; with GROUP_COMMIT=1
+        # it is batched with other requests' writes into one transaction
+        if group_commit.enabled():
+            # hand our pooled connection back first: with every pool slot held by
+            # a request waiting on the writer, the writer could never check one out
+            self.db.rollback()
+            return group_commit.get_writer(self._sessionmaker).run(op)
+        try:
+            result = op(self.db)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return result
+
+    def categories(self) -> List[str]:
+        """Distinct categories of the session's tasks."""
+        return [
             row[0]
             for row in (
                 self.db.query(TaskDB.category)
@@ -31,8 +64,35 @@ class TaskService:
             )
         ]
 
-        # ask AI to classify, with merging against existing categories
-        meta = categorize_and_enrich(text, existing_categories=existing)
+    def enrich(self, text: str, existing: List[str]) -> dict:
+        """
+        Category/priority/due for `text`, reconciled against `existing`.
+        Doesn't touch self.db, so a batch can run several from worker threads.
+        """
+        # ask AI to classify, with merging against existing categories;
+        # if Gemini is down/slow, save with local defaults instead of failing
+        try:
+            return categorize_and_enrich(text, existing_categories=existing, session_id=self.session_id)
+        except AIUnavailable:
+            return fallback_enrich(text, existing_categories=existing, session_id=self.session_id)
+
+    def rereconcile(self, meta: dict, existing: List[str]) -> dict:
+        """
+        Map a meta enriched against an older category list onto `existing`:
+        a batch enriches concurrently, so an item whose proposal is new to the
+        snapshot may match a category an earlier item of the batch created.
+        """
+        if meta["category"] in existing:
+            return meta
+        final, _ = reconcile_memo.resolve(self.session_id, meta["raw_category"], existing)
+        return {**meta, "category": final.strip()}
+
+    def add_task(self, text: str) -> Task:
+        return self.add_enriched(text, self.enrich(text, self.categories()))
+
+    def add_enriched(self, text: str, meta: dict) -> Task:
+        """Insert a task whose enrichment (see enrich) is already done."""
+        self.last_degraded = bool(meta.get("degraded"))
 
         db_obj = TaskDB(
             text=text,
@@ -42,19 +102,65 @@ class TaskService:
             created_at=datetime.now(),
             session_id=self.session_id,
         )
-        print("SAVE DEBUG — raw:", meta["raw_category"], "| final:", meta["category"])
-        self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
-        return self._to_task(db_obj)
+        note("save", raw=meta["raw_category"], final=meta["category"], degraded=self.last_degraded)
+
+        def op(db) -> Tuple[Task, int]:
+            db.add(db_obj)
+            db.flush()
+            db.refresh(db_obj)  # id, column defaults, and values as SQLite returns them
+            rollups.apply(db, self.session_id, db_obj.category, "open", db_obj.due_dt, +1)
+            return self._to_task(db_obj), bump_version(db, self.session_id)
+
+        task, version = self._write(op)
+        self._changed("created", task, version)
+        return task
+
+    def _changed(self, kind: str, task: Task, version: int) -> None:
+        """After a committed mutation: update the cache, the due-time scheduler
+        and publish the change (seq = the session version it produced)."""
+        if kind == "deleted":
+            task_cache.cache.apply(self.session_id, version, lambda tasks: tasks.pop(task.id, None))
+            scheduler.untrack(self.session_id, task.id, version)
+        else:
+            task_cache.cache.apply(self.session_id, version, lambda tasks: tasks.__setitem__(task.id, task))
+            scheduler.track(self.session_id, task, version)
+        hub.publish_change(
+            self.session_id,
+            {"type": f"task.{kind}", "seq": version, "task": task.model_dump(mode="json")},
+        )
+
+    def version(self) -> int:
+        """Current change-feed sequence of the session."""
+        return read_version(self.db, self.session_id)
+
+    def _cached_tasks(self) -> Optional[List[Task]]:
+        """All tasks of the session from the write-through cache (None if disabled)."""
+        cache = task_cache.cache
+        if not cache.enabled:
+            return None
+        version = read_version(self.db, self.session_id)
+        tasks = cache.get(self.session_id, version)
+        if tasks is None:
+            tasks = [
+                self._to_task(o)
+                for o in self.db.query(TaskDB).filter(TaskDB.session_id == self.session_id).all()
+            ]
+            cache.fill(self.session_id, version, tasks)
+        return tasks
 
     def list_tasks(self, category: Optional[str] = None) -> List[Task]:
+        cached = self._cached_tasks()
+        if cached is not None:
+            return task_cache.by_created_desc(cached, category)
         q = self.db.query(TaskDB).filter(TaskDB.session_id == self.session_id)
         if category:
             q = q.filter(TaskDB.category == category)
         return [self._to_task(o) for o in q.order_by(TaskDB.created_at.desc()).all()]
 
     def list_immediate(self, cutoff: datetime) -> List[Task]:
+        cached = self._cached_tasks()
+        if cached is not None:
+            return task_cache.immediate(cached, cutoff)
         q = self.db.query(TaskDB).filter(
             and_(
                 TaskDB.session_id == self.session_id,
@@ -70,28 +176,145 @@ class TaskService:
             for o in q.order_by(TaskDB.due_dt.asc().nulls_last()).all()
         ]
 
-    def mark_done(self, task_id: int) -> Optional[Task]:
-        obj = (
-            self.db.query(TaskDB)
+    def import_rows(self, rows: List[dict], enrich: str = "missing", ai_rows: Optional[int] = None) -> dict:
+        """
+        Insert parsed import rows (see transfer.parse_row) with one executemany.
+        Rows missing category/priority/due_dt (or all rows, enrich="all") go
+        through AI enrichment first, IMPORT_AI_WORKERS at a time; enrich="none"
+        fills them locally, and so does every row past the first `ai_rows`.
+        """
+        existing = self.categories()
+        snapshot = list(existing)
+        seen = set(existing)
+        todo = [i for i, r in enumerate(rows) if transfer.needs_enrichment(r, enrich)] if enrich != "none" else []
+        use_ai = todo if ai_rows is None else todo[: max(0, ai_rows)]
+        metas = {}
+        if use_ai:
+            # enriched concurrently against the snapshot, reconciled in order below
+            workers = min(len(use_ai), max(1, transfer.IMPORT_AI_WORKERS))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import-enrich") as pool:
+                futures = {i: pool.submit(self.enrich, rows[i]["text"], snapshot) for i in use_ai}
+                metas = {i: f.result() for i, f in futures.items()}
+        enriched = len(use_ai)
+        over_limit = len(todo) - enriched
+        now = datetime.now()
+        records = []
+        for i, r in enumerate(rows):
+            if transfer.needs_enrichment(r, enrich):
+                if i in metas:
+                    meta = metas[i]
+                    if len(existing) > len(snapshot):
+                        meta = self.rereconcile(meta, existing)
+                elif enrich == "none":
+                    meta = fallback_enrich(r["text"], existing, self.session_id) if "category" not in r else {}
+                else:
+                    meta = fallback_enrich(r["text"], existing_categories=existing, session_id=self.session_id)
+                for k in ("category", "priority", "due_dt"):
+                    if enrich == "all" or k not in r:
+                        r[k] = meta.get(k)
+                if r["due_dt"] is not None and r["due_dt"].tzinfo is not None:
+                    r["due_dt"] = r["due_dt"].replace(tzinfo=None)
+            r["priority"] = r.get("priority") or 3
+            r["category"] = r.get("category") or "personal"
+            if r["category"] not in seen:
+                seen.add(r["category"])
+                existing.append(r["category"])
+            done_at = now if r["status"] == "done" else None
+            records.append({**r, "session_id": self.session_id, "done_at": done_at})
+
+        def op(db) -> int:
+            db.execute(TaskDB.__table__.insert(), records)
+            rollups.apply_rows(db, self.session_id, records)
+            return bump_version(db, self.session_id)
+
+        version = self._write(op)
+        # too many rows to push one by one: tell live clients to refetch (the
+        # cache and the scheduler's sync notice the version jump by themselves)
+        hub.publish_change(self.session_id, {"type": "reset", "seq": version})
+        return {"imported": len(records), "enriched": enriched, "over_ai_limit": over_limit}
+
+    def export_ndjson(self) -> Iterator[bytes]:
+        return transfer.export_ndjson(self._sessionmaker, self.session_id)
+
+    def export_pages(self) -> Iterator[List[dict]]:
+        return transfer.export_pages(self._sessionmaker, self.session_id)
+
+    def archived(self, limit: int = 50, before: Optional[int] = None, q: Optional[str] = None) -> List[dict]:
+        """Archived (cold) tasks of the session, newest archive first."""
+        return archive.list_archived(self.db, self.session_id, limit=limit, before=before, q=q)
+
+    def restore(self, archive_id: int) -> Optional[Task]:
+        """Bring an archived task back into the hot table (still done)."""
+        def op(db) -> Tuple[Optional[Task], int]:
+            obj = archive.restore(db, self.session_id, archive_id)
+            if obj is None:
+                return None, 0
+            return self._to_task(obj), bump_version(db, self.session_id)
+
+        task, version = self._write(op)
+        if task is not None:
+            self._changed("created", task, version)
+        return task
+
+    def category_memo(self) -> List[dict]:
+        """Remembered proposal → category decisions (learned and corrected)."""
+        return reconcile_memo.entries(self.session_id)
+
+    def correct_category(self, proposed: str, category: str) -> dict:
+        """From now on, AI proposal `proposed` is filed under `category`."""
+        return reconcile_memo.correct(self.session_id, proposed, category)
+
+    def forget_category(self, proposed: str) -> bool:
+        return reconcile_memo.forget(self.session_id, proposed)
+
+    def stats(self) -> dict:
+        """Dashboard counts from the rollup table (O(categories), no task scan)."""
+        return rollups.stats(self.db, self.session_id)
+
+    def search(self, q: str, limit: int = 20, status: Optional[str] = None) -> List[dict]:
+        """Full-text search (FTS5/BM25) within this session; no AI call."""
+        hits = search.search(self.db, self.session_id, q, limit=limit, status=status)
+        out = []
+        for row in hits:
+            score, snippet = row.pop("score"), row.pop("snippet")
+            out.append({**Task.model_validate(row).model_dump(), "score": score, "snippet": snippet})
+        return out
+
+    def _get(self, db, task_id: int) -> Optional[TaskDB]:
+        return (
+            db.query(TaskDB)
             .filter(TaskDB.session_id == self.session_id, TaskDB.id == task_id)
             .first()
         )
-        if obj and obj.status == "open":
-            obj.status = "done"
-            self.db.commit()
-            self.db.refresh(obj)
-            return self._to_task(obj)
-        return None
+
+    def mark_done(self, task_id: int) -> Optional[Task]:
+        def op(db) -> Tuple[Optional[Task], int]:
+            obj = self._get(db, task_id)
+            if obj and obj.status == "open":
+                obj.status = "done"
+                obj.done_at = datetime.now()
+                db.flush()
+                rollups.apply(db, self.session_id, obj.category, "open", obj.due_dt, -1)
+                rollups.apply(db, self.session_id, obj.category, "done", obj.due_dt, +1)
+                return self._to_task(obj), bump_version(db, self.session_id)
+            return None, 0
+
+        task, version = self._write(op)
+        if task is not None:
+            self._changed("updated", task, version)
+        return task
 
     def delete(self, task_id: int) -> Optional[Task]:
-        obj = (
-            self.db.query(TaskDB)
-            .filter(TaskDB.session_id == self.session_id, TaskDB.id == task_id)
-            .first()
-        )
-        if obj:
-            task = self._to_task(obj)
-            self.db.delete(obj)
-            self.db.commit()
-            return task
-        return None
\ No newline at end of file
+        def op(db) -> Tuple[Optional[Task], int]:
+            obj = self._get(db, task_id)
+            if obj:
+                task = self._to_task(obj)
+                db.delete(obj)
+                rollups.apply(db, self.session_id, obj.category, obj.status, obj.due_dt, -1)
+                return task, bump_version(db, self.session_id)
+            return None, 0
+
+        task, version = self._write(op)
+        if task is not None:
+            self._changed("deleted", task, version)
+        return task
\ No newline at end of file
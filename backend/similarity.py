@@ -18,6 +18,11 @@ Strategy (in order)
 3) Semantic similarity via SentenceTransformers (optional, lazy)
 4) Fuzzy string similarity (difflib)
 
+With SIMILARITY_FUZZY_SHORTCUT set, a fuzzy score at or above it decides
+before step 3, so near-identical spellings ("Healt", "Errands ") skip the
+encoder. `python -m bench.reconcile` measures accuracy, per-stage latency and
+encoder calls for threshold choices against a labeled corpus.
+
 If none exceed thresholds, keep the proposed value.
 
 Environment variables (optional)
@@ -25,7 +30,11 @@ Environment variables (optional)
 SENTENCE_MODEL_NAME              : HuggingFace model id (default: "sentence-transformers/all-MiniLM-L6-v2")
 SIMILARITY_MODEL_MIN             : Float [0..1], minimum cosine similarity (default: 0.58)
 SIMILARITY_FUZZY_MIN             : Float [0..1], minimum difflib ratio (default: 0.88)
+SIMILARITY_FUZZY_SHORTCUT        : Float [0..1], difflib ratio that decides before the encoder
+                                   runs (default: unset = always try the encoder first)
 SIMILARITY_ALLOW_CREATE_FROM_SYNONYM : "1" or "0" (default "1")
+EMBED_SOCKET                     : Unix socket of a shared encoder (backend/embed_server.py);
+                                   when set, no model is loaded in-process
 
 Dependencies (optional)
 -----------------------
@@ -82,8 +91,17 @@ def _load_encoder():
     """
     Lazy-load SentenceTransformer. Returns (encode_fn, model_name) or (None, None)
     if not available.
+
+    If EMBED_SOCKET is set, returns a client for the shared embed server instead;
+    per-call failures surface as exceptions, which reconcile_category treats as
+    "no model" for that call.
     """
     model_id = os.getenv("SENTENCE_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+    socket_path = os.getenv("EMBED_SOCKET")
+    if socket_path:
+        from backend.embed_server import EmbedClient
+
+        return EmbedClient(socket_path).encode, model_id
     try:
         from sentence_transformers import SentenceTransformer
         model = SentenceTransformer(model_id)
@@ -97,6 +115,18 @@ def _load_encoder():
         return None, None
 
 
+def warmup() -> bool:
+    """Load the encoder (or connect to the embed server) and run one encode."""
+    encode, _ = _load_encoder()
+    if encode is None:
+        return False
+    try:
+        encode(["warmup"])
+        return True
+    except Exception:
+        return False
+
+
 def _cosine(a: Vector, b: Vector) -> float:
     # Vectors are already normalized by encode(), so cosine == dot
     return float(sum(x * y for x, y in zip(a, b)))
@@ -128,6 +158,18 @@ _DEFAULT_SYNONYMS: Mapping[str, str] = {
 }
 
 
+def _fuzzy_best(norm_prop: str, existing_norm: Sequence[str]) -> Tuple[Optional[str], float]:
+    """Existing (normalized) category closest to `norm_prop` by difflib ratio."""
+    best_ratio = 0.0
+    best_key = None
+    for k in existing_norm:
+        ratio = difflib.SequenceMatcher(None, norm_prop, k).ratio()
+        if ratio > best_ratio:
+            best_ratio = ratio
+            best_key = k
+    return best_key, float(best_ratio)
+
+
 # ---------------------------
 # Public API
 # ---------------------------
@@ -139,6 +181,7 @@ def reconcile_category(
     synonyms: Optional[Mapping[str, str]] = None,
     threshold_model: Optional[float] = None,
     threshold_fuzzy: Optional[float] = None,
+    threshold_fuzzy_shortcut: Optional[float] = None,
     allow_create_from_synonym: Optional[bool] = None,
 ) -> Tuple[str, Dict[str, Any]]:
     """
@@ -181,6 +224,8 @@ def reconcile_category(
         if threshold_fuzzy is not None
         else float(os.getenv("SIMILARITY_FUZZY_MIN", "0.88"))
     )
+    if threshold_fuzzy_shortcut is None and os.getenv("SIMILARITY_FUZZY_SHORTCUT"):
+        threshold_fuzzy_shortcut = float(os.getenv("SIMILARITY_FUZZY_SHORTCUT", ""))
     allow_create_from_synonym = (
         bool(int(os.getenv("SIMILARITY_ALLOW_CREATE_FROM_SYNONYM", "1")))
         if allow_create_from_synonym is None
@@ -190,6 +235,7 @@ def reconcile_category(
     dbg["thresholds"] = {
         "model": threshold_model,
         "fuzzy": threshold_fuzzy,
+        "fuzzy_shortcut": threshold_fuzzy_shortcut,
         "allow_create_from_synonym": allow_create_from_synonym,
     }
 
@@ -222,6 +268,16 @@ def reconcile_category(
             dbg["scores"]["synonym"] = f"{norm_prop}->{mapped_norm}"
             return final_cat, dbg
 
+    # 2b) Fuzzy shortcut: a near-identical spelling doesn't need the encoder
+    best_key, best_ratio = None, None
+    if threshold_fuzzy_shortcut is not None:
+        best_key, best_ratio = _fuzzy_best(norm_prop, existing_norm)
+        dbg["scores"]["fuzzy_best"] = best_ratio
+        if best_key and best_ratio >= threshold_fuzzy_shortcut:
+            dbg["method"] = "fuzzy"
+            dbg["scores"]["fuzzy_shortcut"] = True
+            return canon_map[best_key], dbg
+
     # 3) Semantic similarity (SentenceTransformers) — optional
     encode, model_name = _load_encoder()
     if encode is not None:
@@ -247,14 +303,9 @@ def reconcile_category(
             dbg["model"]["error"] = str(exc)
 
     # 4) Fuzzy fallback
-    best_ratio = 0.0
-    best_key = None
-    for k in existing_norm:
-        ratio = difflib.SequenceMatcher(None, norm_prop, k).ratio()
-        if ratio > best_ratio:
-            best_ratio = ratio
-            best_key = k
-    dbg["scores"]["fuzzy_best"] = float(best_ratio)
+    if best_ratio is None:
+        best_key, best_ratio = _fuzzy_best(norm_prop, existing_norm)
+        dbg["scores"]["fuzzy_best"] = best_ratio
 
     if best_key and best_ratio >= threshold_fuzzy:
         final_cat = canon_map[best_key]
@@ -0,0 +1,169 @@
+# task_cache.py
+"""
+In-process, write-through LRU of per-session task lists.
+
+The frontend re-reads `GET /tasks` and `GET /tasks/immediate` after every
+action; with this cache those reads cost one primary-key lookup (the session's
+version row) instead of a full scan of the session's tasks.
+
+- Filled on the first read of a session (all its tasks, one query).
+- Updated in place by TaskService mutations after their commit, never dropped
+  just because the session was written to.
+- Bounded by the total number of cached tasks; least recently used sessions
+  are evicted first.
+- Cross-worker consistency: every mutation bumps `session_versions.version`
+  in the same transaction (see `bump_version`). Readers compare the current
+  row with the version their copy was built from and reload on mismatch, so
+  a write made by another uvicorn worker is visible on the very next read.
+
+Hits/misses/stale reloads go to `todo_cache_requests_total{cache="tasks"}`.
+
+Environment variables (optional)
+--------------------------------
+TASK_CACHE_MAX_TASKS : max tasks held across all sessions; 0 disables (default: 20000)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import SessionVersionDB
+from backend.models import Task
+from backend.metrics import CACHE_REQUESTS, Gauge
+
+_versions = SessionVersionDB.__table__
+
+
+# ---------------------------
+# Version row
+# ---------------------------
+
+def read_version(db, session_id: str) -> int:
+    v = db.execute(select(_versions.c.version).where(_versions.c.session_id == session_id)).scalar()
+    return v or 0
+
+
+def bump_version(db, session_id: str) -> int:
+    """+1 the session's version inside the caller's transaction; returns the new value."""
+    res = db.execute(
+        update(_versions).where(_versions.c.session_id == session_id).values(version=_versions.c.version + 1)
+    )
+    if res.rowcount == 0:
+        db.execute(
+            sqlite_insert(_versions).values(session_id=session_id, version=1).on_conflict_do_update(
+                index_elements=[_versions.c.session_id], set_={"version": _versions.c.version + 1}
+            )
+        )
+    return read_version(db, session_id)
+
+
+# ---------------------------
+# Cache
+# ---------------------------
+
+class TaskListCache:
+    def __init__(self, max_tasks: int):
+        self.max_tasks = max_tasks
+        self._lock = threading.Lock()
+        # session_id -> (version, {task_id: Task}); most recently used last
+        self._entries: "OrderedDict[str, Tuple[int, Dict[int, Task]]]" = OrderedDict()
+        self._size = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tasks > 0
+
+    def get(self, session_id: str, version: int) -> Optional[List[Task]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(session_id)
+                CACHE_REQUESTS.inc(cache="tasks", result="hit")
+                return list(entry[1].values())
+            if entry is not None:
+                self._drop(session_id)
+        CACHE_REQUESTS.inc(cache="tasks", result="stale" if entry is not None else "miss")
+        return None
+
+    def fill(self, session_id: str, version: int, tasks: List[Task]) -> None:
+        if not self.enabled or len(tasks) > self.max_tasks:
+            return
+        with self._lock:
+            self._drop(session_id)
+            self._entries[session_id] = (version, {t.id: t for t in tasks})
+            self._size += len(tasks)
+            self._evict()
+
+    def apply(self, session_id: str, version: int, mutate: Callable[[Dict[int, Task]], None]) -> None:
+        """Apply a committed mutation that moved the session to `version`.
+
+        Only applied if our copy is exactly one version behind; otherwise some
+        other write (maybe from another worker) is missing and we drop it.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if entry[0] != version - 1:
+                self._drop(session_id)
+                return
+            tasks = entry[1]
+            before = len(tasks)
+            mutate(tasks)
+            self._entries[session_id] = (version, tasks)
+            self._entries.move_to_end(session_id)
+            self._size += len(tasks) - before
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._entries), "tasks": self._size}
+
+    # -- call with self._lock held --
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _evict(self) -> None:
+        while self._size > self.max_tasks and self._entries:
+            _, (_, tasks) = self._entries.popitem(last=False)
+            self._size -= len(tasks)
+
+
+cache = TaskListCache(int(os.getenv("TASK_CACHE_MAX_TASKS", "20000")))
+
+CACHE_SIZE = Gauge("todo_task_cache_size", "Sessions/tasks held in the task-list cache.", ("kind",))
+CACHE_SIZE.set_function(lambda: {(k,): v for k, v in cache.stats().items()})
+
+
+# ---------------------------
+# Derived views (same order as the SQL they replace)
+# ---------------------------
+
+def by_created_desc(tasks: List[Task], category: Optional[str] = None) -> List[Task]:
+    if category:
+        tasks = [t for t in tasks if t.category == category]
+    return sorted(tasks, key=lambda t: (t.created_at, t.id), reverse=True)
+
+
+def immediate(tasks: List[Task], cutoff: datetime) -> List[Task]:
+    hits = [
+        t for t in tasks
+        if t.status == "open" and ((t.due_dt is not None and t.due_dt <= cutoff) or t.priority >= 4)
+    ]
+    # due_dt ASC NULLS LAST
+    return sorted(hits, key=lambda t: (t.due_dt is None, t.due_dt or datetime.min, t.id))
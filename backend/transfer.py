@@ -0,0 +1,219 @@
+# transfer.py
+"""
+NDJSON export / bulk import of a session's tasks.
+
+Export streams one JSON object per line, reading the session in keyset pages
+(`WHERE id > :last ORDER BY id LIMIT :page`) — constant memory, and each page
+is a short read, so an export of millions of rows to a slow client never
+holds SQLite's lock for the whole download (which a single open
+server-side cursor would).
+
+Import reads the request body incrementally, parses it line by line and
+hands rows to TaskService.import_rows in IMPORT_CHUNK-sized batches, each
+inserted with one executemany in one transaction. Memory is bounded by one
+batch plus one line (MAX_LINE_BYTES).
+
+Row format (same both ways; unknown keys are ignored, `id`/`session_id` are
+never taken from the input):
+    {"text": "...", "category": "Work", "priority": 3,
+     "due_dt": "2025-09-03T17:30:00" | null, "status": "open" | "done",
+     "created_at": "2025-09-01T08:00:00"}
+Archived tasks (see archive.py) are exported after the live ones with
+"archived": true; on import they come back as ordinary done tasks.
+With `Accept: application/msgpack` the export is the same rows as a stream
+of msgpack maps instead (see wire.py).
+
+Enrichment modes for import
+---------------------------
+missing : rows that already carry category, priority and due_dt are stored
+          as-is; the others go through categorize_and_enrich (default)
+all     : every row goes through categorize_and_enrich
+none    : never call the AI; missing fields get local defaults
+AI enrichment runs IMPORT_AI_WORKERS rows at a time, and at most
+IMPORT_AI_MAX_ROWS rows of one import use it at all. Past that, rows are
+filled locally as with `none` (reported as "over_ai_limit"), so a very large
+import finishes in minutes rather than days.
+
+Environment variables (optional)
+--------------------------------
+EXPORT_PAGE    : rows per keyset page (default: 2000)
+IMPORT_CHUNK   : rows per executemany batch (default: 1000)
+IMPORT_AI_MAX_ROWS : rows per import that may be AI-enriched (default: 2000)
+IMPORT_AI_WORKERS  : concurrent AI enrichments per import (default: 4)
+MAX_LINE_BYTES : longest accepted NDJSON line (default: 65536)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from backend.db import TaskDB, TaskArchiveDB
+from backend.dates import parse_due
+
+EXPORT_PAGE = int(os.getenv("EXPORT_PAGE", "2000"))
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "1000"))
+IMPORT_AI_MAX_ROWS = int(os.getenv("IMPORT_AI_MAX_ROWS", "2000"))
+IMPORT_AI_WORKERS = int(os.getenv("IMPORT_AI_WORKERS", "4"))
+MAX_LINE_BYTES = int(os.getenv("MAX_LINE_BYTES", "65536"))
+
+ENRICH_MODES = ("missing", "all", "none")
+_REQUIRED = ("category", "priority", "due_dt")
+
+_tasks = TaskDB.__table__
+_archive = TaskArchiveDB.__table__
+_EXPORT_COLS = (
+    _tasks.c.id, _tasks.c.text, _tasks.c.category, _tasks.c.priority,
+    _tasks.c.due_dt, _tasks.c.status, _tasks.c.created_at,
+)
+
+
+# ---------------------------
+# Export
+# ---------------------------
+
+def _iso(v: Optional[datetime]) -> Optional[str]:
+    return v.isoformat() if v is not None else None
+
+
+def export_pages(make_session: Any, session_id: str, page: int = EXPORT_PAGE) -> Iterator[List[Dict[str, Any]]]:
+    """Row dicts of the session, one keyset page per item: live tasks, then archived ones."""
+    for table, key, extra in ((_tasks, _tasks.c.id, {}), (_archive, _archive.c.archive_id, {"archived": True})):
+        last = 0
+        while True:
+            db = make_session()
+            try:
+                rows = db.execute(
+                    select(key.label("_key"), *(table.c[c.name] for c in _EXPORT_COLS))
+                    .where(table.c.session_id == session_id, key > last)
+                    .order_by(key)
+                    .limit(page)
+                ).all()
+            finally:
+                db.close()
+            if not rows:
+                break
+            last = rows[-1]._key
+            yield [
+                {
+                    "id": r.id, "text": r.text, "category": r.category, "priority": r.priority,
+                    "due_dt": r.due_dt, "status": r.status, "created_at": r.created_at,
+                    **extra,
+                }
+                for r in rows
+            ]
+
+
+def export_ndjson(make_session: Any, session_id: str, page: int = EXPORT_PAGE) -> Iterator[bytes]:
+    """Yield NDJSON, one keyset page per chunk."""
+    for rows in export_pages(make_session, session_id, page):
+        out = []
+        for r in rows:
+            out.append(json.dumps(
+                {**r, "due_dt": _iso(r["due_dt"]), "created_at": _iso(r["created_at"])}, ensure_ascii=False
+            ))
+        yield ("\n".join(out) + "\n").encode("utf-8")
+
+
+# ---------------------------
+# Import
+# ---------------------------
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """(line_no, line) from a streamed body; lines over MAX_LINE_BYTES raise ValueError."""
+    buf = b""
+    n = 0
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            n += 1
+            if line.strip():
+                yield n, line
+        if len(buf) > MAX_LINE_BYTES:
+            raise ValueError(f"line {n + 1} longer than {MAX_LINE_BYTES} bytes")
+    if buf.strip():
+        yield n + 1, buf
+
+
+def parse_row(line: bytes) -> Dict[str, Any]:
+    """One NDJSON line → validated row fields (missing enrichment fields left out)."""
+    obj = json.loads(line)
+    if not isinstance(obj, dict):
+        raise ValueError("not a JSON object")
+    text = obj.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("missing 'text'")
+    row: Dict[str, Any] = {"text": text.strip()}
+
+    if obj.get("category"):
+        row["category"] = str(obj["category"]).strip()[:50]
+    if obj.get("priority") is not None:
+        p = int(obj["priority"])
+        if not 1 <= p <= 5:
+            raise ValueError("priority must be 1-5")
+        row["priority"] = p
+    if "due_dt" in obj:
+        due = obj["due_dt"]
+        if due is None:
+            row["due_dt"] = None
+        else:
+            dt = parse_due(str(due))
+            if dt is None:
+                raise ValueError(f"unparseable due_dt {due!r}")
+            row["due_dt"] = dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+    status = obj.get("status", "open")
+    if status not in ("open", "done"):
+        raise ValueError("status must be 'open' or 'done'")
+    row["status"] = status
+    created = obj.get("created_at")
+    created_at = datetime.fromisoformat(created) if created else datetime.now()
+    # stored naive, like due_dt, so the two stay comparable
+    row["created_at"] = created_at.replace(tzinfo=None) if created_at.tzinfo else created_at
+    return row
+
+
+def needs_enrichment(row: Dict[str, Any], mode: str) -> bool:
+    if mode == "all":
+        return True
+    return any(k not in row for k in _REQUIRED)
+
+
+async def import_ndjson(
+    chunks: AsyncIterator[bytes],
+    run_batch: Any,
+    chunk_size: int = IMPORT_CHUNK,
+    max_errors: int = 20,
+) -> Dict[str, Any]:
+    """
+    Parse a streamed NDJSON body and feed batches to `run_batch(rows)`
+    (an awaitable returning {"imported": n, "enriched": k, "over_ai_limit": m}).
+    """
+    batch: List[Dict[str, Any]] = []
+    report: Dict[str, Any] = {"imported": 0, "enriched": 0, "over_ai_limit": 0, "skipped": 0, "errors": []}
+
+    async def _flush() -> None:
+        res = await run_batch(batch)
+        report["imported"] += res["imported"]
+        report["enriched"] += res["enriched"]
+        report["over_ai_limit"] += res.get("over_ai_limit", 0)
+        batch.clear()
+
+    async for line_no, line in iter_lines(chunks):
+        try:
+            batch.append(parse_row(line))
+        except (ValueError, TypeError) as e:
+            report["skipped"] += 1
+            if len(report["errors"]) < max_errors:
+                report["errors"].append({"line": line_no, "error": str(e)})
+            continue
+        if len(batch) >= chunk_size:
+            await _flush()
+    if batch:
+        await _flush()
+    return report
@@ -1,10 +1,11 @@
-import dateparser
-
 VALID_CATS = {"work","personal","health","career","errand"}
 
 def parse_due_dt(text: str):
     # Parses “by 18:00”, “tomorrow 7am”, “next monday”, etc.
-    return dateparser.parse(text, settings={"PREFER_DATES_FROM": "future"})
+    # (fast patterns first; dateparser only when nothing else matches)
+    from backend.dates import parse_due
+
+    return parse_due(text)
 
 def safe_category(cat: str) -> str:
     return cat if cat in VALID_CATS else "personal"
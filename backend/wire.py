@@ -0,0 +1,202 @@
+# wire.py
+"""
+Wire formats and compression for task-list responses.
+
+Formats are negotiated with `Accept` and an optional `?shape=` on
+GET /tasks, /tasks/immediate, /tasks/archive (and `Accept` on /tasks/export):
+
+- application/json, shape=rows (default): unchanged, one object per task
+  with ISO datetimes. It is now serialized straight to bytes, without
+  FastAPI's jsonable_encoder pass.
+- shape=columnar: {"count": n, "columns": {"id": [...], "text": [...], ...}},
+  one array per field, so keys aren't repeated per task.
+- Accept: application/msgpack: the same rows or columns, msgpack-encoded.
+  On /tasks/export it's a stream of msgpack maps, one per task.
+
+The compact forms (columnar or msgpack) carry datetimes as integer Unix
+seconds. A naive datetime is taken as server local time, the same way the
+ISO strings are written. Without the msgpack package installed, msgpack
+requests get JSON (check Content-Type).
+
+`CompressionMiddleware` compresses any response of at least
+WIRE_COMPRESS_MIN_BYTES with brotli (when installed and accepted) or gzip,
+streamed responses included. Server-sent events are left alone.
+
+`python -m bench.wire` reports bytes and encode time per format for 1k/10k
+task sessions.
+
+Environment variables (optional)
+--------------------------------
+WIRE_COMPRESS_MIN_BYTES : smallest response body that gets compressed (default: 1024)
+WIRE_GZIP_LEVEL         : gzip level 1..9 (default: 6)
+WIRE_BROTLI_QUALITY     : brotli quality 0..11 (default: 4; higher is much slower)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # optional: requests for msgpack fall back to JSON
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("WIRE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("WIRE_BROTLI_QUALITY", "4"))
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+SHAPES = ("rows", "columnar")
+
+
+# ---------------------------
+# Negotiation
+# ---------------------------
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    """`Accept`/`Accept-Encoding` → {value: q}."""
+    out: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        value, _, params = part.strip().partition(";")
+        if not value:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        out[value.strip().lower()] = q
+    return out
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Media type to answer with: msgpack when preferred (and installed), else JSON."""
+    if msgpack is None:
+        return JSON
+    acc = _accepted(accept)
+    mp = max((acc.get(m, 0.0) for m in _MSGPACK_ALIASES), default=0.0)
+    js = max(acc.get(JSON, 0.0), acc.get("*/*", 0.0) if acc else 1.0, acc.get("application/*", 0.0))
+    return MSGPACK if mp > 0 and mp >= js else JSON
+
+
+# ---------------------------
+# Encoding
+# ---------------------------
+
+def _iso(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def _epoch(v: Any) -> Any:
+    return int(v.timestamp()) if isinstance(v, datetime) else v
+
+
+def compact_row(row: Mapping[str, Any]) -> Dict[str, Any]:
+    return {k: _epoch(v) for k, v in row.items()}
+
+
+def columnar(rows: Sequence[Mapping[str, Any]], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Rows → {"count": n, "columns": {field: [values...]}} (datetimes as Unix seconds)."""
+    if fields is None:
+        fields = list(rows[0].keys()) if rows else []
+    return {
+        "count": len(rows),
+        "columns": {f: [_epoch(r.get(f)) for r in rows] for f in fields},
+    }
+
+
+def encode(rows: Sequence[Mapping[str, Any]], media: str, shape: str = "rows") -> bytes:
+    if media == JSON and shape == "rows":
+        # byte-identical to FastAPI's JSONResponse of the same list
+        return json.dumps(rows, default=_iso, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    obj: Any = columnar(rows) if shape == "columnar" else [compact_row(r) for r in rows]
+    if media == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def render(
+    rows: Sequence[Mapping[str, Any]],
+    accept: Optional[str],
+    shape: str = "rows",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """List response in the negotiated format."""
+    media = negotiate(accept)
+    out = Response(encode(rows, media, shape), media_type=media, headers=headers)
+    out.headers["Vary"] = "Accept"
+    return out
+
+
+def stream_msgpack(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """One chunk per page, each a run of msgpack maps (read back with msgpack.Unpacker)."""
+    pack = msgpack.Packer(use_bin_type=True).pack
+    for page in pages:
+        yield b"".join(pack(compact_row(r)) for r in page)
+
+
+# ---------------------------
+# Compression
+# ---------------------------
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: Any, minimum_size: int, quality: int = BROTLI_QUALITY) -> None:
+        super().__init__(app, minimum_size)
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self._compressor.process(body)
+        # flush streamed chunks so the client gets each page as it's produced
+        return out + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    acc = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for enc in (("br",) if brotli is not None else ()) + ("gzip",):
+        q = acc.get(enc, acc.get("*", 0.0))
+        if q > best_q:  # ties keep the earlier (smaller) encoding
+            best, best_q = enc, q
+    return best
+
+
+class CompressionMiddleware:
+    """gzip/brotli for HTTP responses of at least `minimum_size` bytes."""
+
+    def __init__(self, app: Any, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        enc = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if enc == "br":
+            responder: Any = BrotliResponder(self.app, self.minimum_size)
+        elif enc == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)
+        else:
+            responder = self.app
+        await responder(scope, receive, send)
@@ -0,0 +1,117 @@
+# common.py
+"""
+Shared helpers for the offline benchmarks: percentiles, result files and
+regression comparison.
+
+Results are written as JSON under bench/results/ (or --out) so a later run can
+be compared against them with --compare <file>.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import platform
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_vals: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile on an already-sorted sequence."""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(pct / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return float(sorted_vals[k])
+
+
+def latency_stats(samples_s: List[float], elapsed_s: Optional[float] = None) -> Dict[str, float]:
+    """count / throughput / mean / p50 / p95 / p99 / max, latencies in ms."""
+    vals = sorted(samples_s)
+    n = len(vals)
+    out = {
+        "count": n,
+        "mean_ms": round(1000 * sum(vals) / n, 3) if n else 0.0,
+        "p50_ms": round(1000 * percentile(vals, 50), 3),
+        "p95_ms": round(1000 * percentile(vals, 95), 3),
+        "p99_ms": round(1000 * percentile(vals, 99), 3),
+        "max_ms": round(1000 * vals[-1], 3) if n else 0.0,
+    }
+    if elapsed_s:
+        out["throughput_rps"] = round(n / elapsed_s, 2)
+    return out
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def save_results(name: str, data: Dict[str, Any], path: Optional[str] = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{name}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    metric: str = "p95_ms",
+    tolerance: float = 0.10,
+    higher_is_better: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Compare `metric` per key between two result tables.
+    A row is a regression when it is worse than baseline by more than `tolerance`.
+    """
+    rows = []
+    for key in sorted(set(current) | set(baseline)):
+        cur = current.get(key, {}).get(metric)
+        base = baseline.get(key, {}).get(metric)
+        if cur is None or base is None or base == 0:
+            rows.append({"key": key, "baseline": base, "current": cur, "change": None, "regression": False})
+            continue
+        change = (cur - base) / base
+        worse = -change if higher_is_better else change
+        rows.append({
+            "key": key,
+            "baseline": base,
+            "current": cur,
+            "change": round(change, 4),
+            "regression": worse > tolerance,
+        })
+    return rows
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, Any]], cols: Sequence[str]) -> None:
+    print(f"\n== {title}")
+    width = max([len(k) for k in rows] + [10])
+    print(f"{'':{width}}  " + "  ".join(f"{c:>12}" for c in cols))
+    for key, r in rows.items():
+        print(f"{key:{width}}  " + "  ".join(f"{r.get(c, ''):>12}" for c in cols))
+
+
+def print_comparison(rows: List[Dict[str, Any]], metric: str) -> bool:
+    """Print a comparison table; returns True if any row regressed."""
+    print(f"\n== comparison ({metric})")
+    regressed = False
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        chg = "" if r["change"] is None else f"{100 * r['change']:+.1f}%"
+        print(f"{r['key']:40} {str(r['baseline']):>12} -> {str(r['current']):>12} {chg:>8} {flag}")
+        regressed = regressed or r["regression"]
+    return regressed
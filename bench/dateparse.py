@@ -0,0 +1,98 @@
+# dateparse.py
+"""
+Due-date parse throughput: plain dateparser vs the layered parser in
+backend/dates.py (without and with its memo).
+
+    python -m bench.dateparse --rounds 20
+    python -m bench.dateparse --out base.json
+    python -m bench.dateparse --compare base.json
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from bench import common
+
+# what Gemini's due_dt_iso and CLI users actually send
+CORPUS: List[str] = [
+    "2025-09-03T17:30:00-04:00", "2025-09-04T09:00:00Z", "2025-10-01T18:00:00+00:00",
+    "2025-12-24T08:15:00-05:00", "2026-01-15T12:00:00",
+    "tomorrow 7am", "tomorrow at 9", "tomorrow", "today 5pm", "tonight",
+    "by 17:30", "by 5pm", "at 10:30", "8pm", "noon", "by eod",
+    "next monday", "next friday 3pm", "monday", "friday at 2pm", "this thursday",
+    "sat 11am", "sunday evening", "in 2 hours", "in 30 minutes", "in 3 days",
+    "in a week", "within 2 days", "day after tomorrow", "next week",
+    "7am tomorrow", "3pm on friday", "2 days from now", "end of the month",
+    "September 30", "Oct 3 at 4pm", "in the morning", "next month",
+    "tomorrow 7 am", "by 9:00 am",
+]
+
+
+def _bench(fn: Callable[[str], object], phrases: List[str], rounds: int, before_round=None) -> dict:
+    samples = []
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        if before_round:
+            before_round()
+        for p in phrases:
+            s = time.perf_counter()
+            fn(p)
+            samples.append(time.perf_counter() - s)
+    elapsed = time.perf_counter() - t0
+    return common.latency_stats(samples, elapsed)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--tolerance", type=float, default=0.20)
+    args = ap.parse_args(argv)
+
+    import dateparser
+    from backend import dates
+
+    def _dateparser(p: str):
+        return dateparser.parse(p, settings={"PREFER_DATES_FROM": "future"})
+
+    now = datetime.now()
+    layers = Counter(dates.parse_due_with_layer(p, now)[1] for p in CORPUS)
+    _dateparser(CORPUS[0])  # import-time / first-call costs excluded for both
+    dates.parse_due("warmup phrase that falls through")
+
+    results = {
+        "dateparser.parse": _bench(_dateparser, CORPUS, args.rounds),
+        "layered (no memo)": _bench(dates.parse_due, CORPUS, args.rounds, dates.cache_clear),
+        "layered (memo)": _bench(dates.parse_due, CORPUS, args.rounds),
+    }
+
+    common.print_table("parse latency", results, ("count", "throughput_rps", "mean_ms", "p50_ms", "p99_ms"))
+    print(f"\nlayer answering each corpus phrase: {dict(layers)}")
+    base_rps = results["dateparser.parse"]["throughput_rps"]
+    for k, r in results.items():
+        print(f"  {k:20} {r['throughput_rps'] / base_rps:8.1f}x dateparser")
+
+    path = common.save_results(
+        "dateparse",
+        {"results": results, "layers": dict(layers), "corpus_size": len(CORPUS), "meta": common.environment()},
+        args.out,
+    )
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)["results"]
+        rows = common.compare(results, base, "throughput_rps", args.tolerance, higher_is_better=True)
+        if common.print_comparison(rows, "throughput_rps"):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# importtime.py
+"""
+Import-time / cold-start benchmark for the CLI and the API app.
+
+For each target it runs a fresh interpreter N times with `-X importtime`,
+reports the median wall-clock start time and total import time, the heaviest
+top-level packages, and any heavy modules that should stay lazy.
+
+    python -m bench.importtime --runs 5
+    python -m bench.importtime --out base.json
+    python -m bench.importtime --compare base.json   # exit 1 on regression
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from bench import common
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS: Dict[str, str] = {
+    "cli": "import main",
+    "api": "import backend.api",
+}
+
+# modules that must not be loaded just by importing the target
+MUST_STAY_LAZY: Dict[str, List[str]] = {
+    "cli": ["fastapi", "starlette", "google.generativeai", "grpc", "dateparser", "sentence_transformers"],
+    "api": ["google.generativeai", "grpc", "dateparser", "sentence_transformers"],
+}
+
+
+def _run_once(code: str) -> Dict[str, Any]:
+    probe = code + "; import sys; print('\\n'.join(sys.modules))"
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - t0
+
+    by_pkg: Dict[str, int] = defaultdict(int)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, _cum, name = (x.strip() for x in line.replace("import time:", "|", 1).split("|"))
+        us = int(self_us)
+        total_us += us
+        by_pkg[name.strip().split(".")[0]] += us
+    return {"wall_s": wall, "import_us": total_us, "by_pkg": by_pkg, "modules": set(proc.stdout.split())}
+
+
+def measure(target: str, runs: int) -> Dict[str, Any]:
+    code = TARGETS[target]
+    samples = [_run_once(code) for _ in range(runs + 1)][1:]  # first run warms .pyc files
+
+    pkg_us: Dict[str, List[int]] = defaultdict(list)
+    for s in samples:
+        for pkg, us in s["by_pkg"].items():
+            pkg_us[pkg].append(us)
+    top = sorted(((p, statistics.median(v)) for p, v in pkg_us.items()), key=lambda x: -x[1])[:12]
+
+    loaded = samples[-1]["modules"]
+    leaks = [m for m in MUST_STAY_LAZY.get(target, []) if m in loaded]
+    return {
+        "wall_ms": round(1000 * statistics.median(s["wall_s"] for s in samples), 1),
+        "import_ms": round(statistics.median(s["import_us"] for s in samples) / 1000, 1),
+        "top_packages_ms": {p: round(us / 1000, 1) for p, us in top},
+        "lazy_violations": leaks,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--target", choices=sorted(TARGETS), action="append")
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--tolerance", type=float, default=0.20)
+    args = ap.parse_args(argv)
+
+    results = {t: measure(t, args.runs) for t in (args.target or sorted(TARGETS))}
+
+    failed = False
+    for t, r in results.items():
+        print(f"\n== {t}: wall {r['wall_ms']} ms, imports {r['import_ms']} ms")
+        for pkg, ms in r["top_packages_ms"].items():
+            print(f"   {pkg:30} {ms:>8} ms")
+        if r["lazy_violations"]:
+            failed = True
+            print(f"   !! loaded eagerly: {', '.join(r['lazy_violations'])}")
+
+    path = common.save_results("importtime", {"targets": results, "meta": common.environment()}, args.out)
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)["targets"]
+        rows = common.compare(results, base, "wall_ms", args.tolerance)
+        failed = common.print_comparison(rows, "wall_ms") or failed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# load.py
+"""
+Offline load driver for every route in backend/api.py.
+
+By default it seeds a throwaway SQLite file, starts uvicorn in a subprocess
+with AI_BACKEND=fake (no network, no API key), runs a weighted route mix from
+a pool of worker threads for --duration seconds, and reports throughput and
+p50/p95/p99 per route.
+
+    python -m bench.load --duration 20 --concurrency 16
+    python -m bench.load --fake-latency lognormal:1.2,0.8 --out base.json
+    python -m bench.load --compare base.json          # exit 1 on p95 regression
+    python -m bench.load --url http://127.0.0.1:8000  # drive an existing server
+
+Only the standard library is used on the client side.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench import common
+
+# (label, weight) — label doubles as the report key
+DEFAULT_MIX: Dict[str, float] = {
+    "GET /tasks": 30,
+    "GET /tasks?category": 8,
+    "GET /tasks/immediate": 15,
+    "POST /tasks": 10,
+    "PATCH /tasks/{id}": 6,
+    "DELETE /tasks/{id}": 4,
+    "POST /nlp/intent": 6,
+    "POST /nlp/command": 6,
+    "POST /summary": 5,
+    "GET /metrics": 1,
+    "GET /debug/requests": 1,
+}
+
+TEXTS = [
+    "buy milk tomorrow 7am", "finish API doc by 17:30", "call mom next monday",
+    "pay hydro bill in 2 hours", "gym session friday", "book dentist appointment",
+    "review PR for payments", "plan trip to Montreal", "read chapter 4 tonight",
+]
+COMMANDS = ["show work", "summarize today", "show all tasks this week", "complete all errands"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Client:
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, session: str, body: Optional[dict] = None) -> Tuple[int, Any]:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            self.base + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json", "X-Session-Id": session},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                raw = resp.read()
+                ctype = resp.headers.get("content-type", "")
+                return resp.status, (json.loads(raw) if "json" in ctype and raw else raw)
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None
+
+
+class Worker:
+    """One simulated user bound to one session; keeps ids it created for PATCH/DELETE."""
+
+    def __init__(self, client: Client, session: str, rng: random.Random):
+        self.c = client
+        self.session = session
+        self.rng = rng
+        self.own_ids: List[int] = []
+
+    def op(self, label: str) -> int:
+        s, rng = self.session, self.rng
+        if label == "GET /tasks":
+            return self.c.request("GET", "/tasks", s)[0]
+        if label == "GET /tasks?category":
+            cat = rng.choice(["Work", "Errand", "Health", "Personal"])
+            return self.c.request("GET", "/tasks?" + urllib.parse.urlencode({"category": cat}), s)[0]
+        if label == "GET /tasks/immediate":
+            return self.c.request("GET", "/tasks/immediate?hours=24", s)[0]
+        if label == "POST /tasks":
+            status, body = self.c.request("POST", "/tasks", s, {"text": rng.choice(TEXTS)})
+            if status == 200 and isinstance(body, dict):
+                self.own_ids.append(body["id"])
+            return status
+        if label == "PATCH /tasks/{id}":
+            if not self.own_ids:
+                return self.op("POST /tasks")
+            return self.c.request("PATCH", f"/tasks/{rng.choice(self.own_ids)}", s, {"status": "done"})[0]
+        if label == "DELETE /tasks/{id}":
+            if not self.own_ids:
+                return self.op("POST /tasks")
+            tid = self.own_ids.pop(rng.randrange(len(self.own_ids)))
+            return self.c.request("DELETE", f"/tasks/{tid}", s)[0]
+        if label == "POST /nlp/intent":
+            return self.c.request("POST", "/nlp/intent", s, {"text": rng.choice(TEXTS + COMMANDS)})[0]
+        if label == "POST /nlp/command":
+            return self.c.request("POST", "/nlp/command", s, {"text": rng.choice(COMMANDS)})[0]
+        if label == "POST /summary":
+            body = rng.choice([{"timeframe": "today"}, {"timeframe": "this_week"}, {"text": "summarize today"}])
+            return self.c.request("POST", "/summary", s, body)[0]
+        if label == "GET /metrics":
+            return self.c.request("GET", "/metrics", s)[0]
+        if label == "GET /debug/requests":
+            return self.c.request("GET", "/debug/requests?limit=5", s)[0]
+        raise ValueError(f"unknown route label: {label}")
+
+
+def run_load(
+    base_url: str,
+    duration: float,
+    concurrency: int,
+    sessions: List[str],
+    mix: Dict[str, float],
+    seed: int,
+    warmup: float = 1.0,
+) -> Dict[str, Any]:
+    client = Client(base_url)
+    labels = list(mix)
+    weights = [mix[k] for k in labels]
+    lat: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    stop_at = time.monotonic() + warmup + duration
+    measure_from = time.monotonic() + warmup
+
+    def _loop(i: int) -> None:
+        rng = random.Random(seed * 1000 + i)
+        w = Worker(client, sessions[i % len(sessions)], rng)
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            label = rng.choices(labels, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status = w.op(label)
+            except Exception:
+                status = 0
+            dt = time.perf_counter() - t0
+            if now < measure_from:
+                continue
+            with lock:
+                lat[label].append(dt)
+                if status == 0 or status >= 500:
+                    errors[label] += 1
+
+    t_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_loop, range(concurrency)))
+    elapsed = max(time.monotonic() - t_start - warmup, 1e-9)
+
+    routes = {}
+    for label in labels:
+        st = common.latency_stats(lat.get(label, []), elapsed)
+        st["errors"] = errors.get(label, 0)
+        routes[label] = st
+    overall = common.latency_stats([x for v in lat.values() for x in v], elapsed)
+    overall["errors"] = sum(errors.values())
+    return {"routes": routes, "overall": overall, "elapsed_s": round(elapsed, 2)}
+
+
+def _spawn_server(db_url: str, port: int, env_extra: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({"AI_BACKEND": "fake", "TODO_DB_PATH": db_url, "SLOW_REQUEST_MS": "100000"})
+    env.update(env_extra)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=repo_root,
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read()
+            return proc
+        except Exception:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+def _parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in spec.split(";"):
+        label, _, w = part.rpartition("=")
+        mix[label.strip()] = float(w)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="drive an already-running server instead of spawning one")
+    ap.add_argument("--db", help="SQLite URL for the spawned server (default: temp file)")
+    ap.add_argument("--sessions", type=int, default=10)
+    ap.add_argument("--tasks", type=int, default=200, help="seeded tasks per session")
+    ap.add_argument("--no-seed", action="store_true")
+    ap.add_argument("--duration", type=float, default=15.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--mix", help='e.g. "GET /tasks=5;POST /summary=1"')
+    ap.add_argument("--fake-latency", help="FAKE_AI_LATENCY for the spawned server")
+    ap.add_argument("--fake-error-rate", help="FAKE_AI_ERROR_RATE for the spawned server")
+    ap.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the spawned server")
+    ap.add_argument("--out", help="write results JSON here (default: bench/results/load-<ts>.json)")
+    ap.add_argument("--compare", help="baseline results JSON; exit 1 on regression")
+    ap.add_argument("--metric", default="p95_ms")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args(argv)
+
+    session_ids = [f"bench-{i}" for i in range(args.sessions)]
+    proc = None
+    tmpdir = None
+    base_url = args.url
+    try:
+        if not base_url:
+            tmpdir = tempfile.mkdtemp(prefix="todo-bench-")
+            db_url = args.db or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+            if not args.no_seed:
+                from bench import seed
+                seed.main(["--db", db_url, "--sessions", str(args.sessions), "--tasks", str(args.tasks)])
+            extra = {}
+            if args.fake_latency:
+                extra["FAKE_AI_LATENCY"] = args.fake_latency
+            if args.fake_error_rate:
+                extra["FAKE_AI_ERROR_RATE"] = args.fake_error_rate
+            for kv in args.env:
+                k, _, v = kv.partition("=")
+                extra[k] = v
+            port = _free_port()
+            proc = _spawn_server(db_url, port, extra)
+            base_url = f"http://127.0.0.1:{port}"
+
+        mix = _parse_mix(args.mix)
+        res = run_load(base_url, args.duration, args.concurrency, session_ids, mix, args.seed, args.warmup)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    res["meta"] = {
+        **common.environment(),
+        "duration_s": args.duration,
+        "concurrency": args.concurrency,
+        "sessions": args.sessions,
+        "tasks_per_session": args.tasks,
+        "mix": mix,
+        "fake_latency": args.fake_latency or os.getenv("FAKE_AI_LATENCY", "lognormal:0.6,0.5"),
+    }
+
+    cols = ("count", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors")
+    common.print_table("routes", res["routes"], cols)
+    common.print_table("overall", {"all": res["overall"]}, cols)
+    path = common.save_results("load", res, args.out)
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)
+        rows = common.compare(res["routes"], base["routes"], args.metric, args.tolerance)
+        if common.print_comparison(rows, args.metric):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+# prompts.py
+"""
+Prompt size and latency: the previous JSON-dump prompts vs backend/prompts.py.
+
+For summarize_tasks / filter_tasks_with_ai at several list sizes (and the
+single-text prompts) it reports estimated prompt tokens, prompt build time
+and the round-trip latency through an AI backend, old vs new.
+
+    python -m bench.prompts                       # offline: fake backend, no latency
+    python -m bench.prompts --backend gemini      # real round-trips (GEMINI_API_KEY)
+    python -m bench.prompts --out base.json
+    python -m bench.prompts --compare base.json   # exit 1 if tokens grew
+
+With the fake backend the round-trip does not depend on prompt size, so
+only tokens and build time are meaningful there; Gemini's exact prompt token
+counts (usage_metadata) are reported when it is used.
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench import common
+
+_TEXTS = [
+    "buy milk and eggs", "send the quarterly report to finance", "dentist appointment",
+    "call mom about the weekend", "renew passport", "book flights to Lisbon",
+    "review pull request for the billing service", "pay electricity bill", "gym: leg day",
+    "prepare slides for Monday standup", "pick up dry cleaning", "study chapter 4 for the exam",
+]
+_CATEGORIES = ["Work", "Errands", "Health", "Family", "Finance", "Travel", "Study"]
+
+
+def make_tasks(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Task dicts shaped like the ones /summary hands to the AI layer."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    out = []
+    for i in range(n):
+        due = None
+        if rng.random() < 0.7:
+            due = (now + timedelta(hours=rng.randint(-72, 240))).isoformat()
+        out.append({
+            "id": 10000 + i * 7,
+            "text": rng.choice(_TEXTS),
+            "category": rng.choice(_CATEGORIES),
+            "status": "done" if rng.random() < 0.3 else "open",
+            "priority": rng.randint(1, 5),
+            "due_dt": due,
+        })
+    return out
+
+
+# ---------------------------
+# Previous prompts (verbatim, for comparison)
+# ---------------------------
+
+def legacy_summary(tasks: List[Dict[str, Any]], intent: Dict[str, Any]) -> str:
+    return f"""
+You are an API. Return JSON only.
+
+Create a summary of these tasks. The "narrative" must be 1–3 sentences, plain text, friendly, concise, and specific.
+
+Context:
+- Intent: {json.dumps(intent, ensure_ascii=False)}
+- Current time: {datetime.now().isoformat()}
+- Tasks: {json.dumps(tasks, default=str, ensure_ascii=False)}
+
+Return JSON:
+{{
+  "headline": "string",
+  "kpis": {{ "open": 0, "completed": 0, "overdue": 0, "due_today": 0 }},
+  "highlights": ["string"],
+  "by_category": [{{ "name": "Work", "open": 3, "done": 2 }}],
+  "urgent_ids": [1],
+  "overdue_ids": [2],
+  "markdown": "- bullet one\\n- bullet two",
+  "narrative": "Plain conversational recap"
+}}
+"""
+
+
+def legacy_filter(tasks: List[Dict[str, Any]], query: str) -> str:
+    return f"""
+You are an API. Return JSON only.
+
+From this list of tasks, select only those relevant to the user query.
+
+Query: "{query}"
+
+Tasks:
+{json.dumps(tasks, ensure_ascii=False)}
+
+Return JSON:
+{{ "keep_ids": [1, 3, 7] }}
+"""
+
+
+def legacy_enrich(text: str) -> str:
+    return f"""
+You are an API. Return JSON only—no prose, no markdown.
+
+Given a single to-do text, infer:
+- category_proposed: a short category string (<= 3 words). Use natural, human categories
+  like Errands/Groceries, Work, Health, Family, Personal, Finance, Travel, Study, etc.
+  Pick the most *sensible* everyday label for the task; do not overfit or invent niche labels.
+- priority: integer 1..5 (1=lowest, 5=highest) based on urgency/importance implied by the text.
+- due_dt_iso: an ISO 8601 datetime string with timezone offset if a due time/date is clearly implied, else null.
+- rationale: very short reason (one sentence).
+
+Rules:
+- If only a time is given (e.g., "by 17:30"), assume today in timezone "America/Toronto"; if that time already passed,
+  roll to next day.
+- If only a day is given (e.g., "tomorrow", "next Monday"), default to 09:00 local time unless a time is stated.
+- Always return ISO 8601 with timezone offset (e.g., 2025-09-03T17:30:00-04:00).
+- Never return a datetime in the past relative to "{datetime.now().isoformat()}".
+
+Input text:
+"{text.strip()}"
+
+Return JSON with exactly this shape:
+{{
+  "category_proposed": "string",
+  "priority": 1,
+  "due_dt_iso": "2025-09-02T18:00:00-04:00" | null,
+  "rationale": "string"
+}}
+"""
+
+
+# ---------------------------
+# Measurement
+# ---------------------------
+
+def _build_time_us(build: Callable[[], Any], rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        build()
+    return round(1e6 * (time.perf_counter() - t0) / rounds, 2)
+
+
+def _round_trips(backend: Any, fn: str, prompt: str, rounds: int) -> Tuple[Dict[str, float], Optional[int]]:
+    samples, provider_tokens = [], None
+    for _ in range(rounds):
+        s = time.perf_counter()
+        resp = backend.generate(fn, prompt)
+        samples.append(time.perf_counter() - s)
+        usage = getattr(resp, "usage_metadata", None)
+        provider_tokens = getattr(usage, "prompt_token_count", provider_tokens)
+    return common.latency_stats(samples), provider_tokens
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,50,100", help="task-list sizes (summary/filter slice at most 100)")
+    ap.add_argument("--backend", choices=("fake", "gemini"), default="fake")
+    ap.add_argument("--fake-latency", default="none", help="FAKE_AI_LATENCY spec for --backend fake")
+    ap.add_argument("--rounds", type=int, default=5, help="round-trips per prompt")
+    ap.add_argument("--build-rounds", type=int, default=200)
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--tolerance", type=float, default=0.05)
+    args = ap.parse_args(argv)
+
+    from backend import prompts
+    from backend.ai_backend import FakeBackend, GeminiBackend
+
+    backend = FakeBackend(latency=args.fake_latency) if args.backend == "fake" else GeminiBackend()
+    backend.check()
+
+    intent = {"action": "summarize", "category": None, "timeframe": "all", "rationale": "direct summary request"}
+    cases: Dict[str, Tuple[str, Callable[[], str], Callable[[], str]]] = {
+        "categorize_and_enrich": (
+            "categorize_and_enrich",
+            lambda: legacy_enrich("send the quarterly report to finance by friday 5pm"),
+            lambda: prompts.enrich_prompt("send the quarterly report to finance by friday 5pm"),
+        ),
+    }
+    for n in (int(x) for x in args.sizes.split(",")):
+        tasks = make_tasks(n)
+        cases[f"summarize_tasks n={n}"] = (
+            "summarize_tasks",
+            lambda t=tasks: legacy_summary(t, intent),
+            lambda t=tasks: prompts.summary_prompt(t, intent)[0],
+        )
+        cases[f"filter_tasks_with_ai n={n}"] = (
+            "filter_tasks_with_ai",
+            lambda t=tasks: legacy_filter(t, "chores"),
+            lambda t=tasks: prompts.filter_prompt(t, "chores")[0],
+        )
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, (fn, old, new) in cases.items():
+        for variant, build in (("json", old), ("compact", new)):
+            prompt = build()
+            rt, provider = _round_trips(backend, fn, prompt, args.rounds)
+            row = {
+                "tokens": prompts.count_tokens(prompt),
+                "chars": len(prompt),
+                "build_us": _build_time_us(build, args.build_rounds),
+                "p50_ms": rt["p50_ms"],
+                "p95_ms": rt["p95_ms"],
+            }
+            if args.backend != "fake" and provider is not None:
+                row["provider_tokens"] = provider
+            results[f"{name} [{variant}]"] = row
+
+    cols = ["tokens", "chars", "build_us", "p50_ms", "p95_ms"]
+    if args.backend != "fake":
+        cols.insert(1, "provider_tokens")
+    common.print_table(f"prompt size and round-trip ({args.backend})", results, cols)
+    print()
+    for name in cases:
+        old, new = results[f"{name} [json]"], results[f"{name} [compact]"]
+        print(f"  {name:30} tokens {old['tokens']:>6} -> {new['tokens']:>6}  ({new['tokens'] / old['tokens']:.0%})")
+
+    path = common.save_results(
+        "prompts", {"results": results, "backend": args.backend, "meta": common.environment()}, args.out
+    )
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)["results"]
+        rows = common.compare(results, base, "tokens", args.tolerance)
+        if common.print_comparison(rows, "tokens"):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+# reconcile.py
+"""
+Category reconciliation: accuracy, stage mix and latency per configuration.
+
+Runs backend/similarity.reconcile_category over a labeled corpus of
+(proposed, existing categories, expected final) cases and reports, for the
+current defaults and for sweeps of SIMILARITY_MODEL_MIN, SIMILARITY_FUZZY_MIN,
+SIMILARITY_FUZZY_SHORTCUT, the synonym map and synonym-created categories:
+
+- accuracy (overall and per case tag),
+- the share of decisions made at each stage (exact / synonym / model /
+  fuzzy / keep_proposed) and each stage's latency,
+- encoder invocations and time.
+
+Each configuration runs without the encoder and, when sentence-transformers
+(or EMBED_SOCKET) is available, with it. The recommended configuration is
+the most accurate one, then the one with the fewest encoder invocations,
+then the one closest to the defaults, then the fastest.
+
+    python -m bench.reconcile                          # both encoder modes if available
+    python -m bench.reconcile --encoder none --errors  # list misclassified cases
+    python -m bench.reconcile --corpus extra.jsonl     # add {"proposed","existing","expected","tag"} lines
+    python -m bench.reconcile --out base.json
+    python -m bench.reconcile --compare base.json      # exit 1 if accuracy dropped
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bench import common
+
+_E1 = ["Work", "Health", "Errand", "Personal", "Finance"]
+_E2 = ["work", "family", "travel", "study"]
+_E3 = ["Job", "Groceries", "Fitness", "Home"]
+_E4 = ["Work"]
+_E5 = ["Side Project", "Health & Fitness", "Kids", "Bills"]
+_E6 = ["Reading", "Meetings", "Health", "Shopping", "Personal"]
+_E7 = ["Baking", "Career", "Work", "Home"]
+
+# (tag, proposed, existing, expected final); expected = what the user would file it under
+CORPUS: List[Tuple[str, str, List[str], str]] = [
+    # same category, different spelling of case/spacing/punctuation
+    ("exact", "work", _E1, "Work"),
+    ("exact", "WORK ", _E1, "Work"),
+    ("exact", "health", _E1, "Health"),
+    ("exact", "Personal", _E1, "Personal"),
+    ("exact", "Travel", _E2, "travel"),
+    ("exact", "family", _E2, "family"),
+    ("exact", "Side-project", _E5, "Side Project"),
+    ("exact", "kids", _E5, "Kids"),
+    ("exact", "bills", _E5, "Bills"),
+    ("exact", "home", _E3, "Home"),
+    ("exact", "Groceries", _E3, "Groceries"),
+    ("exact", "Fitness", _E3, "Fitness"),
+    # synonym of an existing category
+    ("synonym", "Fitness", _E1, "Health"),
+    ("synonym", "Gym", _E1, "Health"),
+    ("synonym", "Groceries", _E1, "Errand"),
+    ("synonym", "Shopping", _E1, "Errand"),
+    ("synonym", "Meeting", _E1, "Work"),
+    ("synonym", "Office", _E2, "work"),
+    ("synonym", "Job", _E1, "Work"),
+    ("synonym", "Career", _E2, "work"),
+    ("synonym", "Exercise", _E1, "Health"),
+    ("synonym", "Workout", _E1, "Health"),
+    ("synonym", "Errands", _E1, "Errand"),
+    ("synonym", "Supermarket", _E1, "Errand"),
+    # synonym whose canonical family isn't there yet
+    ("synonym_new", "Groceries", _E2, "Errand"),
+    ("synonym_new", "Gym", _E2, "Health"),
+    ("synonym_new", "Workout", _E4, "Health"),
+    ("synonym_new", "Shopping", _E4, "Errand"),
+    # the synonym family is wrong for this user's set
+    ("synonym_clash", "School", _E2, "study"),
+    ("synonym_clash", "Grocery", _E3, "Groceries"),
+    ("synonym_clash", "Gym", _E3, "Fitness"),
+    ("synonym_clash", "Meeting", _E3, "Job"),
+    ("synonym_clash", "Study", _E3, "Study"),
+    ("synonym_clash", "Meeting", _E6, "Meetings"),
+    # typos and plurals
+    ("typo", "Helth", _E1, "Health"),
+    ("typo", "Heath", _E1, "Health"),
+    ("typo", "Finances", _E1, "Finance"),
+    ("typo", "Personel", _E1, "Personal"),
+    ("typo", "Wrok", _E1, "Work"),
+    ("typo", "Travels", _E2, "travel"),
+    ("typo", "Familly", _E2, "family"),
+    ("typo", "Side Projects", _E5, "Side Project"),
+    ("typo", "Kid", _E5, "Kids"),
+    ("typo", "Bill", _E5, "Bills"),
+    ("typo", "Homes", _E3, "Home"),
+    ("typo", "Readings", _E6, "Reading"),
+    ("typo", "Health and Fitness", _E5, "Health & Fitness"),
+    # same meaning, different words
+    ("semantic", "Doctor", _E1, "Health"),
+    ("semantic", "Medical", _E1, "Health"),
+    ("semantic", "Pharmacy", _E1, "Health"),
+    ("semantic", "Bills", _E1, "Finance"),
+    ("semantic", "Banking", _E1, "Finance"),
+    ("semantic", "Taxes", _E1, "Finance"),
+    ("semantic", "Budget", _E1, "Finance"),
+    ("semantic", "Work Project", _E1, "Work"),
+    ("semantic", "Chores", _E3, "Home"),
+    ("semantic", "Household", _E3, "Home"),
+    ("semantic", "Vacation", _E2, "travel"),
+    ("semantic", "Trip", _E2, "travel"),
+    ("semantic", "Homework", _E2, "study"),
+    ("semantic", "Exam Prep", _E2, "study"),
+    ("semantic", "Relatives", _E2, "family"),
+    ("semantic", "Parenting", _E5, "Kids"),
+    ("semantic", "Childcare", _E5, "Kids"),
+    ("semantic", "Utilities", _E5, "Bills"),
+    ("semantic", "Rent", _E5, "Bills"),
+    ("semantic", "Finance", _E5, "Bills"),
+    ("semantic", "Coding", _E5, "Side Project"),
+    ("semantic", "Healthcare", _E6, "Health"),
+    ("semantic", "Reading List", _E6, "Reading"),
+    # genuinely new categories: keep the proposal
+    ("organic", "Travel", _E1, "Travel"),
+    ("organic", "Hobbies", _E1, "Hobbies"),
+    ("organic", "Pets", _E1, "Pets"),
+    ("organic", "Car", _E1, "Car"),
+    ("organic", "Social", _E1, "Social"),
+    ("organic", "Gardening", _E4, "Gardening"),
+    ("organic", "Reading", _E4, "Reading"),
+    ("organic", "Music", _E2, "Music"),
+    ("organic", "Volunteering", _E5, "Volunteering"),
+    ("organic", "Photography", _E5, "Photography"),
+    ("organic", "Kindle", _E5, "Kindle"),
+    ("organic", "Sleeping", _E6, "Sleeping"),
+    ("organic", "Heating", _E6, "Heating"),
+    # look alike, mean something else: a loose fuzzy/model threshold merges these
+    ("trap", "Banking", _E7, "Banking"),
+    ("trap", "Carer", _E7, "Carer"),
+    ("trap", "Personnel", _E6, "Personnel"),
+    ("trap", "Worship", _E1, "Worship"),
+    ("trap", "Homeschool", _E7, "Homeschool"),
+    ("trap", "Cooking", _E7, "Cooking"),
+]
+
+
+def load_corpus(path: str) -> List[Tuple[str, str, List[str], str]]:
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                out.append((d.get("tag", "extra"), d["proposed"], list(d["existing"]), d["expected"]))
+    return out
+
+
+# ---------------------------
+# Configurations
+# ---------------------------
+
+BASE = {"model": 0.58, "fuzzy": 0.88, "shortcut": None, "synonyms": True, "create": True}
+
+
+def configs(with_model: bool) -> Iterator[Dict[str, Any]]:
+    """Defaults, one-at-a-time sweeps, and shortcut × fuzzy jointly (distinct configs only)."""
+    seen = set()
+
+    def emit(**over: Any) -> Iterator[Dict[str, Any]]:
+        cfg = {**BASE, **over}
+        key = tuple(sorted(cfg.items(), key=lambda kv: kv[0]))
+        if key not in seen:
+            seen.add(key)
+            yield cfg
+
+    yield from emit()
+    for f in (0.70, 0.75, 0.80, 0.85, 0.90, 0.95):
+        yield from emit(fuzzy=f)
+    yield from emit(synonyms=False)
+    yield from emit(create=False)
+    if with_model:
+        for m in (0.40, 0.45, 0.50, 0.55, 0.60, 0.65, 0.70, 0.75):
+            yield from emit(model=m)
+        for s in (0.80, 0.85, 0.90, 0.95):
+            for f in (0.80, 0.85, 0.88, 0.90):
+                yield from emit(shortcut=s, fuzzy=f)
+
+
+def name_of(cfg: Dict[str, Any], encoder: str) -> str:
+    parts = [encoder]
+    if encoder != "none":
+        parts.append(f"model>={cfg['model']:.2f}")
+    parts.append(f"fuzzy>={cfg['fuzzy']:.2f}")
+    if cfg["shortcut"] is not None:
+        parts.append(f"shortcut>={cfg['shortcut']:.2f}")
+    if not cfg["synonyms"]:
+        parts.append("no-synonyms")
+    if not cfg["create"]:
+        parts.append("no-create")
+    return " ".join(parts)
+
+
+# ---------------------------
+# Measurement
+# ---------------------------
+
+class _Encoder:
+    """Wraps similarity's encoder to count invocations and time."""
+
+    def __init__(self, encode: Optional[Callable[[Sequence[str]], Any]], name: Optional[str]):
+        self.encode, self.name = encode, name
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, texts: Sequence[str]) -> Any:
+        self.calls += 1
+        t0 = time.perf_counter()
+        try:
+            return self.encode(texts)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+    def loader(self) -> Callable[[], Tuple[Any, Any]]:
+        return lambda: (self, self.name) if self.encode is not None else (None, None)
+
+
+def evaluate(
+    similarity: Any,
+    corpus: Sequence[Tuple[str, str, List[str], str]],
+    cfg: Dict[str, Any],
+    encoder: _Encoder,
+    rounds: int,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    synonyms = similarity._DEFAULT_SYNONYMS
+    loader = similarity._load_encoder
+    similarity._load_encoder = encoder.loader()
+    if not cfg["synonyms"]:
+        similarity._DEFAULT_SYNONYMS = {}
+    try:
+        stage_samples: Dict[str, List[float]] = defaultdict(list)
+        correct: Counter = Counter()
+        total: Counter = Counter()
+        encoder_decisions = 0
+        errors = []
+        samples = []
+        encoder_s = 0.0
+        for r in range(rounds):
+            encoder.calls, encoder.seconds = 0, 0.0
+            for tag, proposed, existing, expected in corpus:
+                before = encoder.calls
+                t0 = time.perf_counter()
+                final, dbg = similarity.reconcile_category(
+                    proposed, existing,
+                    threshold_model=cfg["model"],
+                    threshold_fuzzy=cfg["fuzzy"],
+                    threshold_fuzzy_shortcut=cfg["shortcut"],
+                    allow_create_from_synonym=cfg["create"],
+                )
+                dt = time.perf_counter() - t0
+                samples.append(dt)
+                method = dbg["method"]
+                stage_samples[method].append(dt)
+                if r:
+                    continue  # decisions are deterministic; count them once
+                encoder_decisions += encoder.calls > before
+                ok = similarity._norm(final) == similarity._norm(expected)
+                total[tag] += 1
+                correct[tag] += ok
+                if not ok:
+                    errors.append({
+                        "tag": tag, "proposed": proposed, "expected": expected, "got": final,
+                        "method": method, "scores": {k: v for k, v in dbg["scores"].items() if k != "synonym"},
+                    })
+            encoder_s += encoder.seconds
+    finally:
+        similarity._load_encoder = loader
+        similarity._DEFAULT_SYNONYMS = synonyms
+
+    n = len(corpus)
+    lat = common.latency_stats(samples)
+    row: Dict[str, Any] = {
+        "accuracy": round(sum(correct.values()) / n, 4),
+        "correct": sum(correct.values()),
+        "cases": n,
+        "encoder_decisions": encoder_decisions,
+        "encoder_ms": round(1000 * encoder_s / rounds, 3),  # per corpus pass
+        "mean_ms": lat["mean_ms"],
+        "p50_ms": lat["p50_ms"],
+        "p95_ms": lat["p95_ms"],
+        "stages": {
+            m: {
+                "share": round(len(v) / (n * rounds), 4),
+                **{k: common.latency_stats(v)[k] for k in ("p50_ms", "p95_ms")},
+            }
+            for m, v in sorted(stage_samples.items())
+        },
+        "by_tag": {t: round(correct[t] / total[t], 4) for t in sorted(total)},
+        "config": dict(cfg),
+    }
+    return row, errors
+
+
+def recommend(results: Dict[str, Dict[str, Any]], encoder: str) -> Optional[str]:
+    rows = [(k, r) for k, r in results.items() if k.split(" ", 1)[0] == encoder]
+    if not rows:
+        return None
+    def changed(cfg: Dict[str, Any]) -> int:
+        return sum(cfg[k] != v for k, v in BASE.items())
+
+    # ties: fewer settings changed from the defaults, then faster
+    return min(
+        rows,
+        key=lambda kr: (-kr[1]["accuracy"], kr[1]["encoder_decisions"], changed(kr[1]["config"]), kr[1]["mean_ms"]),
+    )[0]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--encoder", choices=("both", "none", "model"), default="both")
+    ap.add_argument("--corpus", help="extra cases, JSON lines")
+    ap.add_argument("--only-corpus", action="store_true", help="use --corpus instead of the built-in cases")
+    ap.add_argument("--rounds", type=int, default=3, help="timing passes per configuration")
+    ap.add_argument("--errors", action="store_true", help="print misclassified cases of the default config")
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--tolerance", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    from backend import similarity
+
+    corpus = [] if args.only_corpus else list(CORPUS)
+    if args.corpus:
+        corpus += load_corpus(args.corpus)
+    if not corpus:
+        ap.error("empty corpus")
+
+    modes = []
+    if args.encoder in ("both", "none"):
+        modes.append(("none", _Encoder(None, None)))
+    if args.encoder in ("both", "model"):
+        encode, model_name = similarity._load_encoder()
+        if encode is not None:
+            encode(["warmup"])  # model load excluded from timings
+            modes.append(("model", _Encoder(encode, model_name)))
+        else:
+            print("encoder unavailable (pip install sentence-transformers, or set EMBED_SOCKET): skipping model runs")
+            if args.encoder == "model":
+                return 2
+
+    results: Dict[str, Dict[str, Any]] = {}
+    default_errors: Dict[str, List[Dict[str, Any]]] = {}
+    for encoder_name, encoder in modes:
+        for cfg in configs(with_model=encoder_name == "model"):
+            name = name_of(cfg, encoder_name)
+            results[name], errors = evaluate(similarity, corpus, cfg, encoder, max(1, args.rounds))
+            if cfg == BASE:
+                default_errors[encoder_name] = errors
+
+    common.print_table(
+        f"reconcile_category over {len(corpus)} cases",
+        results,
+        ("accuracy", "encoder_decisions", "encoder_ms", "mean_ms", "p95_ms"),
+    )
+
+    stage_names = sorted({m for r in results.values() for m in r["stages"]})
+    print("\n== decisions per stage (share / p95 ms)")
+    print(f"{'':40}  " + "  ".join(f"{m:>20}" for m in stage_names))
+    for name, r in results.items():
+        cells = []
+        for m in stage_names:
+            st = r["stages"].get(m)
+            cells.append(f"{st['share']:>7.1%} / {st['p95_ms']:>8.3f}" if st else "")
+        print(f"{name:40}  " + "  ".join(f"{c:>20}" for c in cells))
+
+    print("\n== accuracy per tag")
+    tags = sorted({t for r in results.values() for t in r["by_tag"]})
+    for encoder_name, _ in modes:
+        base = results[name_of(BASE, encoder_name)]
+        print(f"  {encoder_name:6} default: " + "  ".join(f"{t}={base['by_tag'][t]:.0%}" for t in tags))
+
+    recommended = {}
+    for encoder_name, _ in modes:
+        best = recommend(results, encoder_name)
+        recommended[encoder_name] = best
+        base = results[name_of(BASE, encoder_name)]
+        r = results[best]
+        print(
+            f"\nrecommended ({encoder_name}): {best}\n"
+            f"  accuracy {base['accuracy']:.1%} -> {r['accuracy']:.1%}, "
+            f"encoder decisions {base['encoder_decisions']} -> {r['encoder_decisions']}, "
+            f"mean {base['mean_ms']}ms -> {r['mean_ms']}ms"
+        )
+
+    if args.errors:
+        for encoder_name, errors in default_errors.items():
+            print(f"\n== misclassified with defaults ({encoder_name})")
+            for e in errors:
+                print(f"  [{e['tag']}] {e['proposed']!r} -> {e['got']!r} (expected {e['expected']!r}, {e['method']})")
+
+    path = common.save_results(
+        "reconcile",
+        {
+            "results": results,
+            "recommended": recommended,
+            "errors": default_errors,
+            "corpus_size": len(corpus),
+            "meta": common.environment(),
+        },
+        args.out,
+    )
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)["results"]
+        rows = common.compare(results, base, "accuracy", args.tolerance, higher_is_better=True)
+        if common.print_comparison(rows, "accuracy"):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
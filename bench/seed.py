@@ -0,0 +1,88 @@
+# seed.py
+"""
+Seed a task database with N sessions × M tasks for benchmarks.
+
+    python -m bench.seed --db sqlite:///bench.db --sessions 50 --tasks 200
+
+Session ids are "bench-0" … "bench-{N-1}". Rows are inserted with executemany
+in chunks, directly through the ORM table (no AI enrichment). With
+TODO_DB_SHARDS > 1 each session lands on its own shard file.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Work", "Errand", "Health", "Personal", "Finance", "Family", "Study", "Travel"]
+VERBS = ["Call", "Email", "Buy", "Finish", "Review", "Book", "Pay", "Plan", "Clean", "Read"]
+OBJECTS = [
+    "the report", "groceries", "dentist", "rent", "flight to Montreal", "slides",
+    "mom", "the PR", "gym session", "tax forms", "car service", "birthday gift",
+]
+
+
+def make_rows(session_id: str, n: int, rng: random.Random, now: datetime) -> list[dict]:
+    rows = []
+    for _ in range(n):
+        due = None
+        if rng.random() < 0.7:
+            due = now + timedelta(hours=rng.randint(-72, 24 * 14))
+        rows.append({
+            "text": f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}",
+            "category": rng.choice(CATEGORIES),
+            "priority": rng.randint(1, 5),
+            "due_dt": due,
+            "status": "done" if rng.random() < 0.35 else "open",
+            "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            "session_id": session_id,
+        })
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=os.getenv("TODO_DB_PATH", "sqlite:///bench.db"))
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--tasks", type=int, default=100, help="tasks per session")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--chunk", type=int, default=5000)
+    ap.add_argument("--prefix", default="bench-")
+    args = ap.parse_args(argv)
+
+    # backend.db reads TODO_DB_PATH at import time
+    os.environ["TODO_DB_PATH"] = args.db
+    from backend.db import engines, init_db, shard_index, TaskDB
+
+    init_db()
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    total = 0
+    bufs: list[list[dict]] = [[] for _ in engines]
+
+    def flush(i: int) -> None:
+        nonlocal total
+        with engines[i].begin() as conn:
+            conn.execute(TaskDB.__table__.insert(), bufs[i])
+        total += len(bufs[i])
+        bufs[i] = []
+
+    for s in range(args.sessions):
+        sid = f"{args.prefix}{s}"
+        i = shard_index(sid, len(engines))
+        bufs[i].extend(make_rows(sid, args.tasks, rng, now))
+        if len(bufs[i]) >= args.chunk:
+            flush(i)
+    for i, buf in enumerate(bufs):
+        if buf:
+            flush(i)
+
+    print(f"seeded {total} tasks across {args.sessions} sessions into {args.db} ({len(engines)} shard(s))")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# wire.py
+"""
+Task-list payloads: bytes, encode time and time on a slow link per format.
+
+For sessions of 1k and 10k tasks it compares the previous response path
+(FastAPI's jsonable_encoder + JSONResponse) with backend/wire.py's JSON rows,
+columnar JSON, msgpack rows and msgpack columnar, each uncompressed, gzip
+and brotli (when installed).
+
+    python -m bench.wire
+    python -m bench.wire --sizes 1000,10000 --link-kbps 1600 --rtt-ms 150
+    python -m bench.wire --out base.json
+    python -m bench.wire --compare base.json      # exit 1 if payloads grew
+
+"link_ms" is encode + compress time plus the time to move the bytes over a
+link of --link-kbps after one --rtt-ms round trip (default: a slow 3G
+connection), i.e. roughly how long the list takes to arrive.
+"""
+
+from __future__ import annotations
+
+import sys
+import gzip
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from bench import common
+
+_WORDS = (
+    "buy milk eggs bread call mom dentist report finance review pull request pay bill gym "
+    "renew passport book flights slides standup pick up dry cleaning study chapter exam "
+    "email landlord fix bike water plants schedule meeting send invoice clean garage"
+).split()
+_CATEGORIES = ["Work", "Errand", "Health", "Family", "Finance", "Travel", "Study", "Personal"]
+
+
+def make_rows(n: int, seed: int = 11) -> List[Dict[str, Any]]:
+    """Dicts shaped like Task.model_dump() (real datetimes, varied text)."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for i in range(n):
+        due = now + timedelta(minutes=rng.randint(-5000, 20000)) if rng.random() < 0.7 else None
+        rows.append({
+            "id": i + 1,
+            "text": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 7))),
+            "category": rng.choice(_CATEGORIES),
+            "priority": rng.randint(1, 5),
+            "due_dt": due,
+            "status": "done" if rng.random() < 0.3 else "open",
+            "created_at": now - timedelta(seconds=rng.randint(0, 10_000_000), microseconds=rng.randint(0, 999999)),
+        })
+    return rows
+
+
+def _fastapi_json(rows: List[Dict[str, Any]]) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse(jsonable_encoder(rows)).body
+
+
+def _timed(fn: Callable[[], bytes], rounds: int) -> tuple:
+    best = float("inf")
+    out = b""
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,10000")
+    ap.add_argument("--rounds", type=int, default=5, help="best of N for timings")
+    ap.add_argument("--link-kbps", type=float, default=1600.0, help="link bandwidth in kbit/s")
+    ap.add_argument("--rtt-ms", type=float, default=150.0)
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--tolerance", type=float, default=0.02)
+    args = ap.parse_args(argv)
+
+    from backend import wire
+
+    formats: Dict[str, Callable[[List[Dict[str, Any]]], bytes]] = {
+        "fastapi json (before)": _fastapi_json,
+        "json rows": lambda r: wire.encode(r, wire.JSON, "rows"),
+        "json columnar": lambda r: wire.encode(r, wire.JSON, "columnar"),
+    }
+    if wire.msgpack is not None:
+        formats["msgpack rows"] = lambda r: wire.encode(r, wire.MSGPACK, "rows")
+        formats["msgpack columnar"] = lambda r: wire.encode(r, wire.MSGPACK, "columnar")
+    else:
+        print("msgpack not installed: skipping msgpack formats")
+
+    codecs: Dict[str, Callable[[bytes], bytes]] = {
+        "identity": lambda b: b,
+        "gzip": lambda b: gzip.compress(b, compresslevel=wire.GZIP_LEVEL),
+    }
+    if wire.brotli is not None:
+        codecs["br"] = lambda b: wire.brotli.compress(b, quality=wire.BROTLI_QUALITY)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for n in (int(x) for x in args.sizes.split(",")):
+        rows = make_rows(n)
+        for fmt, enc in formats.items():
+            body, enc_s = _timed(lambda: enc(rows), args.rounds)
+            for codec, comp in codecs.items():
+                wire_bytes, comp_s = _timed(lambda: comp(body), args.rounds)
+                transfer_s = args.rtt_ms / 1000 + len(wire_bytes) * 8 / (args.link_kbps * 1000)
+                results[f"n={n} {fmt} [{codec}]"] = {
+                    "bytes": len(wire_bytes),
+                    "encode_ms": round(1000 * enc_s, 2),
+                    "compress_ms": round(1000 * comp_s, 2),
+                    "link_ms": round(1000 * (enc_s + comp_s + transfer_s), 1),
+                }
+
+    common.print_table(
+        f"task-list payloads ({args.link_kbps:g} kbit/s, {args.rtt_ms:g} ms RTT)",
+        results,
+        ("bytes", "encode_ms", "compress_ms", "link_ms"),
+    )
+    print()
+    for n in (int(x) for x in args.sizes.split(",")):
+        base = results[f"n={n} fastapi json (before) [identity]"]
+        best_key = min((k for k in results if k.startswith(f"n={n} ")), key=lambda k: results[k]["link_ms"])
+        best = results[best_key]
+        print(
+            f"  n={n:<6} before {base['bytes']:>9} B {base['link_ms']:>9} ms  ->  "
+            f"{best_key[len(f'n={n} '):]}: {best['bytes']:>8} B {best['link_ms']:>8} ms "
+            f"({base['link_ms'] / best['link_ms']:.0f}x faster)"
+        )
+
+    path = common.save_results(
+        "wire",
+        {
+            "results": results,
+            "link_kbps": args.link_kbps,
+            "rtt_ms": args.rtt_ms,
+            "meta": common.environment(),
+        },
+        args.out,
+    )
+    print(f"\nresults → {path}")
+
+    if args.compare:
+        base = common.load_results(args.compare)["results"]
+        rows = common.compare(results, base, "bytes", args.tolerance)
+        if common.print_comparison(rows, "bytes"):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
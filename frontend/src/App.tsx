@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import InputArea from "./components/InputArea/InputArea";
 import CategoryCard from "./components/CategoryCard/CategoryCard";
 import TaskCard from "./components/TaskCard/TaskCard";
@@ -10,7 +10,8 @@ import Navbar from "./components/Navbar/Navbar";
 
 // Types
 import type { Task, Category } from "./types/task";
-import { apiFetch } from "./utils/api";
+import { apiFetch, apiFetchWithHeaders } from "./utils/api";
+import { subscribeChanges, type ChangeKind } from "./utils/changes";
 
 // --- API helpers ---
 async function addTask(text: string): Promise<Task> {
@@ -31,6 +32,12 @@ async function getTasks(): Promise<Task[]> {
   return apiFetch<Task[]>("/tasks");
 }
 
+// full list + the change-feed sequence it is current as of
+async function getTasksWithVersion(): Promise<{ tasks: Task[]; version: number }> {
+  const { data, headers } = await apiFetchWithHeaders<Task[]>("/tasks");
+  return { tasks: data, version: Number(headers.get("X-Session-Version") || 0) };
+}
+
 async function markDone(id: number): Promise<Task> {
   return apiFetch<Task>(`/tasks/${id}`, {
     method: "PATCH",
@@ -58,19 +65,54 @@ function App() {
   const notify = useNotify();
   const [isSidebarOpen, setSidebarOpen] = useState(false);
 
-  useEffect(() => {
-    loadTasks();
-  }, []);
+  // all tasks of the session by id, kept current by the server's change feed
+  const byId = useRef(new Map<number, Task>());
+  const filteredRef = useRef(false);
+  filteredRef.current = isFiltered;
+
+  const showAll = () => {
+    const all = [...byId.current.values()].sort((a, b) =>
+      b.created_at.localeCompare(a.created_at)
+    );
+    splitAndSet(all);
+  };
 
-  const loadTasks = async () => {
+  const applyChange = (kind: ChangeKind, task: Task) => {
+    if (kind === "deleted") byId.current.delete(task.id);
+    else byId.current.set(task.id, task);
+    // a filtered view stays as is until "Back to All Tasks"
+    if (!filteredRef.current) showAll();
+  };
+
+  const loadTasks = async (): Promise<number> => {
     try {
-      const data = await getTasks();
-      splitAndSet(data);
+      const { tasks, version } = await getTasksWithVersion();
+      byId.current = new Map(tasks.map((t) => [t.id, t]));
+      splitAndSet(tasks);
+      return version;
     } catch (err) {
       console.error("Failed to load tasks:", err);
+      return 0;
     }
   };
 
+  useEffect(() => {
+    let close: (() => void) | undefined;
+    let cancelled = false;
+    loadTasks().then((version) => {
+      if (cancelled) return;
+      close = subscribeChanges(
+        version,
+        (kind, task) => applyChange(kind, task),
+        () => void loadTasks()
+      );
+    });
+    return () => {
+      cancelled = true;
+      close?.();
+    };
+  }, []);
+
   const splitAndSet = (data: Task[]) => {
     const grouped: Record<string, Task[]> = {};
     const isolated: Task[] = [];
@@ -139,7 +181,7 @@ const handleTaskSubmit = async (text: string) => {
     data.map(async (t) => {
       if (t.status !== "done") {
         try {
-          await markDone(t.id);
+          applyChange("updated", await markDone(t.id));
           doneCount++;
         } catch {
           // ignore already-done tasks
@@ -148,8 +190,6 @@ const handleTaskSubmit = async (text: string) => {
     })
   );
 
-  await loadTasks();
-
   if (doneCount > 0) {
     notify.success(`Marked ${doneCount} task(s) as done`);
   } else {
@@ -161,8 +201,8 @@ const handleTaskSubmit = async (text: string) => {
       if (cmd.action === "delete_category" && cmd.category) {
         const data = await getTasks();
         const toDelete = data.filter((t) => t.category === cmd.category);
-        await Promise.all(toDelete.map((t) => deleteTask(t.id)));
-        await loadTasks();
+        const deleted = await Promise.all(toDelete.map((t) => deleteTask(t.id)));
+        deleted.forEach((t) => applyChange("deleted", t));
 
         notify.danger(`Deleted ${toDelete.length} task(s) in "${cmd.category}"`);
         return;
@@ -185,8 +225,9 @@ const handleTaskSubmit = async (text: string) => {
     }
 
     // 3. Otherwise → treat as plain add task
-    await addTask(text);
-    await loadTasks();
+    // the change feed delivers it too; applying the response directly keeps
+    // the UI right even without the event stream
+    applyChange("created", await addTask(text));
     notify.success("Task added!");
   } catch (err) {
     console.error("Failed to process input:", err);
@@ -198,8 +239,7 @@ const handleTaskSubmit = async (text: string) => {
 
   const handleTaskDone = async (id: number) => {
     try {
-      await markDone(id);
-      await loadTasks();
+      applyChange("updated", await markDone(id));
       notify.info("Task marked done!");
       setSelectedTask(null);
     } catch (err) {
@@ -209,8 +249,7 @@ const handleTaskSubmit = async (text: string) => {
 
   const handleTaskDelete = async (id: number) => {
     try {
-      await deleteTask(id);
-      await loadTasks();
+      applyChange("deleted", await deleteTask(id));
       notify.danger("Task deleted!");
       setSelectedTask(null);
     } catch (err) {
@@ -286,7 +325,8 @@ const handleTaskSubmit = async (text: string) => {
                 <button
                   className="text-sm text-blue-700 hover:underline"
                   onClick={() => {
-                    loadTasks();
+                    filteredRef.current = false;
+                    showAll();
                     setIsFiltered(false);
                   }}
                 >
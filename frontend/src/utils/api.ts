@@ -1,12 +1,20 @@
 // src/utils/api.ts
 import { getSessionId } from "./session";
 
-const BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+export const BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
 export async function apiFetch<T>(
   path: string,
   options: RequestInit = {}
 ): Promise<T> {
+  const { data } = await apiFetchWithHeaders<T>(path, options);
+  return data;
+}
+
+export async function apiFetchWithHeaders<T>(
+  path: string,
+  options: RequestInit = {}
+): Promise<{ data: T; headers: Headers }> {
   const sessionId = getSessionId();
 
   const resp = await fetch(`${BASE_URL}${path}`, {
@@ -21,5 +29,5 @@ export async function apiFetch<T>(
   if (!resp.ok) {
     throw new Error(`API error: ${resp.status} ${await resp.text()}`);
   }
-  return resp.json();
+  return { data: await resp.json(), headers: resp.headers };
 }
\ No newline at end of file
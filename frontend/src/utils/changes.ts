@@ -0,0 +1,38 @@
+// src/utils/changes.ts
+import type { Task } from "../types/task";
+import { BASE_URL } from "./api";
+import { getSessionId } from "./session";
+
+export type ChangeKind = "created" | "updated" | "deleted";
+
+export interface ChangeEvent {
+  type: `task.${ChangeKind}`;
+  seq: number;
+  task: Task;
+}
+
+// Subscribe to the session's change feed, resuming after `since`.
+// EventSource reconnects by itself and sends Last-Event-ID, so the server
+// replays whatever was missed; `onReset` means it couldn't and the caller
+// should refetch the full list.
+export function subscribeChanges(
+  since: number,
+  onChange: (kind: ChangeKind, task: Task, seq: number) => void,
+  onReset: () => void
+): () => void {
+  const params = new URLSearchParams({
+    session_id: getSessionId(),
+    since: String(since),
+  });
+  const es = new EventSource(`${BASE_URL}/events?${params}`);
+
+  (["created", "updated", "deleted"] as ChangeKind[]).forEach((kind) => {
+    es.addEventListener(`task.${kind}`, (e) => {
+      const ev = JSON.parse((e as MessageEvent).data) as ChangeEvent;
+      onChange(kind, ev.task, ev.seq);
+    });
+  });
+  es.addEventListener("reset", () => onReset());
+
+  return () => es.close();
+}
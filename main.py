@@ -1,21 +1,25 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
 from rich.table import Table
 
 from backend.utils import parse_command
-from backend.ai_client import categorize_and_enrich
+from backend.db import init_db
 from backend.services import TaskService
-from backend.api import app
 
 # 👇 Give the CLI a dedicated session
 CLI_SESSION = "local"
-svc = TaskService(session_id=CLI_SESSION)
 
 console = Console()
-console.print("[bold green]Smart Todo (Gemini) — CLI[/]  type 'help'")
 
 def print_tasks(tasks):
     if not tasks:
@@ -29,40 +33,210 @@ def print_tasks(tasks):
         table.add_row(str(t.id), t.category, str(t.priority), due, t.status, t.text)
     console.print(table)
 
-while True:
+# ---------------------------
+# Batch mode
+# ---------------------------
+
+def read_batch(path):
+    """(line number, text) of every non-blank, non-# line of a file ("-" = stdin)."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
     try:
-        cmd, arg = parse_command(console.input("[bold cyan]todo>[/] ").strip())
-        if cmd == "exit":
+        return [(n, line.strip()) for n, line in enumerate(f, 1) if line.strip() and not line.lstrip().startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _task_json(t):
+    return t.model_dump(mode="json")
+
+
+def run_batch(lines, workers, out):
+    """
+    Run parsed commands in order. Enrichment of every `add` starts up front on
+    a pool of `workers` threads; results are applied in input order, so
+    `done <id>` can refer to a task added earlier in the same batch. Items
+    enriched before an earlier item created their category are reconciled
+    again against the categories as they are when applied.
+    """
+    cmds = [(n, line, *parse_command(line)) for n, line in lines]
+    end = next((i for i, c in enumerate(cmds) if c[2] == "exit"), len(cmds))
+    cmds = cmds[:end]
+    adds = [(i, c[3]) for i, c in enumerate(cmds) if c[2] == "add"]
+
+    svc = TaskService(session_id=CLI_SESSION)
+    snapshot = svc.categories()
+    known = list(snapshot)
+    results = []
+    started = time.perf_counter()
+    progress = Progress(
+        TextColumn("{task.description:<10}"), BarColumn(), MofNCompleteColumn(), TimeElapsedColumn(),
+        console=out, transient=False,
+    )
+    with progress, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cli-enrich") as pool:
+        enriching = progress.add_task("enriching", total=len(adds))
+        applying = progress.add_task("applying", total=len(cmds))
+        futures = {}
+        for i, text in adds:
+            fut = pool.submit(svc.enrich, text, snapshot)
+            fut.add_done_callback(lambda _: progress.advance(enriching))
+            futures[i] = fut
+
+        for i, (n, line, cmd, arg) in enumerate(cmds):
+            res = {"line": n, "input": line, "command": cmd, "ok": True}
+            try:
+                if cmd == "add":
+                    meta = futures.pop(i).result()
+                    if len(known) > len(snapshot):
+                        meta = svc.rereconcile(meta, known)
+                    task = svc.add_enriched(arg, meta)
+                    if task.category not in known:
+                        known.append(task.category)
+                    res.update(task=_task_json(task), degraded=svc.last_degraded)
+                elif cmd == "done":
+                    task = svc.mark_done(arg)
+                    res.update(ok=bool(task), task=_task_json(task) if task else None)
+                elif cmd == "delete":
+                    task = svc.delete(arg)
+                    res.update(ok=bool(task), task=_task_json(task) if task else None)
+                elif cmd == "show_all":
+                    res["tasks"] = svc.list_tasks()
+                elif cmd == "show_category":
+                    res["tasks"] = svc.list_tasks(category=arg)
+                elif cmd == "show_immediate":
+                    res["tasks"] = svc.list_immediate(datetime.now() + timedelta(hours=24))
+                else:  # help / noop
+                    res["ok"] = None
+            except Exception as e:
+                res.update(ok=False, error=str(e))
+            if res["ok"] is not None:
+                results.append(res)
+            progress.advance(applying)
+    svc.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "commands": len(results),
+        "added": sum(1 for r in results if r["command"] == "add" and r["ok"]),
+        "degraded": sum(1 for r in results if r.get("degraded")),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "elapsed_s": round(elapsed, 3),
+    }
+    return results, summary
+
+
+def print_batch(results, summary):
+    for r in results:
+        if "tasks" in r:
+            console.print(f"[bold]{r['input']}[/] [dim](line {r['line']})[/]")
+            print_tasks(r["tasks"])
+
+    table = Table(show_lines=False)
+    for col in ("line", "command", "id", "category", "priority", "due", "result"):
+        table.add_column(col)
+    for r in results:
+        if "tasks" in r:
+            continue
+        t = r.get("task") or {}
+        if not r["ok"]:
+            outcome = f"[red]{r.get('error') or 'not found'}[/]"
+        else:
+            outcome = "[yellow]ok (degraded)[/]" if r.get("degraded") else "ok"
+        table.add_row(
+            str(r["line"]), r["command"], str(t.get("id", "-")), t.get("category", "-"),
+            str(t.get("priority", "-")), t.get("due_dt") or "-", outcome,
+        )
+    console.print(table)
+    console.print(
+        f"{summary['added']} added, {summary['failed']} failed, {summary['degraded']} degraded "
+        f"in {summary['elapsed_s']:.1f}s"
+    )
+
+
+def batch_main(path, workers, as_json):
+    init_db()
+    from backend.resilience import MAX_WORKERS
+
+    # more threads than AI slots would only turn the excess into degraded fallbacks
+    workers = min(workers, MAX_WORKERS)
+    # with --json, stdout carries only the JSON document
+    out = Console(stderr=True) if as_json else console
+    results, summary = run_batch(read_batch(path), workers, out)
+    if as_json:
+        for r in results:
+            if "tasks" in r:
+                r["tasks"] = [_task_json(t) for t in r["tasks"]]
+        json.dump({"session": CLI_SESSION, "results": results, "summary": summary}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_batch(results, summary)
+    return 1 if summary["failed"] else 0
+
+
+# ---------------------------
+# Interactive mode
+# ---------------------------
+
+def repl():
+    init_db()
+    svc = TaskService(session_id=CLI_SESSION)
+    console.print("[bold green]Smart Todo (Gemini) — CLI[/]  type 'help'")
+
+    while True:
+        try:
+            cmd, arg = parse_command(console.input("[bold cyan]todo>[/] ").strip())
+            if cmd == "exit":
+                # svc.save()
+                console.print("[dim]Saved. Bye![/]")
+                break
+            elif cmd == "help":
+                console.print("Commands: add <text> | show all | show <category> | show immediate | done <id> | delete <id> | exit")
+            elif cmd == "show_all":
+                print_tasks(svc.list_tasks())
+            elif cmd == "show_category":
+                print_tasks(svc.list_tasks(category=arg))
+            elif cmd == "show_immediate":
+                cutoff = datetime.now() + timedelta(hours=24)
+                print_tasks(svc.list_immediate(cutoff))
+            elif cmd == "done":
+                ok = svc.mark_done(arg)
+                console.print("Marked done." if ok else "[red]Not found or already done[/]")
+                # svc.save()
+            elif cmd == "delete":
+                ok = svc.delete(arg)
+                console.print("Deleted." if ok else "[red]Not found[/]")
+                # svc.save()
+            elif cmd == "add":
+                task = svc.add_task(arg)
+                console.print(f"Added [bold]{task.text}[/] → {task.category} (p{task.priority})")
+                # svc.save()
+            else:
+                pass
+        except KeyboardInterrupt:
             # svc.save()
-            console.print("[dim]Saved. Bye![/]")
+            console.print("\n[dim]Saved. Bye![/]")
             break
-        elif cmd == "help":
-            console.print("Commands: add <text> | show all | show <category> | show immediate | done <id> | delete <id> | exit")
-        elif cmd == "show_all":
-            print_tasks(svc.list_tasks())
-        elif cmd == "show_category":
-            print_tasks(svc.list_tasks(category=arg))
-        elif cmd == "show_immediate":
-            from datetime import datetime, timedelta
-            cutoff = datetime.now() + timedelta(hours=24)
-            print_tasks(svc.list_immediate(cutoff))
-        elif cmd == "done":
-            ok = svc.mark_done(arg)
-            console.print("Marked done." if ok else "[red]Not found or already done[/]")
-            # svc.save()
-        elif cmd == "delete":
-            ok = svc.delete(arg)
-            console.print("Deleted." if ok else "[red]Not found[/]")
-            # svc.save()
-        elif cmd == "add":
-            task = svc.add_task(arg)
-            console.print(f"Added [bold]{task.text}[/] → {task.category} (p{task.priority})")
-            # svc.save()
-        else:
-            pass
-    except KeyboardInterrupt:
-        # svc.save()
-        console.print("\n[dim]Saved. Bye![/]")
-        break
-    except Exception as e:
-        console.print(f"[red]Error:[/] {e}")
\ No newline at end of file
+        except Exception as e:
+            console.print(f"[red]Error:[/] {e}")
+
+    svc.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Smart Todo CLI")
+    ap.add_argument("--batch", metavar="FILE",
+                    help='run the commands in FILE ("-" = stdin; default when stdin is piped) and exit')
+    ap.add_argument("--workers", type=int, default=int(os.getenv("AI_MAX_WORKERS", "8")),
+                    help="concurrent enrichments in batch mode (default: AI_MAX_WORKERS)")
+    ap.add_argument("--json", action="store_true", help="batch mode: print results as JSON on stdout")
+    args = ap.parse_args(argv)
+
+    path = args.batch or (None if sys.stdin.isatty() else "-")
+    if path is None:
+        if args.json:
+            ap.error("--json needs --batch or piped input")
+        repl()
+        return 0
+    return batch_main(path, max(1, args.workers), args.json)
+
+if __name__ == "__main__":
+    sys.exit(main())
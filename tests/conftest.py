@@ -0,0 +1,44 @@
+# conftest.py
+"""
+Shared setup: a throwaway SQLite file and the offline AI backend.
+
+backend.db creates its engines at import time from the environment, so the
+variables are set here, before any test module imports the backend.
+"""
+
+import os
+import uuid
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ["TODO_DB_PATH"] = f"sqlite:///{os.path.join(_tmp, 'tasks.db')}"
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("FAKE_AI_LATENCY", "none")
+os.environ.setdefault("EMBED_WARMUP", "0")
+os.environ.setdefault("DUE_SCHEDULER", "0")
+os.environ.setdefault("GROUP_COMMIT", "0")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from backend.db import init_db
+
+    init_db()
+
+
+@pytest.fixture
+def sid() -> str:
+    """A fresh session id, so tests never see each other's rows."""
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def meta():
+    """Enrichment result for TaskService.add_enriched, skipping the AI and the encoder."""
+
+    def _meta(category: str = "Work", priority: int = 3, due_dt=None) -> dict:
+        return {"category": category, "priority": priority, "due_dt": due_dt, "raw_category": category}
+
+    return _meta
@@ -0,0 +1,99 @@
+# test_admission.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import admission, profiling
+from backend.admission import AdmissionMiddleware, Lane, Overloaded, classify
+
+
+def test_classify():
+    assert classify("POST", "/tasks") == "ai"
+    assert classify("POST", "/nlp/parse") == "ai"
+    assert classify("GET", "/tasks") == "interactive"
+    assert classify("POST", "/tasks/import") == "bulk"
+    assert classify("GET", "/metrics") is None
+    assert classify("GET", "/debug/admission") is None
+    assert classify("OPTIONS", "/tasks") is None
+
+
+def test_full_queue_is_shed_at_once():
+    async def scenario():
+        lane = Lane("t", concurrency=1, max_queue=1, max_wait_s=5)
+        await lane.acquire()
+        waiter = asyncio.ensure_future(lane.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as e:
+            await lane.acquire()
+        assert e.value.reason == "queue_full" and e.value.retry_after >= 1
+        lane.release(0.01)  # the slot goes straight to the queued request
+        await waiter
+        assert lane.active == 1 and lane.snapshot()["queued"] == 0
+        lane.release(0.01)
+        assert lane.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_is_shed_after_max_wait():
+    async def scenario():
+        lane = Lane("t", concurrency=1, max_queue=4, max_wait_s=0.05)
+        await lane.acquire()
+        with pytest.raises(Overloaded) as e:
+            await lane.acquire()
+        assert e.value.reason == "queue_timeout"
+        assert lane.snapshot()["queued"] == 0
+        lane.release(0.01)
+        assert lane.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_follows_service_time():
+    lane = Lane("t", concurrency=2, max_queue=8, max_wait_s=1)
+    lane.active = 1
+    lane.release(6.0)  # one request held its slot for 6s
+    assert lane.retry_after() == 3  # 6s * 1 arrival / 2 slots
+
+
+def test_middleware_answers_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "ENABLED", True)
+    monkeypatch.setitem(admission.lanes, "interactive", Lane("interactive", 1, 0, 0.05))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def scenario():
+        mw = AdmissionMiddleware(app)
+        await admission.lanes["interactive"].acquire()  # the only slot is busy
+        sent = []
+
+        async def send(msg):
+            sent.append(msg)
+
+        await mw({"type": "http", "method": "GET", "path": "/tasks"}, None, send)
+        return sent
+
+    sent = asyncio.run(scenario())
+    start = sent[0]
+    assert start["status"] == 503
+    assert dict(start["headers"])[b"retry-after"] == b"1"
+
+
+@pytest.fixture
+def client():
+    from backend.api import app
+
+    return TestClient(app)
+
+
+def test_debug_admission_needs_the_debug_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "DEBUG_TOKEN", "")
+    assert client.get("/debug/admission").status_code == 404
+    monkeypatch.setattr(profiling, "DEBUG_TOKEN", "s3cret")
+    assert client.get("/debug/admission").status_code == 404
+    assert client.get("/debug/admission", headers={"X-Debug-Token": "wrong"}).status_code == 404
+    r = client.get("/debug/admission", headers={"X-Debug-Token": "s3cret"})
+    assert r.status_code == 200 and set(r.json()) == set(admission.lanes)
@@ -0,0 +1,35 @@
+# test_archive.py
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from backend import archive
+from backend.db import TaskArchiveDB, session_for
+
+
+def _archive(sid: str, *texts: str) -> None:
+    now = datetime.now()
+    db = session_for(sid)
+    try:
+        db.execute(insert(TaskArchiveDB.__table__), [
+            {"id": i, "session_id": sid, "text": t, "status": "done", "done_at": now, "archived_at": now}
+            for i, t in enumerate(texts, 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _search(sid: str, q: str) -> list:
+    db = session_for(sid)
+    try:
+        return sorted(r["text"] for r in archive.list_archived(db, sid, q=q))
+    finally:
+        db.close()
+
+
+def test_filter_matches_wildcard_characters_literally(sid):
+    _archive(sid, "raise prices 10%", "raise prices 100", "fix snake_case", "fix snakeXcase")
+    assert _search(sid, "10%") == ["raise prices 10%"]
+    assert _search(sid, "snake_case") == ["fix snake_case"]
+    assert _search(sid, "prices") == ["raise prices 10%", "raise prices 100"]
@@ -0,0 +1,59 @@
+# test_dates.py
+from datetime import datetime
+
+import pytest
+
+from backend.dates import parse_due, parse_due_with_layer
+
+NOW = datetime(2025, 3, 5, 15, 30)  # a Wednesday afternoon
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("tomorrow 7am", datetime(2025, 3, 6, 7, 0)),
+        ("by 17:30", datetime(2025, 3, 5, 17, 30)),
+        ("by 9:00", datetime(2025, 3, 6, 9, 0)),  # already passed: tomorrow
+        ("next monday", datetime(2025, 3, 10, 9, 0)),
+        ("friday at 3pm", datetime(2025, 3, 7, 15, 0)),
+        ("wednesday", datetime(2025, 3, 12, 9, 0)),  # today's 09:00 is gone: next week
+        ("in 2 hours", datetime(2025, 3, 5, 17, 30)),
+        ("in three days", datetime(2025, 3, 8, 15, 30)),
+        ("tonight", datetime(2025, 3, 5, 20, 0)),
+        ("today at noon", datetime(2025, 3, 5, 12, 0)),
+        ("today", datetime(2025, 3, 5, 23, 59)),  # 09:00 passed: end of day
+    ],
+)
+def test_fast_path(text, expected):
+    assert parse_due_with_layer(text, NOW) == (expected, "fast")
+
+
+def test_bare_today_before_nine_keeps_the_default_time():
+    assert parse_due("today", datetime(2025, 3, 5, 8, 0)) == datetime(2025, 3, 5, 9, 0)
+
+
+def test_iso_and_z_suffix():
+    assert parse_due_with_layer("2025-09-03T17:30:00", NOW) == (datetime(2025, 9, 3, 17, 30), "iso")
+    dt, layer = parse_due_with_layer("2025-09-03T17:30:00Z", NOW)
+    assert layer == "iso" and dt.utcoffset().total_seconds() == 0
+
+
+def test_invalid_clock_is_not_taken_by_the_fast_path():
+    _, layer = parse_due_with_layer("tomorrow 25:00", NOW)
+    assert layer == "dateparser"
+
+
+def test_dateparser_fallback_is_relative_to_now():
+    dt, layer = parse_due_with_layer("3 days ago", NOW)
+    assert layer == "dateparser"
+    assert dt.date() == datetime(2025, 3, 2).date()
+
+
+def test_memo_is_keyed_by_reference_minute():
+    assert parse_due("in 1 hour", NOW) == datetime(2025, 3, 5, 16, 30)
+    assert parse_due("in 1 hour", NOW.replace(minute=31)) == datetime(2025, 3, 5, 16, 31)
+
+
+@pytest.mark.parametrize("text", [None, "", "   ", "5"])
+def test_nothing_to_parse(text):
+    assert parse_due_with_layer(text, NOW)[1] != "fast"
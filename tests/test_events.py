@@ -0,0 +1,57 @@
+# test_events.py
+import asyncio
+
+from backend.events import Hub, sse_stream
+
+
+def _change(seq: int) -> dict:
+    return {"type": "task.updated", "seq": seq, "task": {"id": 1}}
+
+
+def test_replay_returns_the_missed_changes():
+    hub = Hub()
+    for seq in range(1, 6):
+        hub.publish_change("s", _change(seq))
+    assert [e["seq"] for e in hub.replay("s", 2, 5)] == [3, 4, 5]
+
+
+def test_replay_when_up_to_date_is_empty():
+    hub = Hub()
+    hub.publish_change("s", _change(1))
+    assert hub.replay("s", 1, 1) == []
+
+
+def test_gap_in_the_buffer_means_reset():
+    hub = Hub()
+    for seq in (1, 2, 4):  # 3 was written through another worker
+        hub.publish_change("s", _change(seq))
+    assert hub.replay("s", 1, 4) is None
+
+
+def test_client_ahead_of_the_server_gets_a_reset():
+    hub = Hub()
+    hub.publish_change("s", _change(1))
+    assert hub.replay("s", 9, 1) is None
+
+
+def test_stream_after_reset_delivers_changes_above_the_server_seq():
+    async def scenario():
+        hub = Hub()
+        sub = hub.subscribe("s")
+        frames = []
+
+        async def disconnected():
+            return False
+
+        # what the /events route does when `since` (9) is ahead of `current` (2)
+        stream = sse_stream(sub, disconnected, [{"type": "reset", "seq": 2}], after_seq=2)
+        frames.append(await stream.__anext__())  # ": connected"
+        frames.append(await stream.__anext__())  # the reset
+        hub.publish_change("s", _change(3))
+        frames.append(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert frames[1].startswith("event: reset\nid: 2\n")
+    assert frames[2].startswith("event: task.updated\nid: 3\n")
@@ -0,0 +1,77 @@
+# test_group_commit.py
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from backend.db import TaskDB, sessionmaker_for
+from backend.group_commit import GroupCommitWriter
+
+
+def _insert(sid: str, text: str):
+    def op(db):
+        obj = TaskDB(text=text, session_id=sid)
+        db.add(obj)
+        db.flush()
+        return obj.id
+
+    return op
+
+
+def _insert_then_fail(sid: str, text: str):
+    def op(db):
+        db.add(TaskDB(text=text, session_id=sid))
+        db.flush()
+        raise ValueError("bad op")
+
+    return op
+
+
+def _texts(sid: str) -> set:
+    db = sessionmaker_for(sid)()
+    try:
+        return set(db.execute(select(TaskDB.text).where(TaskDB.session_id == sid)).scalars())
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def writer(sid):
+    # a long window so the ops below land in one batch
+    w = GroupCommitWriter(sessionmaker_for(sid), window_s=0.2, max_ops=16)
+    yield w
+    w.close()
+
+
+def test_batch_commits_every_op(writer, sid):
+    futs = [writer.submit(_insert(sid, f"t{i}")) for i in range(5)]
+    ids = [f.result(timeout=5) for f in futs]
+    assert len(set(ids)) == 5
+    assert _texts(sid) == {f"t{i}" for i in range(5)}
+
+
+def test_failed_op_does_not_fail_its_neighbours(writer, sid):
+    good1 = writer.submit(_insert(sid, "before"))
+    bad = writer.submit(_insert_then_fail(sid, "bad"))
+    good2 = writer.submit(_insert(sid, "after"))
+
+    assert good1.result(timeout=5) and good2.result(timeout=5)
+    with pytest.raises(ValueError, match="bad op"):
+        bad.result(timeout=5)
+    # the batch was rolled back and re-run one by one: the bad op's row is gone
+    assert _texts(sid) == {"before", "after"}
+
+
+def test_result_is_only_returned_after_commit(writer, sid):
+    seen = []
+
+    def reader():
+        writer.run(_insert(sid, "durable"))
+        seen.append("durable" in _texts(sid))
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert seen == [True, True, True]
@@ -0,0 +1,119 @@
+# test_hedging.py
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+from backend import hedging
+from backend.hedging import HedgeBudget
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        yield ex
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(hedging, "windows", {})
+    monkeypatch.setattr(hedging, "budget", HedgeBudget(ratio=1.0, burst=10))
+    monkeypatch.setattr(hedging, "MIN_SAMPLES", 5)
+    monkeypatch.setattr(hedging, "MIN_DELAY_S", 0.01)
+
+
+def _warm(fn: str = "fn", seconds: float = 0.02) -> None:
+    for _ in range(10):
+        hedging._window(fn).observe(seconds)
+
+
+def _attempts(pool, *behaviours):
+    """submit() for hedging.call: attempt i runs behaviours[i]; returns (submit, calls)."""
+    calls = []
+
+    def submit():
+        fn = behaviours[len(calls)]
+        calls.append(fn)
+        return pool.submit(fn)
+
+    return submit, calls
+
+
+def _after(seconds, value):
+    def run():
+        time.sleep(seconds)
+        return value
+
+    return run
+
+
+def _fail_after(seconds):
+    def run():
+        time.sleep(seconds)
+        raise RuntimeError("attempt failed")
+
+    return run
+
+
+def test_no_hedge_until_the_threshold_is_known(pool):
+    submit, calls = _attempts(pool, _after(0.1, "primary"))
+    assert hedging.call("fn", submit, timeout=1) == "primary"
+    assert len(calls) == 1
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins(pool):
+    _warm()
+    submit, calls = _attempts(pool, _after(0.5, "primary"), _after(0.01, "hedge"))
+    t0 = time.monotonic()
+    assert hedging.call("fn", submit, timeout=2) == "hedge"
+    assert len(calls) == 2 and time.monotonic() - t0 < 0.4
+
+
+def test_fast_primary_is_not_hedged(pool):
+    _warm(seconds=0.1)
+    submit, calls = _attempts(pool, _after(0.01, "primary"))
+    assert hedging.call("fn", submit, timeout=1) == "primary"
+    assert len(calls) == 1
+
+
+def test_spent_budget_denies_the_hedge(pool, monkeypatch):
+    monkeypatch.setattr(hedging, "budget", HedgeBudget(ratio=0.0, burst=10))
+    _warm()
+    submit, calls = _attempts(pool, _after(0.1, "primary"))
+    assert hedging.call("fn", submit, timeout=1) == "primary"
+    assert len(calls) == 1
+
+
+def test_no_hedge_when_it_could_not_finish_in_time(pool):
+    _warm(seconds=0.2)  # p50 0.2s, but only ~0.05s left after the threshold
+    submit, calls = _attempts(pool, _after(0.22, "primary"))
+    with pytest.raises(FutureTimeout):
+        hedging.call("fn", submit, timeout=0.21)
+    assert len(calls) == 1
+
+
+def test_refused_hedge_falls_back_to_the_primary(pool):
+    _warm()
+    calls = []
+
+    def submit():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("saturated")
+        return pool.submit(_after(0.1, "primary"))
+
+    assert hedging.call("fn", submit, timeout=1) == "primary"
+    assert len(calls) == 2
+
+
+def test_failed_hedge_waits_for_the_primary(pool):
+    _warm()
+    submit, _ = _attempts(pool, _after(0.15, "primary"), _fail_after(0.0))
+    assert hedging.call("fn", submit, timeout=1) == "primary"
+
+
+def test_both_attempts_failing_raises_the_error(pool):
+    _warm()
+    submit, _ = _attempts(pool, _fail_after(0.1), _fail_after(0.0))
+    with pytest.raises(RuntimeError, match="attempt failed"):
+        hedging.call("fn", submit, timeout=1)
@@ -0,0 +1,81 @@
+# test_idempotency.py
+import threading
+import time
+
+import pytest
+
+from backend.idempotency import IdempotencyMismatch, IdempotencyStore, fingerprint
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(wait_s=5)
+
+
+def test_retry_replays_the_stored_response(store, sid):
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return 200, {"id": len(calls)}
+
+    fp = fingerprint("POST /tasks", {"text": "x"})
+    assert store.run(sid, "k1", fp, handler) == (200, {"id": 1}, False)
+    assert store.run(sid, "k1", fp, handler) == (200, {"id": 1}, True)
+    assert len(calls) == 1
+
+
+def test_same_key_different_request_is_rejected(store, sid):
+    store.run(sid, "k1", fingerprint("POST /tasks", {"text": "x"}), lambda: (200, {}))
+    with pytest.raises(IdempotencyMismatch):
+        store.run(sid, "k1", fingerprint("POST /tasks", {"text": "y"}), lambda: (200, {}))
+
+
+def test_5xx_is_not_stored(store, sid):
+    fp = fingerprint("POST /summary", {})
+    assert store.run(sid, "k1", fp, lambda: (503, {"detail": "down"}))[2] is False
+    assert store.run(sid, "k1", fp, lambda: (200, {"ok": True})) == (200, {"ok": True}, False)
+
+
+def test_concurrent_retry_attaches_to_the_original(store, sid):
+    fp = fingerprint("POST /tasks", {"text": "x"})
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+        return 200, {"id": 7}
+
+    first = []
+    t = threading.Thread(target=lambda: first.append(store.run(sid, "k1", fp, slow)))
+    t.start()
+    time.sleep(0.05)
+    assert store.run(sid, "k1", fp, slow) == (200, {"id": 7}, True)
+    t.join(5)
+    assert first == [(200, {"id": 7}, False)]
+    assert len(calls) == 1
+
+
+def test_waiter_runs_as_soon_as_a_failed_original_releases_the_claim(store, sid):
+    fp = fingerprint("POST /tasks", {"text": "x"})
+
+    def boom():
+        time.sleep(0.2)
+        raise RuntimeError("handler failed")
+
+    errors = []
+
+    def original():
+        try:
+            store.run(sid, "k1", fp, boom)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    t = threading.Thread(target=original)
+    t.start()
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    assert store.run(sid, "k1", fp, lambda: (200, {"ok": True})) == (200, {"ok": True}, False)
+    assert time.monotonic() - t0 < 2  # not the full wait_s
+    t.join(5)
+    assert errors == ["handler failed"]
@@ -0,0 +1,55 @@
+# test_reshard.py
+from sqlalchemy import insert, select
+
+from backend.db import TaskDB, create_schema, make_engine, shard_index
+from backend.reshard import _move_session
+from backend.task_cache import bump_version, read_version
+
+tasks = TaskDB.__table__
+
+
+def test_growing_shards_only_moves_sessions_to_new_shards():
+    sessions = [f"s{i}" for i in range(2000)]
+    for n in (1, 2, 3, 4, 7):
+        for s in sessions:
+            before, after = shard_index(s, n), shard_index(s, n + 1)
+            assert after == before or after == n
+
+
+def test_move_keeps_free_ids_and_remaps_taken_ones(tmp_path):
+    src = make_engine(f"sqlite:///{tmp_path / 'src.db'}")
+    dst = make_engine(f"sqlite:///{tmp_path / 'dst.db'}")
+    create_schema(src)
+    create_schema(dst)
+    with src.begin() as conn:
+        conn.execute(insert(tasks), [
+            {"id": 1, "text": "one", "session_id": "mover", "status": "open"},
+            {"id": 5, "text": "five", "session_id": "mover", "status": "open"},
+        ])
+    with dst.begin() as conn:
+        conn.execute(insert(tasks), [{"id": 1, "text": "taken", "session_id": "other", "status": "open"}])
+
+    remap = _move_session(src, dst, "mover")
+
+    assert 1 in remap and 5 not in remap
+    with dst.connect() as conn:
+        moved = dict(conn.execute(select(tasks.c.id, tasks.c.text).where(tasks.c.session_id == "mover")).all())
+    assert moved == {remap[1]: "one", 5: "five"}
+    with src.connect() as conn:
+        assert conn.execute(select(tasks.c.id).where(tasks.c.session_id == "mover")).first() is None
+
+
+def test_move_carries_the_session_version_forward(tmp_path):
+    src = make_engine(f"sqlite:///{tmp_path / 'src.db'}")
+    dst = make_engine(f"sqlite:///{tmp_path / 'dst.db'}")
+    create_schema(src)
+    create_schema(dst)
+    with src.begin() as conn:
+        conn.execute(insert(tasks), [{"id": 1, "text": "one", "session_id": "mover", "status": "open"}])
+        for _ in range(7):
+            bump_version(conn, "mover")
+
+    _move_session(src, dst, "mover")
+
+    with dst.connect() as conn:
+        assert read_version(conn, "mover") == 8
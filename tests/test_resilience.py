@@ -0,0 +1,98 @@
+# test_resilience.py
+import threading
+import time
+
+import pytest
+
+from backend import resilience
+from backend.resilience import AIUnavailable, BadAIResponse, CircuitBreaker, call_guarded, request_budget
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    b = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.1)
+    monkeypatch.setattr(resilience, "breaker", b)
+    return b
+
+
+def _fail():
+    raise RuntimeError("provider down")
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(AIUnavailable):
+            call_guarded("fn", _fail)
+    assert breaker.state == "open"
+
+
+def test_breaker_opens_after_consecutive_failures_and_refuses(breaker):
+    _open(breaker)
+    calls = []
+    with pytest.raises(AIUnavailable) as e:
+        call_guarded("fn", lambda: calls.append(1))
+    assert e.value.reason == "circuit_open" and calls == []
+
+
+def test_half_open_trial_success_closes(breaker):
+    _open(breaker)
+    time.sleep(0.15)
+    assert breaker.state == "half_open"
+    assert call_guarded("fn", lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_half_open_trial_failure_reopens(breaker):
+    _open(breaker)
+    time.sleep(0.15)
+    with pytest.raises(AIUnavailable):
+        call_guarded("fn", _fail)
+    assert breaker.state == "open"
+
+
+def test_saturated_trial_is_released(breaker, monkeypatch):
+    _open(breaker)
+    time.sleep(0.15)
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(resilience, "_slots", slots)
+    slots.acquire()  # an abandoned call still holds the only worker
+    with pytest.raises(AIUnavailable) as e:
+        call_guarded("fn", lambda: "ok")
+    assert e.value.reason == "saturated"
+    assert breaker.state == "half_open"
+
+    slots.release()
+    assert call_guarded("fn", lambda: "ok") == "ok"  # the next call gets the trial
+    assert breaker.state == "closed"
+
+
+def test_bad_response_counts_as_failure(breaker):
+    def blocked():
+        raise BadAIResponse("empty response")
+
+    with pytest.raises(BadAIResponse) as e:
+        call_guarded("fn", blocked)
+    assert e.value.reason == "bad_response"
+    with pytest.raises(BadAIResponse):
+        call_guarded("fn", blocked)
+    assert breaker.state == "open"
+
+
+def test_spent_budget_refuses_without_calling(breaker):
+    calls = []
+    with request_budget(0.0):
+        with pytest.raises(AIUnavailable) as e:
+            call_guarded("fn", lambda: calls.append(1))
+    assert e.value.reason == "deadline_exceeded" and calls == []
+    assert breaker.state == "closed"
+
+
+def test_slow_call_is_cut_at_the_remaining_budget(breaker):
+    release = threading.Event()
+    t0 = time.monotonic()
+    with request_budget(0.2):
+        with pytest.raises(AIUnavailable) as e:
+            call_guarded("fn", release.wait, 5)
+    release.set()
+    assert e.value.reason == "timeout"
+    assert time.monotonic() - t0 < 1
@@ -0,0 +1,32 @@
+# test_rollups.py
+from datetime import datetime, timedelta
+
+from backend.db import engine_for
+from backend import rollups
+from backend.services import TaskService
+
+
+def test_incremental_counts_match_a_full_recount(sid, meta):
+    today = datetime.now().replace(hour=23, minute=0, second=0, microsecond=0)
+    with TaskService(session_id=sid) as svc:
+        a = svc.add_enriched("a", meta("Work", due_dt=today - timedelta(days=2)))
+        svc.add_enriched("b", meta("Work", due_dt=today))
+        c = svc.add_enriched("c", meta("Health"))
+        svc.mark_done(a.id)
+        svc.delete(c.id)
+
+        stats = svc.stats()
+        assert (stats["open"], stats["completed"], stats["due_today"], stats["overdue"]) == (1, 1, 1, 0)
+        assert stats["by_category"] == [{"name": "Work", "open": 1, "done": 1}]
+
+    with engine_for(sid).begin() as conn:
+        assert rollups.reconcile(conn, sid) == 0  # nothing drifted
+
+
+def test_reconcile_repairs_drift(sid, meta):
+    with TaskService(session_id=sid) as svc:
+        svc.add_enriched("a", meta("Work"))
+    with engine_for(sid).begin() as conn:
+        rollups.apply(conn, sid, "Ghost", "open", None, +3)
+        assert rollups.reconcile(conn, sid) == 1
+        assert rollups.reconcile(conn, sid) == 0
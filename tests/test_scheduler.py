@@ -0,0 +1,67 @@
+# test_scheduler.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from backend.db import TaskDB, engine_for
+from backend.events import hub
+from backend.scheduler import DueScheduler
+from backend.task_cache import bump_version
+
+
+@pytest.fixture
+def sched(sid, monkeypatch):
+    # not started: the tests drive sync() and _pop_ready() themselves
+    monkeypatch.setattr(hub, "sessions", lambda: [sid])
+    return DueScheduler(due_soon=timedelta(minutes=60), sync_s=1, resync_s=0)
+
+
+def _insert_elsewhere(sid: str, text: str, due: datetime) -> None:
+    """A write from another worker: straight to the database plus a version bump."""
+    with engine_for(sid).begin() as conn:
+        conn.execute(insert(TaskDB.__table__).values(text=text, session_id=sid, status="open", due_dt=due))
+        bump_version(conn, sid)
+
+
+def _fired(sched):
+    return [(e["type"], e["task"]["text"]) for _, e in sched._pop_ready(datetime.now())]
+
+
+def test_first_load_does_not_replay_past_times(sched, sid):
+    _insert_elsewhere(sid, "late", datetime.now() - timedelta(seconds=5))
+    _insert_elsewhere(sid, "soon", datetime.now() + timedelta(minutes=5))
+    sched.sync()
+    assert _fired(sched) == []  # due_soon of "soon" already passed before we watched
+    assert sched.pending() == 1
+
+
+def test_task_created_just_past_due_elsewhere_fires_overdue(sched, sid):
+    sched.sync()
+    _insert_elsewhere(sid, "missed", datetime.now() - timedelta(seconds=0.5))
+    sched.sync()
+    assert _fired(sched) == [("task.overdue", "missed")]
+
+
+def test_future_task_found_by_sync_fires_due_soon(sched, sid):
+    sched.sync()
+    _insert_elsewhere(sid, "later", datetime.now() + timedelta(minutes=5))
+    sched.sync()
+    assert _fired(sched) == [("task.due_soon", "later")]
+
+
+def test_reload_after_firing_does_not_fire_again(sched, sid):
+    sched.sync()
+    _insert_elsewhere(sid, "missed", datetime.now() - timedelta(seconds=0.5))
+    sched.sync()
+    assert len(_fired(sched)) == 1
+    _insert_elsewhere(sid, "other", datetime.now() + timedelta(days=2))
+    sched.sync()
+    assert _fired(sched) == []
+
+
+def test_old_past_due_task_is_not_replayed(sched, sid):
+    sched.sync()
+    _insert_elsewhere(sid, "ancient", datetime.now() - timedelta(hours=1))
+    sched.sync()
+    assert _fired(sched) == []
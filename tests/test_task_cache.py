@@ -0,0 +1,46 @@
+# test_task_cache.py
+from sqlalchemy import insert
+
+from backend.db import TaskDB, engine_for
+from backend.services import TaskService
+from backend.task_cache import bump_version, cache, read_version
+
+
+def test_mutation_bumps_version_and_updates_cache_in_place(sid, meta):
+    with TaskService(session_id=sid) as svc:
+        assert svc.version() == 0
+        svc.list_tasks()  # fills the cache at version 0
+        task = svc.add_enriched("write report", meta())
+        assert svc.version() == 1
+        # the cached copy moved to version 1 without a reload
+        cached = cache.get(sid, 1)
+        assert cached is not None and [t.id for t in cached] == [task.id]
+
+        svc.mark_done(task.id)
+        assert svc.version() == 2
+        assert [t.status for t in svc.list_tasks()] == ["done"]
+
+
+def test_write_from_another_worker_is_seen_on_next_read(sid, meta):
+    with TaskService(session_id=sid) as svc:
+        svc.add_enriched("mine", meta())
+        assert [t.text for t in svc.list_tasks()] == ["mine"]
+
+        # another process writes straight to the database and bumps the version
+        with engine_for(sid).begin() as conn:
+            conn.execute(insert(TaskDB.__table__).values(text="theirs", session_id=sid, status="open"))
+            bump_version(conn, sid)
+
+        assert sorted(t.text for t in svc.list_tasks()) == ["mine", "theirs"]
+
+
+def test_apply_drops_copy_that_missed_a_version(sid, meta):
+    with TaskService(session_id=sid) as svc:
+        svc.list_tasks()
+        with engine_for(sid).begin() as conn:
+            bump_version(conn, sid)  # a write we never saw
+            assert read_version(conn, sid) == 1
+        svc.add_enriched("after the gap", meta())
+        # version 2 arrived while the cache was at 0: the copy is dropped, not patched
+        assert cache.get(sid, 2) is None
+        assert [t.text for t in svc.list_tasks()] == ["after the gap"]